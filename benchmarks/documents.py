@@ -0,0 +1,151 @@
+"""
+Document handling benchmarks, replaying a synthetic fly scan.
+
+Not loaded at startup. Run it in a profile session::
+
+    %run -i $PROFILE_DIR/benchmarks/documents.py
+    benchmark_document_export(num_frames=10_000)
+"""
+
+import json
+import tempfile
+import time as ttime
+from pathlib import Path
+
+from bluesky.callbacks.tiled_writer import TiledWriter
+
+from hex_profile.documents import BufferedTiledWriter, DocumentExporter, DocumentSpool
+from hex_profile.synthetic import synthetic_flyscan_documents
+
+
+def benchmark_document_export(
+    num_frames=10_000, directory="/tmp/export-docs-benchmark", compress=False
+):
+    """
+    Replay the documents of a `num_frames` fly scan into a DocumentExporter.
+
+    Prints the time the RunEngine thread spends in the callback, the time until
+    everything is on disk and the resulting throughput, next to the former
+    JSONWriter approach (`json.dump` of every document on the RunEngine thread).
+    """
+    documents = list(synthetic_flyscan_documents(num_frames))
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+
+    path = directory / "json_dump.json"
+    start = ttime.perf_counter()
+    with open(path, "w") as file:
+        for name, doc in documents:
+            json.dump({"name": name, "doc": doc}, file, default=str)
+            file.write(",\n")
+    blocked = elapsed = ttime.perf_counter() - start
+    results = {"json.dump": (blocked, elapsed, path.stat().st_size)}
+
+    exporter = DocumentExporter(directory, compress=compress)
+    start = ttime.perf_counter()
+    for name, doc in documents:
+        exporter(name, doc)
+    blocked = ttime.perf_counter() - start
+    exporter.flush()
+    elapsed = ttime.perf_counter() - start
+    path = exporter.files[documents[0][1]["uid"]]
+    results["DocumentExporter"] = (blocked, elapsed, path.stat().st_size)
+
+    print(f"    {len(documents)} documents of a {num_frames}-frame fly scan:")
+    for label, (blocked, elapsed, size) in results.items():
+        print(
+            f"    {label:17}: RE thread blocked {blocked:7.3f} s, "
+            f"written in {elapsed:7.3f} s ({len(documents) / elapsed:9.0f} docs/s, "
+            f"{size / elapsed / 1e6:6.1f} MB/s, {size / 1e6:.1f} MB)"
+        )
+    return results
+
+
+def benchmark_tiled_writing(
+    client=None, num_frames=10_000, frames_per_datum=10, latency=0.02
+):
+    """
+    Compare a synchronous and a buffered TiledWriter subscription.
+
+    Replays the documents of a `num_frames` fly scan as `collect_while_completing`
+    emits them (a `stream_datum` per stream resource every `frames_per_datum`
+    frames) and prints how long the RunEngine thread is blocked on writes, split
+    into the collection and the final flush on 'stop'.
+
+    Without `client`, every document costs `latency` seconds (a stand-in for
+    the HTTPS round-trip). To measure against a real server, start a local one
+    (`tiled serve catalog --temp --api-key secret`) and pass
+    `from_uri("http://localhost:8000", api_key="secret")`.
+    """
+
+    def make_callback():
+        if client is not None:
+            return TiledWriter(client)
+
+        def slow_callback(name, doc):
+            ttime.sleep(latency)
+
+        return slow_callback
+
+    documents = list(
+        synthetic_flyscan_documents(num_frames, frames_per_datum=frames_per_datum)
+    )
+    results = {}
+    for label, callback in [
+        ("synchronous", make_callback()),
+        ("buffered", BufferedTiledWriter(make_callback())),
+    ]:
+        start = ttime.perf_counter()
+        for name, doc in documents[:-1]:
+            callback(name, doc)
+        collection = ttime.perf_counter() - start
+        start = ttime.perf_counter()
+        callback(*documents[-1])
+        stop = ttime.perf_counter() - start
+        results[label] = (collection, stop)
+        print(
+            f"    {label:12}: blocked {collection:8.3f} s during collection, "
+            f"{stop:8.3f} s on stop ({len(documents)} documents)"
+        )
+        if isinstance(callback, BufferedTiledWriter):
+            print(f"    {'':12}  {callback.coalesced} stream_datum documents coalesced")
+    return results
+
+
+def benchmark_document_spool(
+    client=None, num_frames=10_000, frames_per_datum=10, latency=0.02, directory=None
+):
+    """
+    Replay a synthetic fly scan through a DocumentSpool drained into Tiled.
+
+    Prints how long the RunEngine thread is blocked (including the fsync on
+    'stop') and how long the drainer needs to deliver everything. Without
+    `client`, every delivered document costs `latency` seconds; pass the client
+    of a local server (`tiled serve catalog --temp --api-key secret`) to
+    measure against a real Tiled instance.
+    """
+    if client is not None:
+        callback = TiledWriter(client)
+    else:
+
+        def callback(name, doc):
+            ttime.sleep(latency)
+
+    documents = list(
+        synthetic_flyscan_documents(num_frames, frames_per_datum=frames_per_datum)
+    )
+    with tempfile.TemporaryDirectory(dir=directory) as tmp_dir:
+        spool = DocumentSpool(tmp_dir)
+        spool.subscribe(callback, consumer="benchmark")
+        start = ttime.perf_counter()
+        for name, doc in documents:
+            spool(name, doc)
+        blocked = ttime.perf_counter() - start
+        spool.wait_drained()
+        drained = ttime.perf_counter() - start
+        spool.close()
+    print(
+        f"    {len(documents)} documents: RunEngine blocked {blocked:.3f} s, "
+        f"delivered after {drained:.3f} s"
+    )
+    return blocked, drained
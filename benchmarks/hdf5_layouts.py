@@ -0,0 +1,150 @@
+"""
+Write and read speed of the HDF5 file layouts of the detectors.
+
+Not loaded at startup. Run it in a profile session (it uses `HDF5WriterConfig`
+and `HDF5_CODECS` of 10-kinetix.py)::
+
+    %run -i $PROFILE_DIR/benchmarks/hdf5_layouts.py
+    benchmark_hdf5_layouts(num_frames=500)
+"""
+
+import os
+import time as ttime
+from pathlib import Path
+
+import h5py
+import numpy as np
+
+from hex_profile.synthetic import synthetic_projections
+
+
+def hdf5_filter_kwargs(config):
+    """
+    The h5py `create_dataset` arguments compressing like the HDF5 plugin with `config`.
+    """
+    if config.codec == "none":
+        return {}
+    if config.codec == "zlib":
+        return {"compression": "gzip", "compression_opts": config.level}
+    # Registers the LZ4, bitshuffle and Blosc filters with h5py.
+    import hdf5plugin
+
+    if config.codec == "lz4":
+        return dict(hdf5plugin.LZ4())
+    if config.codec == "bslz4":
+        return dict(hdf5plugin.Bitshuffle(cname="lz4"))
+    shuffle = {
+        "None": hdf5plugin.Blosc.NOSHUFFLE,
+        "Byte": hdf5plugin.Blosc.SHUFFLE,
+        "Bit": hdf5plugin.Blosc.BITSHUFFLE,
+    }[config.shuffle]
+    _, compressor = HDF5_CODECS[config.codec]
+    return dict(
+        hdf5plugin.Blosc(cname=compressor.lower(), clevel=config.level, shuffle=shuffle)
+    )
+
+
+def benchmark_hdf5_layouts(
+    configs=None,
+    num_frames=500,
+    frame_shape=(1024, 1024),
+    directory="/tmp/hdf5-layout-benchmark",
+    num_sinograms=8,
+    keep_files=False,
+):
+    """
+    Compare the write speed and the projection and sinogram read speed of HDF5 layouts.
+
+    Writes `num_frames` synthetic 16-bit frames (see `synthetic_projections`)
+    one at a time, as the HDF5 plugin does, with every `HDF5WriterConfig` in
+    `configs`, and syncs the file to disk. Then reads 8 projections and
+    `num_sinograms` sinograms (one row of every frame) back. The reads come
+    from the page cache, so they measure the chunk layout and the
+    decompression, not the disk. Returns a list of dicts.
+    """
+    if configs is None:
+        configs = [
+            HDF5WriterConfig(),
+            HDF5WriterConfig(frames_per_chunk=16, rows_per_chunk=64),
+            HDF5WriterConfig(codec="bslz4"),
+            HDF5WriterConfig(codec="bslz4", frames_per_chunk=16, rows_per_chunk=64),
+            HDF5WriterConfig(codec="blosc-lz4"),
+            HDF5WriterConfig(
+                codec="zstd", level=3, frames_per_chunk=16, rows_per_chunk=64
+            ),
+        ]
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    frame_bytes = int(np.prod(frame_shape)) * 2
+    results = []
+    for i, config in enumerate(configs):
+        chunks = config.chunk_shape(frame_shape)
+        chunk_bytes = int(np.prod(chunks)) * 2
+        chunks_per_frame_group = -(-frame_shape[0] // chunks[1]) * -(
+            -frame_shape[1] // chunks[2]
+        )
+        path = directory / f"layout_{i}.h5"
+
+        t0 = ttime.monotonic()
+        # Like the HDF5 plugin, keep all chunks of the frames being written in the
+        # chunk cache.
+        with h5py.File(
+            path,
+            "w",
+            rdcc_nbytes=2 * chunks_per_frame_group * chunk_bytes,
+            rdcc_nslots=10007,
+        ) as f:
+            dataset = f.create_dataset(
+                "/entry/data/data",
+                shape=(num_frames, *frame_shape),
+                dtype=np.uint16,
+                chunks=chunks,
+                **hdf5_filter_kwargs(config),
+            )
+            for n, frame in enumerate(synthetic_projections(num_frames, frame_shape)):
+                dataset[n] = frame
+        with open(path, "rb+") as fh:
+            os.fsync(fh.fileno())
+        write_time = ttime.monotonic() - t0
+
+        with h5py.File(path, "r") as f:
+            dataset = f["/entry/data/data"]
+            t0 = ttime.monotonic()
+            for n in np.linspace(0, num_frames - 1, 8).astype(int):
+                dataset[n]
+            projection_time = (ttime.monotonic() - t0) / 8
+            t0 = ttime.monotonic()
+            for row in np.linspace(0, frame_shape[0] - 1, num_sinograms).astype(int):
+                dataset[:, row, :]
+            sinogram_time = (ttime.monotonic() - t0) / num_sinograms
+
+        results.append(
+            {
+                "config": config,
+                "chunks": chunks,
+                "ratio": num_frames * frame_bytes / path.stat().st_size,
+                "write_rate": num_frames * frame_bytes / write_time,
+                "frame_rate": num_frames / write_time,
+                "projection_time": projection_time,
+                "sinogram_time": sinogram_time,
+            }
+        )
+        if not keep_files:
+            path.unlink()
+
+    print(
+        f"{num_frames} frames of {frame_shape[0]} x {frame_shape[1]} uint16 "
+        f"({directory}):"
+    )
+    print(
+        f"    {'codec':10} {'chunks':>16} {'ratio':>6} {'write':>10} {'frames/s':>9} "
+        f"{'projection':>11} {'sinogram':>10}"
+    )
+    for result in results:
+        print(
+            f"    {result['config'].codec:10} {str(result['chunks']):>16} "
+            f"{result['ratio']:6.2f} {result['write_rate'] / 1e6:6.0f} MB/s "
+            f"{result['frame_rate']:9.0f} {result['projection_time'] * 1e3:8.1f} ms "
+            f"{result['sinogram_time'] * 1e3:7.1f} ms"
+        )
+    return results
@@ -0,0 +1,87 @@
+"""
+Redis round-trips caused by RE.md per run, with and without the local cache.
+
+Not loaded at startup. Run it in a profile session (it uses `RE`, the path
+providers and `run_path_snapshot`)::
+
+    %run -i $PROFILE_DIR/benchmarks/md_round_trips.py
+    benchmark_md_round_trips()
+"""
+
+import collections
+import time as ttime
+import uuid
+
+import redis
+from redis_json_dict import RedisJSONDict
+
+
+def benchmark_md_round_trips(
+    redis_client=None,
+    num_runs=10,
+    device_names=("panda1", "kinetix-det1", "kinetix-det3", "smpl_align_cam"),
+):
+    """
+    Count the Redis round-trips caused by RE.md per fly scan, with and without
+    the cache.
+
+    Every simulated run does what `tomo_flyscan` does with the metadata: the
+    RunEngine increments `scan_id` and copies RE.md into the start document,
+    the path and filename providers are called for every device (with the
+    per-run snapshot taken from the start document), and the prompt is
+    redrawn. The benchmark runs against a local Redis stand-in
+    (`redis.Redis("localhost")` by default) under its own key prefix and
+    swaps RE.md temporarily, so do not run it while a plan is running.
+    """
+    redis_client = redis_client or redis.Redis("localhost", 6379)
+    commands = collections.Counter()
+    execute_command = redis_client.execute_command
+
+    def counting_execute_command(*args, **kwargs):
+        commands[args[0]] += 1
+        return execute_command(*args, **kwargs)
+
+    redis_client.execute_command = counting_execute_command
+    prefix = "benchmark-md-round-trips:"
+    path_provider = ProposalNumYMDPathProvider(ScanIDFilenameProvider(uuid.uuid4))
+    original_md = RE.md
+    original_run_info = run_path_snapshot.current
+    results = {}
+    try:
+        for name, md in [
+            ("RedisJSONDict", RedisJSONDict(redis_client, prefix=prefix)),
+            ("CachedRedisJSONDict", CachedRedisJSONDict(redis_client, prefix=prefix)),
+        ]:
+            md.update(
+                {
+                    "cycle": "2024-2",
+                    "proposal": {"type": "General User"},
+                    "data_session": "pass-000000",
+                    "scan_id": 0,
+                }
+            )
+            RE.md = md
+            commands.clear()
+            start = ttime.perf_counter()
+            for _ in range(num_runs):
+                md["scan_id"] = RE.scan_id_source(md)
+                start_doc = {**md}
+                run_path_snapshot("start", start_doc)
+                for device_name in device_names:
+                    path_provider(device_name=device_name)
+                run_path_snapshot("stop", {})
+                md.get("data_session", "N/A")
+            elapsed = ttime.perf_counter() - start
+            results[name] = sum(commands.values()) / num_runs
+            print(
+                f"    {name:20}: {results[name]:6.1f} round-trips per run, "
+                f"{1e3 * elapsed / num_runs:8.3f} ms per run"
+            )
+            md.clear()
+            if isinstance(md, CachedRedisJSONDict):
+                md.close()
+    finally:
+        RE.md = original_md
+        run_path_snapshot.current = original_run_info
+        redis_client.execute_command = execute_command
+    return results
@@ -0,0 +1,103 @@
+"""
+Import time benchmark of the profile.
+
+Not loaded at startup. Run it in a profile session (it uses `file_loading_timer`)::
+
+    %run -i $PROFILE_DIR/benchmarks/startup_imports.py
+    benchmark_startup_imports()
+"""
+
+import json
+import subprocess
+import sys
+
+# Modules imported while loading the profile, in loading order...
+STARTUP_EAGER_IMPORTS = [
+    "epicscorelibs.path.pyepics",
+    "matplotlib.pyplot",
+    "nslsii",
+    "ophyd",
+    "redis",
+    "redis_json_dict",
+    "tiled.client",
+    "bluesky.run_engine",
+    "bluesky.callbacks.tiled_writer",
+    "ophyd_async.core",
+    "ophyd.areadetector",
+    "hextools.germ.ophyd",
+    "ophyd_async.fastcs.panda",
+    "ophyd_async.epics.adkinetix",
+    "ophyd_async.epics.advimba",
+]
+# ...and modules deferred with `lazy_import` or not imported at all any more.
+STARTUP_LAZY_IMPORTS = ["PIL.Image", "h5py", "databroker.v0"]
+
+
+def benchmark_startup_imports(save_baseline=False, top=15):
+    """
+    Measure the import time of the profile in a fresh interpreter.
+
+    The modules of STARTUP_EAGER_IMPORTS are imported in order, followed by the
+    ones of STARTUP_LAZY_IMPORTS, and the marginal time of every module is
+    reported, so the lazy ones show the seconds saved at startup. The slowest
+    modules by self time are taken from `python -X importtime`. The results are
+    compared with (or saved as) `import_baseline.json` in the startup report
+    directory, using the regression margins of `file_loading_timer`.
+    """
+    script = (
+        "import importlib, json, sys, time\n"
+        "times = {}\n"
+        "for name in sys.argv[1:]:\n"
+        "    start = time.perf_counter()\n"
+        "    try:\n"
+        "        importlib.import_module(name)\n"
+        "    except ImportError:\n"
+        "        continue\n"
+        "    times[name] = time.perf_counter() - start\n"
+        "print(json.dumps(times))\n"
+    )
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", script]
+        + STARTUP_EAGER_IMPORTS
+        + STARTUP_LAZY_IMPORTS,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = json.loads(proc.stdout.splitlines()[-1])
+
+    # Lines look like "import time:  self [us] | cumulative | imported package".
+    self_times = []
+    for line in proc.stderr.splitlines():
+        fields = line.removeprefix("import time:").split("|")
+        if len(fields) == 3 and fields[0].strip().isdigit():
+            self_times.append((int(fields[0]) * 1e-6, fields[2].strip()))
+    self_times.sort(reverse=True)
+
+    eager = sum(times.get(name, 0.0) for name in STARTUP_EAGER_IMPORTS)
+    lazy = sum(times.get(name, 0.0) for name in STARTUP_LAZY_IMPORTS)
+    print(f"Startup imports: {eager:.3f} s, deferred/removed imports: {lazy:.3f} s\n")
+    for name, elapsed in times.items():
+        deferred = " (deferred)" if name in STARTUP_LAZY_IMPORTS else ""
+        print(f"    {name:35}: {elapsed:8.3f} s{deferred}")
+    print("\nSlowest modules by self time:\n")
+    for elapsed, name in self_times[:top]:
+        print(f"    {name:35}: {elapsed:8.3f} s")
+
+    baseline_path = file_loading_timer.report_dir / "import_baseline.json"
+    if save_baseline:
+        baseline_path.parent.mkdir(parents=True, exist_ok=True)
+        baseline_path.write_text(json.dumps(times, indent=2))
+    elif baseline_path.exists():
+        baseline = json.loads(baseline_path.read_text())
+        for name, elapsed in times.items():
+            increase = elapsed - baseline.get(name, elapsed)
+            if (
+                increase > file_loading_timer.min_regression
+                and increase > file_loading_timer.regression_margin * baseline[name]
+            ):
+                print(
+                    f"\n  WARNING: importing {name} takes {elapsed:.3f} s, "
+                    f"{increase:.3f} s more than the baseline ({baseline[name]:.3f} s)."
+                )
+    return times
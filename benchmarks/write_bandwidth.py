@@ -0,0 +1,71 @@
+"""
+Write bandwidth of the detector file storage.
+
+Not loaded at startup. Run it in a profile session (it uses the detectors and
+sets `TOMO_WRITE_BANDWIDTH` of 85-fly-plans.py)::
+
+    %run -i $PROFILE_DIR/benchmarks/write_bandwidth.py
+    benchmark_write_bandwidth(set_default=True)
+"""
+
+import os
+import tempfile
+import time as ttime
+from pathlib import Path
+
+import numpy as np
+
+
+def benchmark_write_bandwidth(
+    directory=None,
+    size=2 * 2**30,
+    block_size=16 * 2**20,
+    detector=None,
+    set_default=False,
+):
+    """
+    Measure the sustained write bandwidth of the detector file storage, in bytes/s.
+
+    Writes `size` bytes of incompressible data in `block_size` blocks to a
+    temporary file in `directory` (by default the one the detector, kinetix1,
+    would write the next scan to, or its closest existing parent), syncs it
+    to disk and deletes it. Write more than the page cache can hold for a
+    realistic figure. With `set_default`, the result becomes
+    `TOMO_WRITE_BANDWIDTH`, used by the planners and the HDF5 queue sizing.
+    """
+    global TOMO_WRITE_BANDWIDTH
+    if directory is None:
+        detector = detector or kinetix1
+        try:
+            directory = detector._writer._path_provider(detector.name).directory_path
+        except KeyError:
+            # RE.md has no proposal yet.
+            directory = HEX_PROPOSAL_DIR_ROOT
+    directory = Path(directory)
+    while not directory.exists():
+        directory = directory.parent
+
+    block = (
+        np.random.default_rng().integers(0, 256, block_size, dtype=np.uint8).tobytes()
+    )
+    num_blocks = max(size // block_size, 1)
+    fd, path = tempfile.mkstemp(prefix=".write-benchmark-", dir=directory)
+    try:
+        t0 = ttime.monotonic()
+        for _ in range(num_blocks):
+            os.write(fd, block)
+        os.fsync(fd)
+        elapsed = ttime.monotonic() - t0
+    finally:
+        os.close(fd)
+        os.unlink(path)
+
+    bandwidth = num_blocks * block_size / elapsed
+    print(
+        f"Wrote {num_blocks * block_size / 2**30:.2f} GiB to {directory} "
+        f"in {elapsed:.2f} s: "
+        f"{bandwidth / 1e6:.0f} MB/s."
+    )
+    if set_default:
+        TOMO_WRITE_BANDWIDTH = bandwidth
+    return bandwidth
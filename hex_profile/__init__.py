@@ -0,0 +1,7 @@
+"""
+Importable modules of the HEX profile collection.
+
+The startup files are executed into one IPython namespace and cannot be
+imported. Code that is needed outside of a session (tests, benchmarks) lives in
+this package; 00-startup.py puts the profile directory on `sys.path`.
+"""
@@ -0,0 +1,144 @@
+import asyncio
+import concurrent.futures
+import functools
+import time as ttime
+
+import bluesky.plan_stubs as bps
+import bluesky.preprocessors as bpp
+from ophyd_async.core import Device as AsyncDevice
+
+DEVICE_CONNECTION_TIMEOUT = 10
+
+
+def root_device(obj):
+    """Return the top-level parent of an ophyd or ophyd-async (sub)device."""
+    while getattr(obj, "parent", None) is not None:
+        obj = obj.parent
+    return obj
+
+
+class DeviceRegistry:
+    """
+    Connect ophyd and ophyd-async devices concurrently in the background.
+
+    Devices are constructed without connecting and handed to `register`, which
+    schedules the connection on the bluesky event loop and returns immediately.
+    The startup files therefore finish without waiting on any PV, and the total
+    connection time is bounded by the slowest device instead of the sum of all
+    of them. Failures are printed as they happen and collected in `failures`;
+    plans using a failed device are refused by `preprocess` until `reconnect`
+    succeeds.
+
+    Parameters:
+    -----------
+    loop: asyncio.AbstractEventLoop
+        the (running) bluesky event loop, usually `RE.loop`
+    timeout: float
+        connection timeout per device, in seconds
+    source: callable, optional
+        returns where a device is registered from (the startup file being
+        loaded), recorded in `registered_in`
+    """
+
+    def __init__(self, loop, timeout=DEVICE_CONNECTION_TIMEOUT, source=None):
+        self._loop = loop
+        self._timeout = timeout
+        self._source = source
+        self._futures = {}
+        self._mock = {}
+        self.devices = {}
+        self.registered_in = {}
+        self.connect_times = {}
+        self.failures = {}
+
+    def register(self, device, mock=False):
+        """Start connecting `device` in the background and return it."""
+        self.devices[device.name] = device
+        self.registered_in[device.name] = self._source and self._source()
+        self._mock[device.name] = mock
+        self.failures.pop(device.name, None)
+        self._futures[device.name] = asyncio.run_coroutine_threadsafe(
+            self._connect(device, mock), self._loop
+        )
+        return device
+
+    def reconnect(self, *names):
+        """Retry the connection of the given (default: all failed) devices."""
+        for name in names or list(self.failures):
+            self.register(self.devices[name], mock=self._mock[name])
+
+    async def _connect(self, device, mock):
+        start = ttime.monotonic()
+        try:
+            if isinstance(device, AsyncDevice):
+                await device.connect(mock=mock, timeout=self._timeout)
+            elif not mock:
+                # ophyd v1 devices only offer a blocking wait, run it on a worker
+                # thread.
+                await self._loop.run_in_executor(
+                    None,
+                    functools.partial(
+                        device.wait_for_connection, timeout=self._timeout
+                    ),
+                )
+        except Exception as e:
+            self.failures[device.name] = e
+            print(f"\n  {device.name} is unavailable: {e!r}")
+        finally:
+            self.connect_times[device.name] = ttime.monotonic() - start
+
+    @property
+    def done(self):
+        return all(future.done() for future in self._futures.values())
+
+    def wait(self, timeout=None):
+        """Block until all pending connections finished. Do not call from a plan."""
+        concurrent.futures.wait(list(self._futures.values()), timeout=timeout)
+
+    def wait_for_connections(self):
+        """Plan stub waiting for the pending connections on the RunEngine loop."""
+        pending = [future for future in self._futures.values() if not future.done()]
+        if pending:
+            print(f"Waiting for {len(pending)} device(s) to finish connecting...")
+            yield from bps.wait_for(
+                [functools.partial(asyncio.wrap_future, future) for future in pending]
+            )
+
+    def check_device(self, obj):
+        """Raise if `obj` is (part of) a device whose connection failed."""
+        root = root_device(obj)
+        name = getattr(root, "name", None)
+        if name in self.failures and self.devices.get(name) is root:
+            raise RuntimeError(
+                f"{name} is unavailable ({self.failures[name]!r}), "
+                f"see device_registry.report() and device_registry.reconnect()."
+            )
+
+    def preprocess(self, plan):
+        """
+        RunEngine preprocessor making sure no plan starts before the devices
+        are connected, and that no plan uses a device which failed to connect.
+        """
+        yield from self.wait_for_connections()
+        if not self.failures:
+            return (yield from plan)
+
+        def check(msg):
+            if msg.obj is not None:
+                self.check_device(msg.obj)
+            return msg
+
+        return (yield from bpp.msg_mutator(plan, check))
+
+    def report(self):
+        """Print the connection state and time of every registered device."""
+        for name, future in self._futures.items():
+            if not future.done():
+                state = "connecting"
+            elif name in self.failures:
+                state = "FAILED"
+            else:
+                state = "connected"
+            elapsed = self.connect_times.get(name)
+            elapsed = "" if elapsed is None else f"{elapsed:.3f} s"
+            print(f"    {name:25}: {state:12} {elapsed}")
@@ -0,0 +1,840 @@
+"""
+Document buffering and spooling between the RunEngine and the remote services.
+"""
+
+import collections
+import fcntl
+import functools
+import gzip
+import json
+import os
+import queue
+import threading
+import time as ttime
+import types
+from pathlib import Path
+
+import orjson
+
+
+def merge_stream_datum(last, doc):
+    """
+    Merge two consecutive `stream_datum` documents of the same stream resource.
+
+    Returns a new document covering both index ranges, or None if `doc` does
+    not directly follow `last`.
+    """
+    if (
+        last["stream_resource"] != doc["stream_resource"]
+        or last["descriptor"] != doc["descriptor"]
+        or last["indices"]["stop"] != doc["indices"]["start"]
+        or last["seq_nums"]["stop"] != doc["seq_nums"]["start"]
+    ):
+        return None
+    # New dict: the documents are shared with the other subscribers.
+    return dict(
+        doc,
+        indices={"start": last["indices"]["start"], "stop": doc["indices"]["stop"]},
+        seq_nums={"start": last["seq_nums"]["start"], "stop": doc["seq_nums"]["stop"]},
+    )
+
+
+class BufferedTiledWriter:
+    """
+    Run a document callback (usually a TiledWriter) on a worker thread.
+
+    Documents are queued and posted in order from the worker, so the RunEngine
+    does not wait for an HTTPS request per document. Consecutive `stream_datum`
+    documents of the same stream resource that are still waiting in the queue
+    are merged into one covering the combined index range, which turns the
+    many small updates of a fly scan into a few large ones.
+
+    The queue holds at most `max_queue` documents; when it is full the
+    RunEngine blocks until the worker catches up (back-pressure instead of
+    unbounded memory). On a 'stop' document the RunEngine waits up to
+    `stop_timeout` seconds until everything queued so far is written, so a
+    finished run is complete in Tiled. Time spent waiting is accumulated in
+    `blocked_time` and `stop_wait_time`, failed documents in `errors`.
+
+    Parameters:
+    -----------
+    callback: callable
+        the wrapped callback, e.g. `TiledWriter(client)`
+    max_queue: int
+        maximum number of queued documents
+    stop_timeout: float
+        maximum time to wait for the queue to drain on 'stop', None to wait forever
+    """
+
+    def __init__(self, callback, max_queue=10_000, stop_timeout=60):
+        self.callback = callback
+        self.max_queue = max_queue
+        self.stop_timeout = stop_timeout
+        self.blocked_time = 0.0
+        self.stop_wait_time = 0.0
+        self.coalesced = 0
+        self.errors = []
+        self._queue = collections.deque()  # [name, doc] lists, merged in place
+        self._last_datum = {}  # stream resource uid -> its last queued entry
+        self._busy = False
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(
+            target=self._worker, daemon=True, name="buffered-tiled-writer"
+        )
+        self._thread.start()
+
+    def __call__(self, name, doc):
+        with self._condition:
+            if name == "stream_datum" and self._coalesce(doc):
+                return
+            if len(self._queue) >= self.max_queue:
+                start = ttime.perf_counter()
+                self._condition.wait_for(lambda: len(self._queue) < self.max_queue)
+                self.blocked_time += ttime.perf_counter() - start
+            entry = [name, doc]
+            self._queue.append(entry)
+            if name == "stream_datum":
+                self._last_datum[doc["stream_resource"]] = entry
+            else:
+                self._last_datum.clear()
+            self._condition.notify_all()
+        if name == "stop":
+            start = ttime.perf_counter()
+            if not self.flush(self.stop_timeout):
+                print(
+                    f"\n  Tiled writing did not finish within {self.stop_timeout} s, "
+                    f"{len(self._queue)} document(s) still queued."
+                )
+            self.stop_wait_time += ttime.perf_counter() - start
+
+    def _coalesce(self, doc):
+        # Merge with the last queued stream_datum of the same stream resource, unless
+        # another kind of document was queued since (the order of those matters).
+        entry = self._last_datum.get(doc["stream_resource"])
+        if entry is None:
+            return False
+        merged = merge_stream_datum(entry[1], doc)
+        if merged is None:
+            return False
+        entry[1] = merged
+        self.coalesced += 1
+        return True
+
+    def flush(self, timeout=None):
+        """Block until all queued documents are written, return False on timeout."""
+        with self._condition:
+            return self._condition.wait_for(
+                lambda: not self._queue and not self._busy, timeout=timeout
+            )
+
+    def _worker(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._queue)
+                entry = self._queue.popleft()
+                name, doc = entry
+                if (
+                    name == "stream_datum"
+                    and self._last_datum.get(doc["stream_resource"]) is entry
+                ):
+                    del self._last_datum[doc["stream_resource"]]
+                self._busy = True
+                self._condition.notify_all()
+            try:
+                self.callback(name, doc)
+            except Exception as e:
+                self.errors.append((name, doc.get("uid"), e))
+                print(f"\n  Writing the '{name}' document to Tiled failed: {e!r}")
+            finally:
+                with self._condition:
+                    self._busy = False
+                    self._condition.notify_all()
+
+
+class DocumentSpool:
+    """
+    Durable on-disk spool between the RunEngine and the remote document services.
+
+    The RunEngine subscribes the spool itself: a document is serialized and
+    appended to an in-memory buffer, which a writer thread appends to the
+    current segment file (`<directory>/segments/<first seq>.ndjson`) and fsyncs
+    every `fsync_interval` seconds. Only the 'stop' document waits until the
+    run is on disk. Consumers are attached with `subscribe`, same as to the
+    RunEngine, and each one is fed by its own `SpoolDrainer` thread, in order,
+    from the durable records only. While Tiled or Kafka is down, delivery is
+    retried with a back-off until the service is back, without slowing down
+    the RunEngine.
+
+    Only one process can use a spool directory at a time, a second one gets a
+    RuntimeError. The position of every consumer is committed to
+    `<directory>/offsets/<consumer>.json` and draining resumes from there after
+    a restart. Delivery is at-least-once: a run that was open at the last
+    commit is replayed from its 'start' (see `SpoolDrainer`). Segments consumed
+    by all consumers are deleted.
+
+    Parameters:
+    -----------
+    directory: str or Path
+        spool directory, on a local disk
+    segment_size: int
+        size in bytes after which a new segment file is started
+    fsync_interval: float
+        maximum time in seconds between writing a document and its fsync
+    max_buffer: int
+        size in bytes of unwritten documents above which the RunEngine waits for
+        the disk
+    """
+
+    def __init__(
+        self,
+        directory,
+        segment_size=64 * 2**20,
+        fsync_interval=0.2,
+        max_buffer=64 * 2**20,
+    ):
+        self.directory = Path(directory)
+        self.segment_size = segment_size
+        self.fsync_interval = fsync_interval
+        self.max_buffer = max_buffer
+        self.blocked_time = 0.0
+        self.drainers = {}
+        self._segments_dir = self.directory / "segments"
+        self._offsets_dir = self.directory / "offsets"
+        self._segments_dir.mkdir(parents=True, exist_ok=True)
+        self._offsets_dir.mkdir(parents=True, exist_ok=True)
+        self._lock_file = open(self.directory / "lock", "w")
+        try:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            self._lock_file.close()
+            raise RuntimeError(
+                f"The document spool {self.directory} is used by another process."
+            )
+        self._condition = threading.Condition()
+        self._buffer = []
+        self._buffer_size = 0
+        self._flush_requested = False
+        self._closed = False
+        self._seq = self.durable_seq = self._recover()
+        self._file = None
+        self._file_size = 0
+        self._thread = threading.Thread(
+            target=self._writer, daemon=True, name="document-spool"
+        )
+        self._thread.start()
+
+    def segments(self):
+        """Sorted list of (first seq, path) of the segment files."""
+        return sorted(
+            (int(path.stem), path) for path in self._segments_dir.glob("*.ndjson")
+        )
+
+    def _recover(self):
+        # Drop a record torn by a crash and return the last complete sequence number.
+        segments = self.segments()
+        if not segments:
+            return 0
+        first, path = segments[-1]
+        data = path.read_bytes()
+        end = data.rfind(b"\n") + 1
+        if end < len(data):
+            print(
+                f"Dropping {len(data) - end} byte(s) of an incomplete document "
+                f"from {path}."
+            )
+            with open(path, "r+b") as file:
+                file.truncate(end)
+        if end == 0:
+            return first - 1
+        last_record = data[data.rfind(b"\n", 0, end - 1) + 1 : end]
+        return orjson.loads(last_record)[0]
+
+    def __call__(self, name, doc):
+        with self._condition:
+            self._seq += 1
+            seq = self._seq
+            record = orjson.dumps(
+                [seq, name, doc],
+                default=str,
+                option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_APPEND_NEWLINE,
+            )
+            if self._buffer_size > self.max_buffer:
+                start = ttime.perf_counter()
+                self._flush_requested = True
+                self._condition.notify_all()
+                self._condition.wait_for(lambda: self._buffer_size <= self.max_buffer)
+                self.blocked_time += ttime.perf_counter() - start
+            self._buffer.append(record)
+            self._buffer_size += len(record)
+        if name == "stop":
+            self.flush()
+
+    def flush(self, timeout=None):
+        """Block until all documents received so far are on disk."""
+        with self._condition:
+            seq = self._seq
+            self._flush_requested = True
+            self._condition.notify_all()
+            return self._condition.wait_for(
+                lambda: self.durable_seq >= seq, timeout=timeout
+            )
+
+    def _writer(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(
+                    lambda: self._flush_requested or self._closed,
+                    timeout=self.fsync_interval,
+                )
+                self._flush_requested = False
+                buffer, self._buffer = self._buffer, []
+                self._buffer_size = 0
+                seq = self._seq
+                self._condition.notify_all()
+                if self._closed and not buffer:
+                    break
+            if not buffer:
+                continue
+            first_seq = seq - len(buffer) + 1
+            try:
+                self._write(first_seq, buffer)
+            except OSError as e:
+                # Keep the documents and retry with the next batch.
+                print(f"\n  Writing to the document spool failed: {e!r}")
+                with self._condition:
+                    self._buffer[:0] = buffer
+                    self._buffer_size += sum(len(record) for record in buffer)
+                ttime.sleep(1)
+                continue
+            with self._condition:
+                self.durable_seq = seq
+                self._condition.notify_all()
+
+    def _write(self, first_seq, records):
+        if self._file is not None and self._file_size > self.segment_size:
+            self._file.close()
+            self._file = None
+            self.prune()
+        if self._file is None:
+            segments = self.segments()
+            if segments and segments[-1][1].stat().st_size < self.segment_size:
+                # Continue the last segment after a restart.
+                path = segments[-1][1]
+            else:
+                path = self._segments_dir / f"{first_seq:012d}.ndjson"
+            self._file = open(path, "ab")
+            self._file_size = self._file.tell()
+        for record in records:
+            self._file.write(record)
+            self._file_size += len(record)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def prune(self):
+        """Delete the segments already delivered to every consumer."""
+        if not self.drainers:
+            return
+        delivered = min(drainer.committed_seq for drainer in self.drainers.values())
+        segments = self.segments()
+        for (first, path), (next_first, _) in zip(segments, segments[1:]):
+            if next_first - 1 <= delivered:
+                path.unlink(missing_ok=True)
+
+    def subscribe(self, func, name="all", consumer=None, **kwargs):
+        """
+        Feed the spooled documents to `func`, like `RE.subscribe`.
+
+        `consumer` names the offset file and must stay the same across sessions;
+        it defaults to the name of the callback's type. Other keyword arguments
+        are passed to the `SpoolDrainer`.
+        """
+        consumer = consumer or getattr(func, "__name__", type(func).__name__)
+        if consumer in self.drainers:
+            raise ValueError(f"A consumer named {consumer!r} is already subscribed.")
+        self.drainers[consumer] = SpoolDrainer(self, consumer, func, name, **kwargs)
+        return consumer
+
+    def subscriber(self, consumer):
+        """
+        Object with a `subscribe` method for APIs expecting a RunEngine (e.g. Kafka).
+        """
+        return types.SimpleNamespace(
+            subscribe=functools.partial(self.subscribe, consumer=consumer)
+        )
+
+    def unsubscribe(self, token):
+        self.drainers.pop(token).stop()
+
+    def close(self):
+        """Write the pending documents and stop the writer and the drainers."""
+        for consumer in list(self.drainers):
+            self.unsubscribe(consumer)
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._thread.join()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._lock_file.close()
+
+    def wait_drained(self, timeout=None):
+        """
+        Block until every consumer got all documents on disk, return False on timeout.
+        """
+        deadline = None if timeout is None else ttime.monotonic() + timeout
+        if not self.flush(timeout):
+            return False
+        for drainer in list(self.drainers.values()):
+            remaining = (
+                None if deadline is None else max(0, deadline - ttime.monotonic())
+            )
+            if not drainer.wait(self.durable_seq, remaining):
+                return False
+        return True
+
+    def status(self):
+        """Print the number of documents every consumer is behind."""
+        print(f"    {'spooled':25}: seq {self._seq}, on disk {self.durable_seq}")
+        for consumer, drainer in self.drainers.items():
+            state = (
+                f" (failing: {drainer.error!r})" if drainer.error is not None else ""
+            )
+            print(
+                f"    {consumer:25}: seq {drainer.delivered_seq}, "
+                f"{self.durable_seq - drainer.delivered_seq} behind, "
+                f"{len(drainer.dropped)} dropped{state}"
+            )
+
+
+# Exception types (or bases) of an unreachable service, matched by name so that the
+# client libraries do not have to be imported here (httpx is used by Tiled).
+TRANSIENT_ERROR_TYPES = {"TransportError", "TimeoutException"}
+
+
+def is_transient_error(e):
+    """True for errors worth retrying until the service is back (network, overload)."""
+    if isinstance(e, (OSError, TimeoutError, BufferError)):
+        return True
+    if any(cls.__name__ in TRANSIENT_ERROR_TYPES for cls in type(e).__mro__):
+        return True
+    status = getattr(getattr(e, "response", None), "status_code", None)
+    return isinstance(status, int) and (status >= 500 or status in (408, 429))
+
+
+def is_duplicate_error(e):
+    """True if the service rejected a document because it already has it."""
+    status = getattr(getattr(e, "response", None), "status_code", None)
+    return status == 409 or "already exists" in str(e).lower()
+
+
+class SpoolDrainer:
+    """
+    Deliver the documents of a DocumentSpool to one consumer from a worker thread.
+
+    With `coalesce`, the `stream_datum` documents of a stream resource read in
+    one batch are merged before delivery, as long as no other kind of document
+    comes in between.
+
+    A consumer only gets the documents of runs whose 'start' it received. The
+    offset file records the 'start' of the run open at the committed position,
+    and after a restart draining resumes from that 'start', so a new consumer
+    (e.g. a fresh TiledWriter) sees the whole run again. If the consumer
+    answers that the 'start' already exists (the run was partially delivered
+    before the restart), it cannot continue the run and the remaining
+    documents of the run are dropped with a warning. Any other document that
+    already exists counts as delivered.
+
+    Errors of an unreachable service (see `is_transient_error`) are retried
+    with a back-off until it is back. Other errors are retried up to
+    `max_attempts` times, then the document is dropped and recorded in
+    `dropped`. `skip` drops the document currently failing right away.
+    """
+
+    def __init__(
+        self,
+        spool,
+        consumer,
+        func,
+        name="all",
+        coalesce=True,
+        commit_every=1000,
+        max_attempts=3,
+        retry_delay=1,
+        max_retry_delay=60,
+    ):
+        self.spool = spool
+        self.consumer = consumer
+        self.func = func
+        self.name = name
+        self.coalesce = coalesce
+        self.commit_every = commit_every
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.error = None
+        self.dropped = []
+        self._offset_path = spool._offsets_dir / f"{consumer}.json"
+        if self._offset_path.exists():
+            offset = json.loads(self._offset_path.read_text())
+        else:
+            # A new consumer starts with the next document, not with the history.
+            offset = {"seq": spool.durable_seq}
+        if offset.get("run_start") is None:
+            self.committed_seq = offset["seq"]
+        else:
+            # Replay the run open at the last commit from its 'start'.
+            self.committed_seq = offset["run_start"] - 1
+        self.delivered_seq = self.committed_seq
+        self._committed_offset = offset["seq"]
+        self._run = None  # (seq, uid) of the 'start' of the open run
+        self._run_received = False  # the consumer got the 'start' of the open run
+        self._dropping = False
+        self._stopped = threading.Event()
+        self._skip = threading.Event()
+        self._thread = threading.Thread(
+            target=self._drain, daemon=True, name=f"spool-drainer-{consumer}"
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        with self.spool._condition:
+            self.spool._condition.notify_all()
+        if threading.current_thread() is not self._thread:
+            self._thread.join()
+
+    def skip(self):
+        """Give up delivering the document that keeps failing."""
+        self._skip.set()
+
+    def wait(self, seq, timeout=None):
+        with self.spool._condition:
+            return self.spool._condition.wait_for(
+                lambda: self.delivered_seq >= seq, timeout=timeout
+            )
+
+    def _commit(self):
+        if self._committed_offset == self.delivered_seq:
+            return
+        run_start = None if self._run is None else self._run[0]
+        tmp_path = self._offset_path.with_suffix(".tmp")
+        tmp_path.write_text(
+            json.dumps({"seq": self.delivered_seq, "run_start": run_start})
+        )
+        os.replace(tmp_path, self._offset_path)
+        self._committed_offset = self.delivered_seq
+        # Segments are kept from the 'start' of the open run on, for a replay.
+        self.committed_seq = self.delivered_seq if run_start is None else run_start - 1
+
+    def _records(self):
+        # Yield batches of durable records after `delivered_seq`, following the
+        # segments.
+        file = None
+        try:
+            while not self._stopped.is_set():
+                if file is None:
+                    file = self._open_segment()
+                    if file is None:
+                        self._wait(lambda: self.spool.segments())
+                        continue
+                batch = []
+                durable_seq = self.spool.durable_seq
+                while len(batch) < self.commit_every:
+                    position = file.tell()
+                    line = file.readline()
+                    if not line.endswith(b"\n"):
+                        file.seek(position)
+                        break
+                    seq, name, doc = orjson.loads(line)
+                    if seq > durable_seq:
+                        file.seek(position)
+                        break
+                    if seq > self.delivered_seq:
+                        batch.append((seq, name, doc))
+                if batch:
+                    yield batch
+                elif any(
+                    first > self.delivered_seq for first, _ in self.spool.segments()
+                ):
+                    # The end of a completed segment, continue with the next one.
+                    file.close()
+                    file = None
+                else:
+                    self._wait(lambda: self.spool.durable_seq > durable_seq)
+        finally:
+            if file is not None:
+                file.close()
+
+    def _open_segment(self):
+        # Open the segment containing the record after `delivered_seq`.
+        segments = self.spool.segments()
+        if not segments:
+            return None
+        previous = [
+            segment for segment in segments if segment[0] <= self.delivered_seq + 1
+        ]
+        if not previous:
+            print(
+                f"\n  Documents {self.delivered_seq + 1} to {segments[0][0] - 1} were "
+                f"deleted from the spool before being delivered to {self.consumer}."
+            )
+        return open((previous or segments)[-1][1], "rb")
+
+    def _wait(self, predicate, timeout=1.0):
+        with self.spool._condition:
+            self.spool._condition.wait_for(
+                lambda: predicate() or self._stopped.is_set(), timeout=timeout
+            )
+
+    def _coalesce(self, batch):
+        merged = []
+        last_datum = {}  # stream resource uid -> index in `merged`
+        for seq, name, doc in batch:
+            if name != "stream_datum":
+                last_datum.clear()
+            elif doc["stream_resource"] in last_datum:
+                index = last_datum[doc["stream_resource"]]
+                doc_ = merge_stream_datum(merged[index][2], doc)
+                if doc_ is not None:
+                    merged[index] = (seq, name, doc_)
+                    continue
+            merged.append((seq, name, doc))
+            if name == "stream_datum":
+                last_datum[doc["stream_resource"]] = len(merged) - 1
+        return merged
+
+    def _deliver(self, name, doc):
+        # Return "delivered", "duplicate" or "dropped", None if stopped.
+        delay = self.retry_delay
+        attempts = 0
+        try:
+            while not self._stopped.is_set():
+                try:
+                    self.func(name, doc)
+                except Exception as e:
+                    if is_duplicate_error(e):
+                        self._resumed()
+                        return "duplicate"
+                    attempts += 1
+                    if self._skip.is_set() or (
+                        not is_transient_error(e) and attempts >= self.max_attempts
+                    ):
+                        self.error = None
+                        self.dropped.append((name, doc.get("uid"), e))
+                        print(
+                            f"\n  Dropped the '{name}' document for {self.consumer}: "
+                            f"{e!r}"
+                        )
+                        return "dropped"
+                    if self.error is None:
+                        print(
+                            "\n  Delivering spooled documents to "
+                            f"{self.consumer} failed ({e!r}), retrying in the "
+                            "background."
+                        )
+                    self.error = e
+                    self._stopped.wait(delay)
+                    delay = min(2 * delay, self.max_retry_delay)
+                    continue
+                self._resumed()
+                return "delivered"
+        finally:
+            self._skip.clear()
+
+    def _resumed(self):
+        if self.error is not None:
+            print(f"\n  Delivering spooled documents to {self.consumer} resumed.")
+            self.error = None
+
+    def _process(self, name, doc):
+        # Deliver a document, unless the consumer did not get the 'start' of its run.
+        if self.name not in ("all", "start"):
+            # Filtered consumers never see the 'start' documents.
+            self._deliver(name, doc)
+        elif name == "start":
+            result = self._deliver(name, doc)
+            self._run_received = result == "delivered"
+            if result == "duplicate":
+                print(
+                    f"\n  Run {doc['uid']} was partially delivered to {self.consumer} "
+                    "before a restart, dropping its remaining documents."
+                )
+        elif self._run is not None and self._run_received:
+            self._deliver(name, doc)
+        elif not self._dropping:
+            self._dropping = True
+            if self._run is None:
+                print(
+                    f"\n  Dropping documents of a run whose 'start' {self.consumer} "
+                    "did not receive."
+                )
+
+    def _set_delivered(self, seq):
+        with self.spool._condition:
+            self.delivered_seq = seq
+            self.spool._condition.notify_all()
+
+    def _drain(self):
+        for batch in self._records():
+            if self.coalesce:
+                batch = self._coalesce(batch)
+            for seq, name, doc in batch:
+                if name == "start":
+                    self._run = (seq, doc["uid"])
+                    self._run_received = self._dropping = False
+                if self.name in ("all", name):
+                    self._process(name, doc)
+                if self._stopped.is_set():
+                    return
+                if name == "stop":
+                    # Everything before a 'stop' is delivered: merged documents never
+                    # cross another kind of document.
+                    self._run = None
+                    self._run_received = self._dropping = False
+                    self._set_delivered(seq)
+                    self._commit()
+                    self.spool.prune()
+            self._set_delivered(batch[-1][0])
+            self._commit()
+
+
+class DocumentExporter:
+    """
+    Stream the documents of every run into its own newline-delimited JSON file.
+
+    The RunEngine thread only puts the documents on a bounded queue; a worker
+    thread serializes them with orjson and writes them through a buffered (and
+    optionally gzip-compressed) file, flushed every `flush_interval` seconds
+    and closed on the run's 'stop' document. The file of a run is
+    `<directory>/scan_<scan_id>_<uid[:8]>.ndjson[.gz]`, one
+    `{"name": ..., "doc": ...}` object per line. If the worker falls behind by
+    `max_queue` documents, the RunEngine blocks until it catches up; the time
+    spent waiting is accumulated in `blocked_time`. Nothing happens before the
+    first document: the worker thread starts then, and the directory is created
+    with the first file.
+
+    Parameters:
+    -----------
+    directory: str or Path
+        directory of the exported files, created if needed
+    compress: bool
+        gzip the files (level 1, favouring speed over size)
+    max_queue: int
+        number of documents buffered before the RunEngine is blocked
+    flush_interval: float
+        maximum time in seconds documents stay in the file buffer
+    """
+
+    def __init__(
+        self, directory, compress=False, max_queue=100_000, flush_interval=1.0
+    ):
+        self.directory = Path(directory)
+        self.compress = compress
+        self.flush_interval = flush_interval
+        self.blocked_time = 0.0
+        self.files = {}  # run start uid -> path of the exported file
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._open = {}  # run start uid -> open file
+        self._runs = {}  # uid of a descriptor/resource/stream_resource -> run start uid
+        self._thread = None
+        self._thread_lock = threading.Lock()
+
+    def _start_worker(self):
+        with self._thread_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._worker, daemon=True, name="document-exporter"
+                )
+                self._thread.start()
+
+    def __call__(self, name, doc):
+        if self._thread is None:
+            self._start_worker()
+        try:
+            self._queue.put_nowait((name, doc))
+        except queue.Full:
+            start = ttime.perf_counter()
+            self._queue.put((name, doc))
+            self.blocked_time += ttime.perf_counter() - start
+
+    def flush(self, timeout=None):
+        """Block until all queued documents are written to disk."""
+        if self._thread is None:
+            return True
+        done = threading.Event()
+        self._queue.put(("flush", done))
+        return done.wait(timeout)
+
+    def _run_of(self, name, doc):
+        if name == "start":
+            return doc["uid"]
+        if name in ("descriptor", "resource", "stream_resource", "stop"):
+            run = doc["run_start"]
+            if name != "stop":
+                self._runs[doc["uid"]] = run
+            return run
+        if name == "event_page" or name == "event":
+            return self._runs.get(doc["descriptor"])
+        if name == "datum" or name == "datum_page":
+            return self._runs.get(doc["resource"])
+        if name == "stream_datum":
+            return self._runs.get(doc["stream_resource"])
+        return None
+
+    def _open_file(self, doc):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        filename = f"scan_{doc.get('scan_id', 0):05d}_{doc['uid'][:8]}.ndjson"
+        if self.compress:
+            path = self.directory / f"{filename}.gz"
+            file = gzip.open(path, "wb", compresslevel=1)
+        else:
+            path = self.directory / filename
+            file = open(path, "wb", buffering=1 << 20)
+        self.files[doc["uid"]] = path
+        return file
+
+    def _close_run(self, run):
+        self._open.pop(run).close()
+        # Forget the descriptors/resources of the finished run.
+        self._runs = {uid: r for uid, r in self._runs.items() if r != run}
+
+    def _worker(self):
+        last_flush = ttime.monotonic()
+        while True:
+            try:
+                name, doc = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                name, doc = None, None
+            try:
+                if name == "flush":
+                    for file in self._open.values():
+                        file.flush()
+                    doc.set()
+                elif name is not None:
+                    self._write(name, doc)
+            except Exception as e:
+                print(f"\n  Exporting the '{name}' document failed: {e!r}")
+            # Flush when idle or at the latest after `flush_interval`, not after every
+            # document: flushing a gzip stream ends a compression block.
+            if name is None or ttime.monotonic() - last_flush > self.flush_interval:
+                for file in self._open.values():
+                    file.flush()
+                last_flush = ttime.monotonic()
+
+    def _write(self, name, doc):
+        run = self._run_of(name, doc)
+        if name == "start":
+            self._open[run] = self._open_file(doc)
+        file = self._open.get(run)
+        if file is None:
+            return
+        file.write(
+            orjson.dumps(
+                {"name": name, "doc": doc},
+                default=str,
+                option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_APPEND_NEWLINE,
+            )
+        )
+        if name == "stop":
+            self._close_run(run)
@@ -0,0 +1,105 @@
+"""
+Shutters of the beamline.
+"""
+
+import threading
+
+from ophyd import Component as Cpt
+from ophyd import Device, DeviceStatus, EpicsSignal, EpicsSignalRO, Kind
+
+
+class HEXPhotonShutter(Device):
+    """
+    Photon shutter whose `set("Open")`/`set("Close")` completes when `status`
+    confirms it.
+
+    The command PV is written and the returned status finishes as soon as the
+    position PV reads the target state. If the position PV did not change at
+    all `retry_period` seconds after a command (the command was lost), the
+    command is sent again, at most `max_attempts` times in total. Once the
+    shutter reacts, or after the last attempt, nothing is sent any more and
+    the status fails if the target state is not reached within `timeout`
+    seconds.
+
+    `status` reads the position as an enum index, as the former
+    `ph_shutter_status` signal did; `position()` returns it as a string.
+
+    The two button shutter class from nslsii does not agree with HEX's photon
+    shutter, potentially because of a minor EPS alarm state in the open
+    position, so only the position PV is used to decide.
+    """
+
+    open_cmd = Cpt(EpicsSignal, "Cmd:Opn-Cmd", string=False, kind=Kind.omitted)
+    close_cmd = Cpt(EpicsSignal, "Cmd:Cls-Cmd", string=False, kind=Kind.omitted)
+    status = Cpt(EpicsSignalRO, "Pos-Sts", string=False)
+
+    open_str = "Open"
+    close_str = "Close"
+    # Values of the position PV
+    open_val = "Open"
+    close_val = "Not Open"
+
+    def __init__(self, *args, retry_period=2.0, max_attempts=3, timeout=15.0, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.retry_period = retry_period
+        self.max_attempts = max_attempts
+        self.timeout = timeout
+        self._set_st = None
+
+    def position(self):
+        """The state of the position PV as a string, e.g. "Open"."""
+        return self.status.get(as_string=True)
+
+    def set(self, value):
+        if self._set_st is not None and not self._set_st.done:
+            raise RuntimeError(f"Trying to set {self.name} while a set is in progress.")
+        cmd_map = {self.open_str: self.open_cmd, self.close_str: self.close_cmd}
+        target_map = {self.open_str: self.open_val, self.close_str: self.close_val}
+        if value not in cmd_map:
+            raise ValueError(
+                f"{self.name} can only be set to {list(cmd_map)}, not {value!r}."
+            )
+        cmd_sig, target_val = cmd_map[value], target_map[value]
+
+        st = DeviceStatus(self, timeout=self.timeout)
+        self._set_st = st
+        attempts = 0
+        moved = False
+        retry_timer = None
+
+        def send_command():
+            nonlocal attempts, retry_timer
+            # Resend only while the shutter shows no reaction at all; after the
+            # last attempt, the DeviceStatus timeout fails the move.
+            if st.done or moved or attempts >= self.max_attempts:
+                return
+            attempts += 1
+            if attempts > 1:
+                print(f"  {self.name} did not react, sending the command again...")
+            cmd_sig.put(1)
+            retry_timer = threading.Timer(self.retry_period, send_command)
+            retry_timer.daemon = True
+            retry_timer.start()
+
+        def status_changed(value, old_value=None, **kwargs):
+            nonlocal moved
+            if old_value is not None and value != old_value:
+                # The shutter got the command, do not send it again.
+                moved = True
+            if isinstance(value, int):
+                value = self.status.enum_strs[value]
+            if value == target_val and not st.done:
+                st.set_finished()
+
+        def cleanup(status):
+            self.status.clear_sub(status_changed)
+            if retry_timer is not None:
+                retry_timer.cancel()
+
+        st.add_callback(cleanup)
+        self.status.subscribe(status_changed, run=False)
+        if self.position() == target_val:
+            st.set_finished()
+        else:
+            send_command()
+        return st
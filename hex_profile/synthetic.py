@@ -0,0 +1,110 @@
+"""
+Synthetic data replayed by the benchmarks and the tests, without any hardware.
+"""
+
+import time as ttime
+import uuid
+
+import numpy as np
+
+
+def synthetic_flyscan_documents(
+    num_frames=10_000,
+    detector="kinetix-det1",
+    panda_datasets=("INENC1.VAL", "CALC2.OUT", "COUNTER1.OUT"),
+    frames_per_datum=1,
+):
+    """
+    Generate the documents of a `tomo_flyscan`-like run without any hardware.
+
+    A detector and the PandA datasets are declared as external streams, with
+    one `stream_datum` per stream resource every `frames_per_datum` frames
+    (1 is the worst case, collect_while_completing usually batches more).
+    """
+    run_uid = str(uuid.uuid4())
+    now = ttime.time()
+    yield "start", {
+        "uid": run_uid,
+        "time": now,
+        "scan_id": 0,
+        "plan_name": "tomo_flyscan",
+        "num_points": num_frames,
+    }
+    keys = {detector: [1, 3200, 3200]} | {
+        f"panda1-{dataset}": [1] for dataset in panda_datasets
+    }
+    descriptor_uid = str(uuid.uuid4())
+    yield "descriptor", {
+        "uid": descriptor_uid,
+        "run_start": run_uid,
+        "time": now,
+        "name": "primary",
+        "data_keys": {
+            key: {
+                "source": "synthetic",
+                "dtype": "array",
+                "dtype_numpy": "<u2" if key == detector else "<f8",
+                "shape": shape,
+                "external": "STREAM:",
+            }
+            for key, shape in keys.items()
+        },
+        "object_keys": {key: [key] for key in keys},
+    }
+    resources = []
+    for key in keys:
+        resource_uid = str(uuid.uuid4())
+        resources.append(resource_uid)
+        yield "stream_resource", {
+            "uid": resource_uid,
+            "run_start": run_uid,
+            "data_key": key,
+            "mimetype": "application/x-hdf5",
+            "uri": f"file://localhost/tmp/synthetic/{key}.h5",
+            "parameters": {"dataset": f"/entry/data/{key}", "chunk_shape": [1]},
+        }
+    for start in range(0, num_frames, frames_per_datum):
+        stop = min(start + frames_per_datum, num_frames)
+        for resource_uid in resources:
+            yield "stream_datum", {
+                "uid": f"{resource_uid}/{start}",
+                "stream_resource": resource_uid,
+                "descriptor": descriptor_uid,
+                "seq_nums": {"start": start + 1, "stop": stop + 1},
+                "indices": {"start": start, "stop": stop},
+            }
+    yield "stop", {
+        "uid": str(uuid.uuid4()),
+        "run_start": run_uid,
+        "time": ttime.time(),
+        "exit_status": "success",
+        "reason": "",
+        "num_events": {"primary": num_frames},
+    }
+
+
+def synthetic_projections(num_frames, frame_shape, num_distinct=8, seed=0):
+    """
+    16-bit projections of a rotating off-center cylinder in a Gaussian beam, with
+    Poisson noise.
+
+    Only `num_distinct` noisy frames are generated, the others repeat them.
+    """
+    rng = np.random.default_rng(seed)
+    rows, cols = np.mgrid[: frame_shape[0], : frame_shape[1]]
+    beam = 3000 * np.exp(
+        -((rows - frame_shape[0] / 2) ** 2 + (cols - frame_shape[1] / 2) ** 2)
+        / (0.5 * max(frame_shape) ** 2)
+    )
+    radius = frame_shape[1] / 8
+    distinct = []
+    for i in range(num_distinct):
+        center = frame_shape[1] / 2 + frame_shape[1] / 4 * np.cos(
+            np.pi * i / num_distinct
+        )
+        thickness = 2 * np.sqrt(np.clip(radius**2 - (cols[0] - center) ** 2, 0, None))
+        distinct.append(
+            rng.poisson(beam * np.exp(-thickness / radius)).astype(np.uint16)
+        )
+    for i in range(num_frames):
+        yield distinct[i % num_distinct]
@@ -3,36 +3,307 @@
 print("Loading NSLS-II HEX profile collection...")
 
 import asyncio
+import builtins
+import collections
+import contextlib
 import datetime
+import functools
+import importlib.util
+import json
 import logging
 import os
+import socket
 import subprocess
+import sys
+import threading
 import time as ttime
 import warnings
 from pathlib import Path
 
+from IPython import get_ipython
+
+PROFILE_DIR = Path(get_ipython().profile_dir.location)
+# Local state of the profile, kept out of the git checkout of PROFILE_DIR.
+PROFILE_STATE_DIR = (
+    Path(os.environ.get("XDG_STATE_HOME") or Path.home() / ".local" / "state")
+    / "hex-profile"
+)
+STARTUP_REPORT_DIR = Path(
+    os.environ.get("HEX_STARTUP_REPORT_DIR", PROFILE_STATE_DIR / "startup_reports")
+)
+# The spool must survive a crash or a reboot until its documents are delivered.
+DOCUMENT_SPOOL_DIR = Path(
+    os.environ.get("HEX_DOCUMENT_SPOOL_DIR", PROFILE_STATE_DIR / "document_spool")
+)
+
+# Make the importable modules of the profile (hex_profile/) available. Benchmarks
+# are not loaded at startup, run them with e.g.
+# `%run -i $PROFILE_DIR/benchmarks/<name>.py`.
+if str(PROFILE_DIR) not in sys.path:
+    sys.path.insert(0, str(PROFILE_DIR))
+
+
+class FileLoadingTimer:
+    """
+    Profile the loading of the startup files.
+
+    The wall time of every file is broken down into categories. Imports are
+    measured by wrapping `builtins.__import__` while a file is loading, other
+    categories ("device_construction", "redis", "tiled", ...) with the `timed`
+    context manager. Time spent in nested measurements is only counted in the
+    innermost category; the remainder of the wall time is reported as "other".
+    PV connection times are taken from the device registry once the background
+    connections are done.
+
+    `finish` writes a JSON report per session to `report_dir` and compares it
+    with `baseline.json` from the same directory (see `save_baseline`). A file
+    regresses if its wall time grows by more than `regression_margin`
+    (relative) and more than `min_regression` seconds (absolute).
+    """
+
+    def __init__(
+        self, report_dir=STARTUP_REPORT_DIR, regression_margin=0.25, min_regression=0.5
+    ):
+        self.report_dir = Path(report_dir)
+        self.regression_margin = regression_margin
+        self.min_regression = min_regression
+        self.start_time = 0
+        self.loading = False
+        self.current_file = None
+        self.files = {}
+        self.report = None
+        self._session_start = ttime.time()
+        self._stack = []
+        self._thread_id = threading.get_ident()
+        self._import_depth = 0
+        self._builtin_import = None
+
+    def start_timer(self, filename):
+        if self.loading:
+            # The previous file raised before reaching its `stop_timer` call.
+            print(f"Loading of {self.current_file} did not complete!")
+            self._stop(self.current_file, failed=True)
+
+        print(f"Loading {filename}...")
+        self._install_import_hook()
+        self.current_file = filename
+        self.files[Path(filename).name] = {"wall": 0.0, "failed": False}
+        self._stack = [0.0]
+        self.start_time = ttime.perf_counter()
+        self.loading = True
+
+    def stop_timer(self, filename):
+        elapsed = self._stop(filename)
+        print(f"Done loading {filename} in {elapsed:.6f} seconds.")
+
+    def _stop(self, filename, failed=False):
+        elapsed = ttime.perf_counter() - self.start_time
+        timings = self.files.setdefault(Path(filename).name, {})
+        timings["wall"] = elapsed
+        timings["other"] = elapsed - self._stack[0]
+        timings["failed"] = failed
+        self.loading = False
+        self.current_file = None
+        return elapsed
+
+    @contextlib.contextmanager
+    def timed(self, category):
+        """Attribute the time spent in the `with` block to `category`."""
+        if not self.loading or threading.get_ident() != self._thread_id:
+            yield
+            return
+        timings = self.files[Path(self.current_file).name]
+        start = ttime.perf_counter()
+        self._stack.append(0.0)
+        try:
+            yield
+        finally:
+            elapsed = ttime.perf_counter() - start
+            nested = self._stack.pop()
+            timings[category] = timings.get(category, 0.0) + elapsed - nested
+            self._stack[-1] += elapsed
+
+    def _timed_import(self, *args, **kwargs):
+        if (
+            self._import_depth
+            or not self.loading
+            or threading.get_ident() != self._thread_id
+        ):
+            return self._builtin_import(*args, **kwargs)
+        self._import_depth += 1
+        try:
+            with self.timed("imports"):
+                return self._builtin_import(*args, **kwargs)
+        finally:
+            self._import_depth -= 1
+
+    def _install_import_hook(self):
+        if self._builtin_import is None:
+            self._builtin_import = builtins.__import__
+            builtins.__import__ = self._timed_import
+
+    def _uninstall_import_hook(self):
+        if self._builtin_import is not None:
+            builtins.__import__ = self._builtin_import
+            self._builtin_import = None
+
+    def finish(self, device_registry=None, connection_timeout=60):
+        """
+        Stop profiling and write the report.
+
+        With a device registry, the report is written from a background thread
+        once all device connections are done, so the prompt is not held.
+        """
+        if self.loading:
+            print(f"Loading of {self.current_file} did not complete!")
+            self._stop(self.current_file, failed=True)
+        self._uninstall_import_hook()
+        total = ttime.time() - self._session_start
+
+        def write():
+            connections = {}
+            if device_registry is not None:
+                device_registry.wait(timeout=connection_timeout)
+                for name, filename in device_registry.registered_in.items():
+                    connections[name] = {
+                        "file": filename and Path(filename).name,
+                        "connect_time": device_registry.connect_times.get(name),
+                        "failed": name in device_registry.failures,
+                    }
+            self.write_report(total, connections)
+
+        if device_registry is None:
+            write()
+        else:
+            threading.Thread(target=write, daemon=True, name="startup-report").start()
+
+    def write_report(self, total, connections):
+        files = {name: dict(timings) for name, timings in self.files.items()}
+        for connection in connections.values():
+            timings = files.get(connection["file"])
+            if timings is not None and connection["connect_time"] is not None:
+                timings["pv_connection"] = max(
+                    timings.get("pv_connection", 0.0), connection["connect_time"]
+                )
+
+        session_start = datetime.datetime.fromtimestamp(self._session_start)
+        self.report = {
+            "session_start": session_start.isoformat(),
+            "hostname": socket.gethostname(),
+            "total": total,
+            "files": files,
+            "devices": connections,
+        }
+        try:
+            self.report_dir.mkdir(parents=True, exist_ok=True)
+            report_path = (
+                self.report_dir / f"startup_{session_start:%Y%m%d_%H%M%S}.json"
+            )
+            report_path.write_text(json.dumps(self.report, indent=2))
+        except OSError as e:
+            print(f"Could not save the startup report: {e}")
+        self.compare_to_baseline()
+
+    def compare_to_baseline(self, report=None):
+        """Warn about every file whose wall time regressed from the baseline."""
+        report = report or self.report
+        baseline_path = self.report_dir / "baseline.json"
+        if report is None or not baseline_path.exists():
+            return []
+        baseline = json.loads(baseline_path.read_text())
+        regressions = []
+        for name, timings in report["files"].items():
+            reference = baseline["files"].get(name)
+            if reference is None:
+                continue
+            increase = timings["wall"] - reference["wall"]
+            if (
+                increase > self.min_regression
+                and increase > self.regression_margin * reference["wall"]
+            ):
+                regressions.append(name)
+                print(
+                    f"\n  WARNING: loading {name} took {timings['wall']:.3f} s, "
+                    f"{increase:.3f} s more than the baseline "
+                    f"({reference['wall']:.3f} s)."
+                )
+        return regressions
+
+    def save_baseline(self):
+        """Store the report of the current session as the baseline for the next ones."""
+        if self.report is None:
+            raise RuntimeError("The startup report is not written yet.")
+        self.report_dir.mkdir(parents=True, exist_ok=True)
+        (self.report_dir / "baseline.json").write_text(
+            json.dumps(self.report, indent=2)
+        )
+
+    def print_report(self):
+        """Print the per-file breakdown of the current report."""
+        if self.report is None:
+            raise RuntimeError("The startup report is not written yet.")
+        for name, timings in self.report["files"].items():
+            breakdown = ", ".join(
+                f"{category}={value:.3f}"
+                for category, value in timings.items()
+                if category not in ("wall", "failed")
+            )
+            print(f"    {name:25}: {timings['wall']:8.3f} s ({breakdown})")
+
+
+file_loading_timer = FileLoadingTimer()
+file_loading_timer.start_timer(__file__)
+
+
+def lazy_import(name):
+    """
+    Import the module `name` on first attribute access instead of now.
+
+    Meant for modules only needed for plotting, file export or analysis, so
+    they do not add to the startup time. Parent packages are imported eagerly.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(f"No module named {name!r}", name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    parent, _, child = name.rpartition(".")
+    if parent:
+        setattr(sys.modules[parent], child, module)
+    return module
+
+
+# Needed at startup: redis and tiled connect the RunEngine metadata and documents.
 import epicscorelibs.path.pyepics
 import matplotlib.pyplot as plt
 import nslsii
 import ophyd.signal
+import orjson
 import redis
 from bluesky.callbacks.broker import post_run, verify_files_saved
 from bluesky.callbacks.tiled_writer import TiledWriter
 from bluesky.run_engine import RunEngine, call_in_bluesky_event_loop
-from databroker.v0 import Broker
-from IPython import get_ipython
 from IPython.terminal.prompts import Prompts, Token
 from nslsii import configure_base, configure_kafka_publisher
 from ophyd.signal import EpicsSignalBase
 from redis_json_dict import RedisJSONDict
+from redis_json_dict.redis_json_dict import _json_encoder_default, observe
 from tiled.client import from_uri
 
+from hex_profile.documents import BufferedTiledWriter, DocumentExporter, DocumentSpool
+
 # RUNNING_IN_NSLS2_CI = os.environ["NSLS2_PROFILE_CI"] == "YES"
 # RUNNING_IN_NSLS2_CI = os.environ["NSLS2_PROFILE_CI"] == False
 RUNNING_IN_NSLS2_CI = False
 
 # warnings.filterwarnings("ignore")
 
+# matplotlib cannot be deferred: configure_base(mpl=True) below imports pyplot.
 plt.ion()
 
 
@@ -52,30 +323,12 @@ ip = get_ipython()
 ip.prompts = ProposalIDPrompt(ip)
 
 
-class FileLoadingTimer:
-
-    def __init__(self):
-        self.start_time = 0
-        self.loading = False
-
-    def start_timer(self, filename):
-        if self.loading:
-            raise Exception("File already loading!")
-
-        print(f"Loading {filename}...")
-        self.start_time = ttime.time()
-        self.loading = True
-
-    def stop_timer(self, filename):
-
-        elapsed = ttime.time() - self.start_time
-        print(f"Done loading {filename} in {elapsed:.6f} seconds.")
-        self.loading = False
-
-
 EpicsSignalBase.set_defaults(timeout=10, connection_timeout=10)
 
-# The call below creates 'RE' and 'db' objects in the IPython user namespace.
+# The call below creates 'RE', 'bec' and 'sd' objects in the IPython user namespace.
+# No databroker is configured, so there is no `db` in the namespace: the temporary
+# v0 Broker was only subscribed to the RunEngine created by `configure_base`, which
+# is replaced below, so it never received any document. The runs are read from Tiled.
 # configure_base(get_ipython().user_ns,
 #                "hex",
 #                publish_documents_with_kafka=True,
@@ -83,7 +336,7 @@ EpicsSignalBase.set_defaults(timeout=10, connection_timeout=10)
 
 configure_base(
     get_ipython().user_ns,
-    Broker.named("temp"),
+    None,
     pbar=True,
     bec=True,
     magics=True,
@@ -98,12 +351,58 @@ RE = RunEngine()
 RE.subscribe(bec)
 RE.preprocessors.append(sd)
 
-tiled_writing_client = from_uri(
-    "https://tiled.nsls2.bnl.gov/api/v1/metadata/hex/raw",
-    api_key=os.environ["TILED_BLUESKY_WRITING_API_KEY_HEX"],
-)
-tw = TiledWriter(tiled_writing_client)
-RE.subscribe(tw)
+
+class StopDocumentExtras:
+    """
+    Add values computed by a plan to the stop document of its run.
+
+    bluesky only puts the exit status and the event counts into the stop
+    document. Plans call `stop_document_extras.update(key=value)` before
+    `close_run` (or before failing); the values are added to the next stop
+    document. Subscribed before the spool and the Tiled and Kafka publishers,
+    so they publish it with the extras. Keys must not contain "." or "/".
+    """
+
+    def __init__(self):
+        self.extras = {}
+
+    def update(self, **extras):
+        self.extras.update(extras)
+
+    def __call__(self, name, doc):
+        if name == "start":
+            self.extras.clear()
+        elif name == "stop":
+            doc.update(self.extras)
+            self.extras.clear()
+
+
+stop_document_extras = StopDocumentExtras()
+RE.subscribe(stop_document_extras)
+
+with file_loading_timer.timed("tiled"):
+    tiled_writing_client = from_uri(
+        "https://tiled.nsls2.bnl.gov/api/v1/metadata/hex/raw",
+        api_key=os.environ["TILED_BLUESKY_WRITING_API_KEY_HEX"],
+    )
+# The documents are spooled to a local disk and drained into Tiled and Kafka from
+# worker threads, the RunEngine does not wait for either service.
+try:
+    document_spool = DocumentSpool(DOCUMENT_SPOOL_DIR)
+except RuntimeError as e:
+    # E.g. the queue server and a terminal session on the same machine.
+    print(f"{e} Publishing the documents without spool.")
+    document_spool = None
+
+if document_spool is not None:
+    RE.subscribe(document_spool)
+    tw = TiledWriter(tiled_writing_client)
+    document_spool.subscribe(tw, consumer="tiled")
+else:
+    # Posted from a worker thread, the RunEngine only waits for Tiled at the end of
+    # a run.
+    tw = BufferedTiledWriter(TiledWriter(tiled_writing_client))
+    RE.subscribe(tw)
 
 # c = tiled_reading_client = from_uri(
 #     "https://tiled.nsls2.bnl.gov/api/v1/metadata/hex/raw",
@@ -124,38 +423,25 @@ def logout():
 
 # db = Broker(c)
 
-import json
-
-
-class JSONWriter:
-    """Writer for a JSON array"""
-
-    def __init__(self, filepath):
-        self.file = open(filepath, "w")
-        self.file.write("[\n")
-
-    def __call__(self, name, doc):
-        json.dump({"name": name, "doc": doc}, self.file, default=str)
-        if name == "stop":
-            self.file.write("\n]")
-            self.file.close()
-        else:
-            self.file.write(",\n")
-
 
 def now():
     return datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
 
 
-jlw = JSONWriter(f"/tmp/export-docs-{now()}.json")
+# Not subscribed by default, use `RE.subscribe(jlw)` to export the documents of
+# every run. Until then it has no thread and no directory.
+jlw = DocumentExporter(Path("/tmp") / f"export-docs-{now()}", compress=True)
 
 
-# wr = JSONWriter('/tmp/test.json')
+# wr = DocumentExporter('/tmp/test')
 # RE.subscribe(wr)
 
 # RE.subscribe(print)
 
-configure_kafka_publisher(RE, beamline_name="hex")
+configure_kafka_publisher(
+    RE if document_spool is None else document_spool.subscriber("kafka"),
+    beamline_name="hex",
+)
 
 # This is needed for ophyd-async to enable 'await <>' instead of 'asyncio.run(<>)':
 get_ipython().run_line_magic("autoawait", "call_in_bluesky_event_loop")
@@ -167,38 +453,321 @@ bec.disable_baseline()
 
 runengine_metadata_dir = Path("/nsls2/data/hex/shared/config/runengine-metadata")
 
-RE.md = RedisJSONDict(redis.Redis("info.hex.nsls2.bnl.gov", 6379), prefix="")
+
+class CachedRedisJSONDict(RedisJSONDict):
+    """
+    RedisJSONDict serving reads from a local cache.
+
+    Writes go through to Redis immediately and update the cache. Entries
+    changed by other clients (e.g. the queue server) are invalidated by Redis
+    keyspace notifications when the server publishes them
+    (`notify-keyspace-events` containing "K" and either "A" or "g$"). Without
+    notifications, cached entries expire after `max_age` seconds.
+
+    Keys of `uncached_keys` are always read from Redis. `scan_id` is read,
+    incremented and written back by `RE.scan_id_source` at every run start, and
+    a stale cached value would let two sessions hand out the same scan ID.
+
+    Parameters:
+    -----------
+    redis_client: redis.Redis
+        the client to use for reading/writing and for the notifications
+    prefix: str
+        prefix of the Redis keys, as for RedisJSONDict
+    max_age: float
+        maximum age of a cached entry in seconds when notifications are not available
+    uncached_keys: iterable of str
+        keys updated with read-modify-write cycles, never served from the cache
+    """
+
+    def __init__(self, redis_client, prefix, max_age=1.0, uncached_keys=("scan_id",)):
+        super().__init__(redis_client, prefix)
+        self._max_age = max_age
+        self._uncached_keys = frozenset(uncached_keys)
+        self._lock = threading.Lock()
+        self._cache = {}
+        self._keys = None
+        self._keys_time = 0
+        self._own_writes = collections.Counter()
+        self._invalidations = 0
+        self._pubsub = None
+        self._pubsub_thread = None
+        try:
+            self._subscribe_to_notifications()
+        except redis.RedisError as e:
+            print(
+                f"Redis keyspace notifications unavailable ({e!r}), "
+                f"caching RE.md for {max_age} s."
+            )
+
+    @property
+    def notifications(self):
+        """True if the cache is invalidated by keyspace notifications."""
+        return self._pubsub_thread is not None
+
+    def _subscribe_to_notifications(self):
+        flags = self._redis_client.config_get("notify-keyspace-events").get(
+            "notify-keyspace-events", ""
+        )
+        if "K" not in flags or not ("A" in flags or ("g" in flags and "$" in flags)):
+            print(
+                "Redis keyspace notifications are disabled, "
+                f"caching RE.md for {self._max_age} s."
+            )
+            return
+        db = self._redis_client.connection_pool.connection_kwargs.get("db", 0)
+        self._channel_prefix = f"__keyspace@{db}__:{self._prefix}"
+        self._pubsub = self._redis_client.pubsub(ignore_subscribe_messages=True)
+        self._pubsub.psubscribe(**{f"{self._channel_prefix}*": self._on_keyspace_event})
+        self._pubsub_thread = self._pubsub.run_in_thread(
+            sleep_time=1.0, daemon=True, exception_handler=self._on_pubsub_error
+        )
+
+    def _on_keyspace_event(self, message):
+        key = message["channel"].decode()[len(self._channel_prefix) :]
+        event = message["data"].decode()
+        with self._lock:
+            if event == "set" and self._own_writes[key]:
+                # Notification for a write of this client, the cache is up to date.
+                self._own_writes[key] -= 1
+                return
+            self._cache.pop(key, None)
+            self._invalidations += 1
+            if self._keys is not None:
+                if event in ("del", "expired", "evicted"):
+                    self._keys.discard(key)
+                else:
+                    self._keys.add(key)
+
+    def _on_pubsub_error(self, exception, pubsub, thread):
+        print(
+            f"Lost Redis keyspace notifications ({exception!r}), "
+            f"caching RE.md for {self._max_age} s."
+        )
+        thread.stop()
+        pubsub.close()
+        with self._lock:
+            self._pubsub_thread = None
+            self._own_writes.clear()
+            self._cache.clear()
+            self._keys = None
+
+    def _is_fresh(self, timestamp):
+        return self.notifications or ttime.monotonic() - timestamp < self._max_age
+
+    def _observe(self, key, value):
+        # Same as RedisJSONDict.__getitem__: nested mutations write the whole value
+        # back.
+        def sync():
+            self[key] = observed
+
+        observed = observe(value, sync)
+        return observed
+
+    def close(self):
+        """Stop listening to keyspace notifications and drop all cached entries."""
+        if self._pubsub_thread is not None:
+            self._pubsub_thread.stop()
+            self._pubsub.close()
+        with self._lock:
+            self._pubsub_thread = None
+            self._own_writes.clear()
+        self.invalidate()
+
+    def invalidate(self):
+        """Drop all cached entries."""
+        with self._lock:
+            self._cache.clear()
+            self._keys = None
+
+    def __getitem__(self, key):
+        if key in self._uncached_keys:
+            return super().__getitem__(key)
+        with self._lock:
+            entry = self._cache.get(key)
+        if entry is not None and self._is_fresh(entry[1]):
+            return entry[0]
+        with self._lock:
+            invalidations = self._invalidations
+        timestamp = ttime.monotonic()
+        value = super().__getitem__(key)
+        with self._lock:
+            # Do not cache the value if it may have changed while it was read.
+            if invalidations == self._invalidations:
+                self._cache[key] = (value, timestamp)
+        return value
+
+    def _write_through(self, d, write):
+        with self._lock:
+            if self.notifications:
+                self._own_writes.update(d.keys())
+        try:
+            write(d)
+        except Exception:
+            with self._lock:
+                self._own_writes.subtract(d.keys())
+                self._own_writes += collections.Counter()  # drops non-positive counts
+                for key in d:
+                    self._cache.pop(key, None)
+            raise
+        timestamp = ttime.monotonic()
+        for key, value in d.items():
+            if key in self._uncached_keys:
+                continue
+            # Cache what a read from Redis would return (lists instead of tuples, etc.).
+            decoded = orjson.loads(
+                orjson.dumps(
+                    value,
+                    default=_json_encoder_default,
+                    option=orjson.OPT_SERIALIZE_NUMPY,
+                )
+            )
+            with self._lock:
+                self._cache[key] = (self._observe(key, decoded), timestamp)
+                if self._keys is not None:
+                    self._keys.add(key)
+
+    def __setitem__(self, key, value):
+        write = super().__setitem__
+        self._write_through({key: value}, lambda d: write(key, value))
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        with self._lock:
+            self._cache.pop(key, None)
+            if self._keys is not None:
+                self._keys.discard(key)
+
+    def __iter__(self):
+        with self._lock:
+            keys, timestamp = self._keys, self._keys_time
+        if keys is None or not self._is_fresh(timestamp):
+            timestamp = ttime.monotonic()
+            keys = set(super().__iter__())
+            with self._lock:
+                self._keys, self._keys_time = keys, timestamp
+        yield from list(keys)
+
+    def update(self, d):
+        self._write_through(dict(d), super().update)
+
+    def clear(self):
+        super().clear()
+        self.invalidate()
+
+
+with file_loading_timer.timed("redis"):
+    RE.md = CachedRedisJSONDict(redis.Redis("info.hex.nsls2.bnl.gov", 6379), prefix="")
 
 
 # Optional: set any metadata that rarely changes.
-RE.md["facility"] = "NSLS-II"
-RE.md["group"] = "HEX"
-RE.md["beamline_id"] = "27-ID-1"
+with file_loading_timer.timed("redis"):
+    RE.md["facility"] = "NSLS-II"
+    RE.md["group"] = "HEX"
+    RE.md["beamline_id"] = "27-ID-1"
+
+
+from ophyd_async.core import wait_for_value
+from ophyd_async.epics.adcore import ADCallbacks, ADImageMode, AreaDetector
+
+
+async def _warmup_ophyd_hdf5_plugin(det, timeout):
+    # ophyd v1 signals only offer blocking calls, run them on worker threads.
+    loop = asyncio.get_running_loop()
+    array_size = await loop.run_in_executor(None, det.hdf5.array_size.get)
+    if 0 not in [array_size.height, array_size.width]:
+        return f"not needed, array_size={array_size}"
+    print(
+        f"\n  Warming up HDF5 plugin for {det.name} as the array_size={array_size}..."
+    )
+    # A blocking call cannot be cancelled: on timeout only the wait ends, the
+    # warmup keeps running in its executor thread until it returns.
+    await asyncio.wait_for(loop.run_in_executor(None, det.hdf5.warmup), timeout)
+    array_size = await loop.run_in_executor(None, det.hdf5.array_size.get)
+    return f"done, array_size={array_size}"
+
+
+async def _warmup_ophyd_async_hdf5_plugin(det, timeout):
+    fileio, driver = det.fileio, det.driver
+    width, height = await asyncio.gather(
+        fileio.array_size0.get_value(), fileio.array_size1.get_value()
+    )
+    if 0 not in [width, height]:
+        return f"not needed, array_size={width}x{height}"
+    print(
+        f"\n  Warming up HDF5 plugin for {det.name} "
+        f"as the array_size={width}x{height}..."
+    )
+    image_mode, callbacks, acquiring = await asyncio.gather(
+        driver.image_mode.get_value(),
+        fileio.enable_callbacks.get_value(),
+        driver.acquire.get_value(),
+    )
+    await fileio.enable_callbacks.set(ADCallbacks.ENABLE)
+    try:
+        if not acquiring:
+            await driver.image_mode.set(ADImageMode.SINGLE)
+            await driver.acquire.set(True, timeout=timeout)
+        # A continuously acquiring detector (e.g. a Kinetix between scans) only
+        # needs the plugin enabled until the next frame arrives.
+        await wait_for_value(fileio.array_size0, lambda size: size > 0, timeout=timeout)
+    finally:
+        restore = [fileio.enable_callbacks.set(callbacks)]
+        if not acquiring:
+            restore.append(driver.image_mode.set(image_mode))
+        await asyncio.gather(*restore)
+    width, height = await asyncio.gather(
+        fileio.array_size0.get_value(), fileio.array_size1.get_value()
+    )
+    return f"done, array_size={width}x{height}"
+
+
+async def warmup_hdf5_plugins_async(detectors, timeout=10):
+    """
+    Warm-up the hdf5 plugins of all detectors concurrently.
+
+    Works for ophyd v1 detectors with an `hdf5` plugin and for ophyd-async area
+    detectors (Kinetix, Vimba). The array size of every plugin is read on each
+    call: an IOC restart resets it to 0, so a plugin warmed up before the
+    restart is warmed up again. A warmup still running after `timeout` s fails
+    with a TimeoutError; the one of an ophyd v1 detector keeps running in the
+    background (see `_warmup_ophyd_hdf5_plugin`), the plugin may be warm later.
+    Returns a dict of the result (or the exception) per detector name.
+    """
 
+    async def warmup(det):
+        if isinstance(det, AreaDetector):
+            return await _warmup_ophyd_async_hdf5_plugin(det, timeout)
+        elif hasattr(det, "hdf5"):
+            return await _warmup_ophyd_hdf5_plugin(det, timeout)
+        return "no HDF5 plugin"
+
+    results = await asyncio.gather(
+        *(warmup(det) for det in detectors), return_exceptions=True
+    )
+    results = dict(zip([det.name for det in detectors], results))
+    for name, result in results.items():
+        if isinstance(result, Exception):
+            print(f"\n  Warming up the HDF5 plugin of {name} failed: {result!r}")
+        else:
+            print(f"\n  Warming up the HDF5 plugin of {name}: {result}.")
+    return results
 
-def warmup_hdf5_plugins(detectors):
+
+def warmup_hdf5_plugins(detectors, timeout=10):
     """
     Warm-up the hdf5 plugins.
     This is necessary for when the corresponding IOC restarts we have to trigger one image
     for the hdf5 plugin to work correctly, else we get file writing errors.
+    All detectors are checked and warmed up concurrently, see
+    `warmup_hdf5_plugins_async`.
     Parameter:
     ----------
     detectors: list
+    timeout: float
+        maximum time in seconds to wait for the warmup of one detector
     """
-    for det in detectors:
-        _array_size = det.hdf5.array_size.get()
-        if 0 in [_array_size.height, _array_size.width] and hasattr(det, "hdf5"):
-            print(
-                f"\n  Warming up HDF5 plugin for {det.name} as the array_size={_array_size}..."
-            )
-            det.hdf5.warmup()
-            print(
-                f"  Warming up HDF5 plugin for {det.name} is done. array_size={det.hdf5.array_size.get()}\n"
-            )
-        else:
-            print(
-                f"\n  Warming up of the HDF5 plugin is not needed for {det.name} as the array_size={_array_size}."
-            )
+    return call_in_bluesky_event_loop(warmup_hdf5_plugins_async(detectors, timeout))
 
 
 def show_env():
@@ -230,4 +799,4 @@ def reset_scan_id(scan_id=0):
     print(f"Scan_id after: {RE.md['scan_id']}")
 
 
-file_loading_timer = FileLoadingTimer()
+file_loading_timer.stop_timer(__file__)
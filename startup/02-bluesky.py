@@ -3,29 +3,9 @@ file_loading_timer.start_timer(__file__)
 
 import ophyd
 from bluesky.plans import count
-from nslsii.ad33 import SingleTriggerV33, StatsPluginV33
 from ophyd import Component as Cpt
 from ophyd import EpicsSignal, EpicsSignalRO, Kind, Signal
-from ophyd.areadetector import AreaDetector, CamBase
-from ophyd.areadetector import EpicsSignalWithRBV as SignalWithRBV
-from ophyd.areadetector import (
-    ImagePlugin,
-    OverlayPlugin,
-    ProcessPlugin,
-    ROIPlugin,
-    StatsPlugin,
-    TIFFPlugin,
-    TransformPlugin,
-)
-from ophyd.areadetector.filestore_mixins import (
-    FileStoreBase,
-    FileStoreHDF5IterativeWrite,
-    FileStoreIterativeWrite,
-    FileStoreTIFF,
-    FileStoreTIFFIterativeWrite,
-    FileStoreTIFFSquashing,
-)
-from ophyd.device import BlueskyInterface, Device, DeviceStatus
+from ophyd.device import Device, DeviceStatus
 from ophyd.status import SubscriptionStatus
 
 file_loading_timer.stop_timer(__file__)
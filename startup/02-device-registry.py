@@ -0,0 +1,12 @@
+file_loading_timer.start_timer(__file__)
+
+from hex_profile.devices import DeviceRegistry
+
+# Devices are connected in the background, see hex_profile/devices.py. Plans
+# wait for pending connections and refuse to use devices that failed.
+device_registry = DeviceRegistry(
+    RE.loop, source=lambda: file_loading_timer.current_file
+)
+RE.preprocessors.append(device_registry.preprocess)
+
+file_loading_timer.stop_timer(__file__)
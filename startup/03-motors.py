@@ -8,6 +8,8 @@ Ophyd objects for motors
 from ophyd import Component as Cpt
 from ophyd import Device, EpicsMotor, EpicsSignalRO, Kind
 
+from hex_profile.shutters import HEXPhotonShutter
+
 
 class EpicsMotorWithDescription(EpicsMotor):
     """Based on the Misc. chapter at https://epics.anl.gov/EpicsDocumentation/AppDevManuals/RecordRef/Recordref-6.html."""
@@ -76,8 +78,12 @@ class HEXMonochromator(Device):
     xtal2_z = Cpt(EpicsMotor, "Z2}Mtr")
 
 
-mono = HEXMonochromator("XF:27IDA-OP:1{Mono:DCLM-Ax:", name="mono")
-sample_tower = SampleTower("XF:27IDF-OP:1{SMPL:1-Ax:", name="sample_tower")
+mono = device_registry.register(
+    HEXMonochromator("XF:27IDA-OP:1{Mono:DCLM-Ax:", name="mono")
+)
+sample_tower = device_registry.register(
+    SampleTower("XF:27IDF-OP:1{SMPL:1-Ax:", name="sample_tower")
+)
 
 
 class TomoRotaryStageHoming(Device):
@@ -106,7 +112,9 @@ class TomoRotaryStage(Device):
 
 
 
-tomo_rotary_stage = TomoRotaryStage("XF:27IDF-OP:1{MC:5-", name="tomo_rotary_stage")
+tomo_rotary_stage = device_registry.register(
+    TomoRotaryStage("XF:27IDF-OP:1{MC:5-", name="tomo_rotary_stage")
+)
 tomo_rot_axis = tomo_rotary_stage.rotary_axis
 
 
@@ -254,7 +262,9 @@ GERM_DETECTOR = {
 """
 
 
-mca1_motors = MotorValuesMCA1("XF:27IDA-OP:", name="mca1_motors", kind=Kind.normal)
+mca1_motors = device_registry.register(
+    MotorValuesMCA1("XF:27IDA-OP:", name="mca1_motors", kind=Kind.normal)
+)
 
 
 class EDXD(Device):
@@ -266,7 +276,7 @@ class EDXD(Device):
     axis_rx = Cpt(EpicsMotorWithDescription, "Rx}Mtr")
 
 
-edxd = EDXD("XF:27IDF-OP:1{EDXD:1-Ax:", name="edxd")
+edxd = device_registry.register(EDXD("XF:27IDF-OP:1{EDXD:1-Ax:", name="edxd"))
 
 theta = edxd.axis_rx
 
@@ -277,42 +287,25 @@ sd.baseline += [getattr(mca1_motors, m) for m in mca1_motors.component_names]
 fe_shutter_status = EpicsSignalRO(
     "XF:27IDA-PPS{Sh:FE}Sts:OpnCmd-Sts", name="fe_shutter_status", string=False
 )
-# from nslsii.devices import TwoButtonShutter
 
 
-# class HEXTwoButtonShutter(TwoButtonShutter):
+ph_shutter = HEXPhotonShutter("XF:27IDA-PPS{L1-S1}", name="ph_shutter")
+ph_shutter_status = ph_shutter.status
+ph_open_cmd = ph_shutter.open_cmd
+ph_close_cmd = ph_shutter.close_cmd
 
-#     RETRY_PERIOD = 2.0
-#     MAX_ATTEMPTS = 10
-    
-#     def stop(self, *, success=False):
-#         pass
+for shutter in [fe_shutter_status, ph_shutter]:
+    device_registry.register(shutter)
 
 
-#ph_shutter = HEXTwoButtonShutter("XF:27IDA-PPS{L1-S1}", name="ph_shutter")
-ph_shutter_status = EpicsSignalRO(
-    "XF:27IDA-PPS{L1-S1}Pos-Sts", name="ph_shutter_status", string=False
-)
-ph_open_cmd = EpicsSignal(
-    "XF:27IDA-PPS{L1-S1}Cmd:Opn-Cmd", name="ph_shutter_open", string=False
-)
-ph_close_cmd = EpicsSignal(
-    "XF:27IDA-PPS{L1-S1}Cmd:Cls-Cmd", name="ph_shutter_close", string=False
-)
-
-# The two button shutter class does not seem to agree with HEX's photon shutter.
-# Potentially because of a minor EPS alarm state in the open position?
-# For now just actuating the signals and waiting for a few seconds seems to be more reliable.
 def open_ph_shutter():
     print("Opening photon shutter...")
-    yield from bps.abs_set(ph_open_cmd, 1)
-    yield from bps.sleep(3)
+    yield from bps.mv(ph_shutter, ph_shutter.open_str)
     print("Done.")
 
 def close_ph_shutter():
     print("Closing photon shutter...")
-    yield from bps.abs_set(ph_close_cmd, 1)
-    yield from bps.sleep(3)
+    yield from bps.mv(ph_shutter, ph_shutter.close_str)
     print("Done.")
 
 
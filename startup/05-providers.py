@@ -22,6 +22,67 @@ import uuid
 from ophyd_async.core import UUIDFilenameProvider, YMDPathProvider, PathInfo
 
 
+@dataclasses.dataclass(frozen=True)
+class RunPathInfo:
+    """Metadata deciding where the files of a run are written."""
+
+    cycle: str
+    proposal_type: str
+    data_session: str
+    scan_id: int
+    year: str
+
+    @classmethod
+    def from_md(cls, md):
+        return cls(
+            cycle=md["cycle"],
+            proposal_type=(md.get("proposal") or {}).get("type", ""),
+            data_session=md["data_session"],
+            scan_id=md["scan_id"],
+            year=date.today().strftime("%Y"),
+        )
+
+    @property
+    def cycle_dir(self):
+        if "Beamline Commissioning" in self.proposal_type:
+            return "commissioning"
+        return self.cycle
+
+
+class RunPathSnapshot:
+    """
+    Resolve the path metadata once per run.
+
+    Subscribed to the RunEngine, it builds a `RunPathInfo` from the start
+    document, which already contains RE.md, so the path and filename providers
+    of all devices in a run share the same cycle, data_session, scan_id and
+    date, even if RE.md changes mid-scan, and never go to Redis. Outside of a
+    run (e.g. devices staged before `open_run`), `get` reads RE.md.
+    """
+
+    def __init__(self):
+        self.current = None
+
+    def __call__(self, name, doc):
+        if name == "start":
+            try:
+                self.current = RunPathInfo.from_md(doc)
+            except (KeyError, TypeError):
+                # Not enough metadata for a path, the providers will read RE.md.
+                self.current = None
+        elif name == "stop":
+            self.current = None
+
+    def get(self):
+        if self.current is not None:
+            return self.current
+        return RunPathInfo.from_md(RE.md)
+
+
+run_path_snapshot = RunPathSnapshot()
+RE.subscribe(run_path_snapshot)
+
+
 class ProposalNumYMDPathProvider(YMDPathProvider):
 
     def __init__(
@@ -36,15 +97,12 @@ class ProposalNumYMDPathProvider(YMDPathProvider):
         # This never changes.
         # RE.md['cycle'] -> 2024-2
         # RE.md['proposal'] -> 'pass-123456'
-        cycle = RE.md["cycle"]
-        if 'Beamline Commissioning' in RE.md['proposal']['type']:
-            cycle = 'commissioning'
+        run_info = run_path_snapshot.get()
 
         proposal_assets = (
-            self._base_directory_path / cycle / RE.md["data_session"] / "assets"
+            self._base_directory_path / run_info.cycle_dir / run_info.data_session / "assets"
         )
-        sep = os.path.sep
-        current_date = date.today().strftime(f"%Y")
+        current_date = run_info.year
         if device_name is None:
             ymd_dir_path = current_date
         elif device_name == "pilatus_det":
@@ -60,7 +118,7 @@ class ProposalNumYMDPathProvider(YMDPathProvider):
                 current_date,
             )
 
-        final_dir_path = proposal_assets / ymd_dir_path / f"scan_{str(RE.md['scan_id']).zfill(5)}"
+        final_dir_path = proposal_assets / ymd_dir_path / f"scan_{str(run_info.scan_id).zfill(5)}"
 
 
         filename = self._filename_provider(device_name=device_name)
@@ -111,10 +169,11 @@ class ScanIDFilenameProvider(UUIDFilenameProvider):
                 *self._uuid_call_args
             )  # Generate a new UUID
 
+        scan_id = run_path_snapshot.get().scan_id
         if device_name is None or not device_name in ["panda1", "pilatus_det"]:
-            filename = f"{self._frame_type.value}_scan_{str(RE.md['scan_id']).zfill(5)}_{self._uuid_for_scan}"
+            filename = f"{self._frame_type.value}_scan_{str(scan_id).zfill(5)}_{self._uuid_for_scan}"
         else:
-            filename = f"{device_name}_scan_{str(RE.md['scan_id']).zfill(5)}_{self._uuid_for_scan}"
+            filename = f"{device_name}_scan_{str(scan_id).zfill(5)}_{self._uuid_for_scan}"
 
         # If we are generating a name for projections, then replace
         if self._frame_type == TomoFrameType.proj and (
@@ -2,7 +2,9 @@ file_loading_timer.start_timer(__file__)
 
 import asyncio
 import datetime
+import itertools
 import json
+import math
 import time as ttime
 import uuid
 from enum import Enum
@@ -12,6 +14,7 @@ from typing import AsyncGenerator, AsyncIterator, Dict, List, Optional
 
 import bluesky.plan_stubs as bps
 import bluesky.preprocessors as bpp
+import numpy as np
 from bluesky import RunEngine
 from bluesky.utils import ProgressBarManager
 from epics import caget, caput
@@ -26,7 +29,7 @@ from ophyd_async.core import (
 )
 from ophyd_async.core import AsyncStatus
 from ophyd_async.core import StandardDetector
-from ophyd_async.fastcs.panda import HDFPanda
+from ophyd_async.fastcs.panda import HDFPanda, SeqTable, SeqTrigger
 
 # class HEXPandaHDFWriter(PandaHDFWriter):
 #     async def open(self, *args, **kwargs):
@@ -43,7 +46,7 @@ from ophyd_async.fastcs.panda import HDFPanda
 def connect_to_panda(panda_id):
 
     print(f"Connecting to Panda {panda_id}...")
-    with init_devices(mock=RUNNING_IN_NSLS2_CI):
+    with file_loading_timer.timed("device_construction"), init_devices(connect=False):
         panda_path_provider = ProposalNumYMDPathProvider(default_filename_provider)
         panda = HDFPanda(
             f"XF:27ID1-ES{{PANDA:{panda_id}}}:",
@@ -51,11 +54,110 @@ def connect_to_panda(panda_id):
             name=f"panda{panda_id}",
         )
 
-    print("Done.")
-
-    return panda
+    # The connection completes in the background, see 02-device-registry.py.
+    return device_registry.register(panda, mock=RUNNING_IN_NSLS2_CI)
 
 
 panda1 = connect_to_panda(1)
 
+
+# Maximum number of rows of a sequencer table.
+PANDA_SEQ_TABLE_MAX_ROWS = 4096
+
+
+def panda_values_equal(a, b):
+    """Compare PandA values, including tables (compared column by column) and floats."""
+    if isinstance(a, dict) or hasattr(type(a), "model_fields"):
+        try:
+            a, b = dict(a), dict(b)
+        except (TypeError, ValueError):
+            return False
+        return a.keys() == b.keys() and all(
+            np.array_equal(np.asarray(a[key]), np.asarray(b[key])) for key in a
+        )
+    if isinstance(a, float) or isinstance(b, float):
+        try:
+            return math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-12)
+        except TypeError:
+            return False
+    return a == b
+
+
+def panda_config_changes(config, current):
+    """The (signal, value) pairs of `config` that differ from the `current` {signal: value}."""
+    return [
+        (signal, value)
+        for signal, value in config.items()
+        if not panda_values_equal(current[signal], value)
+    ]
+
+
+def configure_panda(config):
+    """
+    Write the values of a PandA configuration {signal: value} that changed.
+
+    All signals of `config` are read concurrently and only the values that
+    differ are written, also concurrently, in one round trip each. The values
+    are read on every call because the queue server, bsui sessions and the
+    web GUI all change the same PandA. Returns the (signal, value) pairs written.
+    """
+    signals = list(config)
+    futures = yield from bps.wait_for([signal.get_value for signal in signals])
+    current = {signal: future.result() for signal, future in zip(signals, futures)}
+    changes = panda_config_changes(config, current)
+    if changes:
+        yield from bps.mv(*itertools.chain.from_iterable(changes))
+    return changes
+
+
+def panda_seq_table(positions, width, direction=1):
+    """
+    Sequencer table producing a pulse of `width` us at each of the encoder `positions`.
+
+    Every row waits until POSA passes the position (>= with `direction` 1, <=
+    with -1), sets OUTA for `width` us and clears it for 1 us. The sequencer
+    must run with a prescale of 1 us, and POSA and OUTA must be wired in the
+    PandA layout (see `panda_seq_config`).
+    """
+    positions = np.asarray(positions, dtype=np.int32)
+    if len(positions) > PANDA_SEQ_TABLE_MAX_ROWS:
+        raise ValueError(
+            f"{len(positions)} positions do not fit in a sequencer table "
+            f"({PANDA_SEQ_TABLE_MAX_ROWS} rows at most)."
+        )
+    num_rows = len(positions)
+    trigger = SeqTrigger.POSA_GT if direction > 0 else SeqTrigger.POSA_LT
+    ones = np.ones(num_rows, dtype=bool)
+    zeros = np.zeros(num_rows, dtype=bool)
+    return SeqTable(
+        repeats=np.ones(num_rows, dtype=np.uint16),
+        trigger=[trigger] * num_rows,
+        position=positions,
+        time1=np.full(num_rows, max(int(round(width)), 1), dtype=np.uint32),
+        outa1=ones,
+        outb1=zeros,
+        outc1=zeros,
+        outd1=zeros,
+        oute1=zeros,
+        outf1=zeros,
+        time2=np.ones(num_rows, dtype=np.uint32),
+        outa2=zeros,
+        outb2=zeros,
+        outc2=zeros,
+        outd2=zeros,
+        oute2=zeros,
+        outf2=zeros,
+    )
+
+
+def panda_seq_config(seq_block, positions, width, direction=1, repeats=1):
+    """Configuration of a sequencer block pulsing at the encoder `positions`, see `panda_seq_table`."""
+    return {
+        seq_block.table: panda_seq_table(positions, width, direction),
+        seq_block.prescale: 1.0,
+        seq_block.prescale_units: "us",
+        seq_block.repeats: repeats,
+    }
+
+
 file_loading_timer.stop_timer(__file__)
@@ -17,19 +17,204 @@ from ophyd_async.core import (
     TriggerInfo,
 )
 from ophyd_async.epics.adkinetix import KinetixDetector
-from ophyd_async.epics.adcore import ADHDFWriter
+from ophyd_async.epics.adcore import ADBaseDatasetDescriber, ADHDFWriter, NDFileHDFIO
+from ophyd_async.epics.core import epics_signal_rw, epics_signal_rw_rbv
+
+
+class HEXNDFileHDFIO(NDFileHDFIO):
+    """The HDF5 file plugin, with the chunking and Blosc settings of ADCore."""
+
+    def __init__(self, prefix, name=""):
+        self.num_row_chunks = epics_signal_rw_rbv(int, prefix + "NumRowChunks")
+        self.num_col_chunks = epics_signal_rw_rbv(int, prefix + "NumColChunks")
+        self.num_frames_chunks_setpoint = epics_signal_rw(
+            int, prefix + "NumFramesChunks"
+        )
+        self.num_frames_flush = epics_signal_rw_rbv(int, prefix + "NumFramesFlush")
+        self.z_level = epics_signal_rw_rbv(int, prefix + "ZLevel")
+        # Enums, kept as strings so that a different ADCore version still connects.
+        self.blosc_compressor = epics_signal_rw_rbv(str, prefix + "BloscCompressor")
+        self.blosc_compress_level = epics_signal_rw_rbv(
+            int, prefix + "BloscCompressLevel"
+        )
+        self.blosc_shuffle = epics_signal_rw_rbv(str, prefix + "BloscShuffle")
+        super().__init__(prefix, name=name)
+
+
+# HDF5WriterConfig codecs: the Compression of the HDF5 plugin and, for Blosc, its
+# compressor. The values are written as strings, the enum signal converts them.
+HDF5_CODECS = {
+    "none": ("None", None),
+    "zlib": ("zlib", None),
+    "lz4": ("LZ4", None),
+    "bslz4": ("BSLZ4", None),
+    "blosc": ("Blosc", "BloscLZ"),
+    "blosc-lz4": ("Blosc", "LZ4"),
+    "zstd": ("Blosc", "ZSTD"),
+}
+
+
+@dataclass(frozen=True)
+class HDF5WriterConfig:
+    """
+    Layout of the HDF5 files written by a detector, see `HEXADHDFWriter`.
+
+    `codec` is one of `HDF5_CODECS`; "lz4", "bslz4" (bitshuffle + LZ4) and the
+    Blosc codecs need the hdf5plugin filters to be read back. `level` is the
+    zlib or Blosc compression level (0-9) and `shuffle` the Blosc shuffle
+    ("None", "Byte" or "Bit"). A chunk holds `frames_per_chunk` frames of
+    `rows_per_chunk` x `cols_per_chunk` pixels; None lets the plugin choose
+    (whole frames, one per chunk). The file is flushed every
+    `frames_per_flush` frames (0: at the end).
+    """
+
+    codec: str = "none"
+    level: int = 5
+    shuffle: str = "Byte"
+    frames_per_chunk: int | None = None
+    rows_per_chunk: int | None = None
+    cols_per_chunk: int | None = None
+    frames_per_flush: int = 0
+
+    def __post_init__(self):
+        if self.codec not in HDF5_CODECS:
+            raise ValueError(
+                f"Unknown codec {self.codec!r}, use one of {list(HDF5_CODECS)}."
+            )
+
+    @property
+    def auto_chunks(self):
+        return (
+            self.frames_per_chunk is None
+            and self.rows_per_chunk is None
+            and self.cols_per_chunk is None
+        )
+
+    def chunk_shape(self, frame_shape):
+        """The (frames, rows, columns) of a chunk, for frames of `frame_shape`."""
+        return (
+            self.frames_per_chunk or 1,
+            min(self.rows_per_chunk or frame_shape[0], frame_shape[0]),
+            min(self.cols_per_chunk or frame_shape[1], frame_shape[1]),
+        )
+
+
+# Layout of the detector files by ScanType, unless the writer of the detector has its
+# own in `HEXADHDFWriter.configs`. Scan types without one keep the IOC settings.
+HDF5_WRITER_CONFIGS = {}
 
 
 class HEXADHDFWriter(ADHDFWriter):
+    """
+    HDF5 writer without SWMR, with a file layout for every scan type.
+
+    The plans tell the writer which `ScanType` they run with `set_scan_type`.
+    When the file is opened, the writer applies the `HDF5WriterConfig` of that
+    scan type from `configs` (for this detector only), or else from
+    `HDF5_WRITER_CONFIGS`, before the datasets are described, so the chunk
+    shape in the stream resource matches the file. Set it with e.g.
+    `kinetix1._writer.configs[ScanType.tomo_flyscan] = HDF5WriterConfig(codec="zstd")`.
+    Once a layout was applied, scan types without one are written
+    uncompressed again, with the chunks chosen by the plugin.
+    """
+
+    @classmethod
+    def with_io(
+        cls,
+        prefix,
+        path_provider,
+        dataset_source=None,
+        fileio_suffix=None,
+        plugins=None,
+    ):
+        fileio = HEXNDFileHDFIO(prefix + (fileio_suffix or cls.default_suffix))
+        dataset_describer = ADBaseDatasetDescriber(dataset_source or fileio)
+
+        def name_provider():
+            return fileio.parent.name
+
+        return cls(
+            fileio, path_provider, name_provider, dataset_describer, plugins=plugins
+        )
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.configs = {}
+        self.scan_type = None
+        self._config = None
+        self._config_applied = False
+
+    def set_scan_type(self, scan_type):
+        self.scan_type = scan_type
+
+    def config(self):
+        """The `HDF5WriterConfig` of the scan type, None keeps the IOC settings."""
+        config = self.configs.get(self.scan_type) or HDF5_WRITER_CONFIGS.get(
+            self.scan_type
+        )
+        if config is None and self._config_applied:
+            return HDF5WriterConfig()
+        return config
+
+    async def apply_config(self, config):
+        compression, blosc_compressor = HDF5_CODECS[config.codec]
+        settings = {
+            self.fileio.compression: compression,
+            self.fileio.num_frames_flush: config.frames_per_flush,
+        }
+        if config.codec == "zlib":
+            settings[self.fileio.z_level] = config.level
+        if blosc_compressor is not None:
+            settings.update(
+                {
+                    self.fileio.blosc_compressor: blosc_compressor,
+                    self.fileio.blosc_compress_level: config.level,
+                    self.fileio.blosc_shuffle: config.shuffle,
+                }
+            )
+        if not config.auto_chunks:
+            frame_shape = await self._dataset_describer.shape()
+            frames, rows, cols = config.chunk_shape(frame_shape)
+            settings.update(
+                {
+                    self.fileio.num_frames_chunks_setpoint: frames,
+                    self.fileio.num_row_chunks: rows,
+                    self.fileio.num_col_chunks: cols,
+                }
+            )
+        # ChunkSizeAuto first, the plugin recomputes the chunks when it changes.
+        await self.fileio.chunk_size_auto.set(config.auto_chunks)
+        await asyncio.gather(
+            *(signal.set(value) for signal, value in settings.items())
+        )
+        self._config_applied = True
 
     async def begin_capture(self):
+        # Called by `open` once it reset the plugin to automatic chunks, and
+        # before it describes the datasets.
+        self._config = self.config()
+        if self._config is not None:
+            await self.apply_config(self._config)
         await super().begin_capture()
         await self.fileio.swmr_mode.set(False)
 
+    async def open(self, multiplier=1):
+        describe = await super().open(multiplier)
+        # `open` describes the chunks of automatic chunking (whole frames), or
+        # the frames per chunk the plugin reads back before the file exists.
+        if self._config is not None and not self._config.auto_chunks:
+            data = self._datasets[0]
+            data.chunk_shape = self._config.chunk_shape(data.shape)
+        return describe
+
 
 class HEXKinetixDetector(KinetixDetector):
     """Override base StandardDetector unstage class to reset into continuous mode after scan/abort"""
 
+    async def close_files(self) -> None:
+        """Close the files of the current acquisition, the detector stays staged."""
+        await self._writer.close()
+
     @AsyncStatus.wrap
     async def unstage(self) -> None:
         # Stop data writing.
@@ -44,7 +229,7 @@ class HEXKinetixDetector(KinetixDetector):
 def connect_to_kinetix(kinetix_id):
 
     print(f"Connecting to kinetix {kinetix_id}...")
-    with init_devices(mock=RUNNING_IN_NSLS2_CI):
+    with file_loading_timer.timed("device_construction"), init_devices(connect=False):
         kinetix_path_provider = ProposalNumYMDPathProvider(default_filename_provider)
         kinetix = HEXKinetixDetector(
             f"XF:27ID1-BI{{Kinetix-Det:{kinetix_id}}}",
@@ -53,19 +238,12 @@ def connect_to_kinetix(kinetix_id):
             writer_cls=HEXADHDFWriter,
         )
 
-    print("Done.")
-
-    return kinetix
+    # The connection completes in the background, see 02-device-registry.py.
+    return device_registry.register(kinetix, mock=RUNNING_IN_NSLS2_CI)
 
-try:
-    kinetix1 = connect_to_kinetix(1)
-except Exception as e:
-    print(f"Kinetix 1 is unavailable...")
 
-try:
-    kinetix3 = connect_to_kinetix(3)
-except Exception as e:
-    print(f"Kinetix 3 is unavailable...")
+kinetix1 = connect_to_kinetix(1)
+kinetix3 = connect_to_kinetix(3)
 
 
 file_loading_timer.stop_timer(__file__)
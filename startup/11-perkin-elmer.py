@@ -69,8 +69,9 @@ class HEXTIFFPlugin(TIFFPlugin, FileStoreTIFFSquashing,
         return stream_datum["uid"]
     
     def update_read_write_paths(self):
-        self._read_path_template = f'/nsls2/data/hex/proposals/{RE.md["cycle"]}/{RE.md["data_session"]}/assets/perkin-elmer/%Y/scan_{RE.md["scan_id"]:06}'
-        self._write_path_template = f'Z:\\proposals\\{RE.md["cycle"]}\\{RE.md["data_session"]}\\assets\\perkin-elmer\\%Y\\scan_{RE.md["scan_id"]:06}\\'
+        run_info = run_path_snapshot.get()
+        self._read_path_template = f'/nsls2/data/hex/proposals/{run_info.cycle}/{run_info.data_session}/assets/perkin-elmer/%Y/scan_{run_info.scan_id:06}'
+        self._write_path_template = f'Z:\\proposals\\{run_info.cycle}\\{run_info.data_session}\\assets\\perkin-elmer\\%Y\\scan_{run_info.scan_id:06}\\'
         print(f"{self._read_path_template = }")
         print(f"{self._write_path_template = }")
 
@@ -197,8 +198,10 @@ class HEXPerkinElmer(ContinuousAcquisitionTrigger, PerkinElmerDetector):
 try:
     # PE1 detector configurations:
     pe1_pv_prefix = 'XF:27ID1-ES{PE-Det:1}'
-    pe1 = HEXPerkinElmer(pe1_pv_prefix, name='pe1',
-                     read_attrs=['tiff'])
+    with file_loading_timer.timed("device_construction"):
+        pe1 = HEXPerkinElmer(pe1_pv_prefix, name='pe1',
+                             read_attrs=['tiff'])
+    device_registry.register(pe1)
 except:
     print("Perkin Elmer not connected...")
 
@@ -2,16 +2,16 @@ file_loading_timer.start_timer(__file__)
 
 from ophyd_async.epics import advimba
 
-try:
-    with init_devices(mock=RUNNING_IN_NSLS2_CI):
-        vimba_path_provider = ProposalNumYMDPathProvider(default_filename_provider)
-        smpl_align_cam = advimba.VimbaDetector(
-            "XF:27ID1-ES{Sample-Cam:1}",
-            vimba_path_provider,
-            name=f"smpl_align_cam",
-        )
-except Exception as e:
-    print(f"Sample alignment camera is unavailable...")
+with file_loading_timer.timed("device_construction"), init_devices(connect=False):
+    vimba_path_provider = ProposalNumYMDPathProvider(default_filename_provider)
+    smpl_align_cam = advimba.VimbaDetector(
+        "XF:27ID1-ES{Sample-Cam:1}",
+        vimba_path_provider,
+        name=f"smpl_align_cam",
+    )
+
+# The connection completes in the background, see 02-device-registry.py.
+device_registry.register(smpl_align_cam, mock=RUNNING_IN_NSLS2_CI)
 
 
 print(f"Loading file {__file__!r} ...")
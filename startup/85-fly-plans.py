@@ -6,6 +6,14 @@ DEG_PER_REVOLUTION = 360
 COUNTS_PER_DEG = COUNTS_PER_REVOLUTION / DEG_PER_REVOLUTION
 ZERO_OFFSET = 39660
 
+import dataclasses
+import functools
+import itertools
+import math
+
+import numpy as np
+from bluesky.utils import Msg, short_uid
+from ophyd_async.core import wait_for_value
 from ophyd_async.epics.adkinetix import KinetixReadoutMode
 
 DETECTOR_MAX_FRAMERATES = {
@@ -18,6 +26,49 @@ DETECTOR_MAX_FRAMERATES = {
 TOMO_ROTARY_STAGE_VELO_RESET_MAX = 30
 TOMO_ROTARY_STAGE_VELO_SCAN_MAX = 60
 
+# Minimum time between the end of an exposure and the next trigger of a fly scan.
+TOMO_FLYSCAN_EXPOSURE_OVERHEAD = 0.005
+# Sustained write bandwidth of the detector file storage in bytes/s, None if unknown.
+# Measure it with `benchmark_write_bandwidth(set_default=True)`, defined by
+# benchmarks/write_bandwidth.py.
+TOMO_WRITE_BANDWIDTH = None
+# Longest write stall of the file storage the HDF5 plugin queues must absorb, in s.
+TOMO_WRITE_STALL_TIME = 2.0
+# IOC memory the HDF5 plugin queue of one detector may hold, in bytes.
+TOMO_WRITE_QUEUE_MAX_BYTES = 4 * 2**30
+# Time to open and close the run, stage the devices and open and close the
+# photon shutter in every fly scan, in s. A rough estimate used to plan grid
+# scans; compare with the times the grid scans print.
+TOMO_FLYSCAN_RUN_OVERHEAD = 5
+# PandA FPGA clock period, the resolution of the pulse block timing.
+PANDA_CLOCK_PERIOD = 8e-9
+# PandA pulse block triggering each detector in a fly scan, PULSE1 if not listed.
+# The other blocks must be triggered by PCOMP1.OUT like PULSE1 and wired to the
+# detector in the PandA layout, e.g. {"kinetix3": 3}; a detector with its own
+# block runs at an integer fraction of the PULSE1 rate instead of slowing the
+# whole scan down. PULSE2 is used by the dark/flat pulse trains.
+TOMO_DETECTOR_PULSE_BLOCKS = {}
+
+# Time added to the exposure time between two pulses of a software fly scan.
+SOFTWARE_FLYSCAN_PULSE_OVERHEAD = 0.1
+
+# Signals tracking the flat field intensity, read while the flats are taken and
+# after the projections of a scan, with the photon shutter open: beam intensity
+# monitors, or the mean of a detector ROI outside of the sample.
+DARK_FLAT_DRIFT_SIGNALS = []
+# Relative change of a drift signal after which the darks and flats are retaken.
+DARK_FLAT_DRIFT_THRESHOLD = 0.02
+# Darks and flats are retaken when they are older than this, in s, even without drift.
+DARK_FLAT_MAX_AGE = 3600
+
+# Fraction of its HDF5 plugin queue a detector may fall behind the PandA in a
+# fly scan before `FrameCountMonitor` warns...
+FRAME_MONITOR_WARN_FRACTION = 0.5
+# ...and before it takes FRAME_MONITOR_ACTION: "warn", "pause" (after the scan)
+# or "abort".
+FRAME_MONITOR_ACTION_FRACTION = 0.9
+FRAME_MONITOR_ACTION = "warn"
+
 
 # def close_shutter():
 #     """Close the shutter after the scan."""
@@ -28,16 +79,365 @@ TOMO_ROTARY_STAGE_VELO_SCAN_MAX = 60
 def post_tomo_fly_cleanup():
     """Cleanup to perform at the end of every flyscan"""
 
+    # The frame monitor of a failed scan, its summary still goes to the stop document.
+    if FrameCountMonitor.active is not None:
+        FrameCountMonitor.active.finish()
+
     yield from close_ph_shutter()
-    
+
     # Reset the velocity back to high.
     yield from bps.abs_set(tomo_rot_axis.velocity, TOMO_ROTARY_STAGE_VELO_RESET_MAX)
 
 
-def software_flyscan(detectors: list[StandardDetector], num_images: int, exposure_time: float, stream_name: str):
+def wait_for_signal_values(*args, timeout=DEFAULT_TIMEOUT):
+    """
+    Wait until ophyd-async signals read the given values, instead of a fixed sleep.
+
+    Arguments are given as for `bps.mv`: signal1, value1, signal2, value2, ...
+    Raises a TimeoutError if a signal does not get its value within `timeout` seconds.
+    """
+    pairs = list(zip(args[::2], args[1::2]))
+    futures = yield from bps.wait_for(
+        [
+            functools.partial(wait_for_value, signal, value, timeout=timeout)
+            for signal, value in pairs
+        ]
+    )
+    for future in futures:
+        future.result()
+
+
+def wait_for_detectors_armed(detectors, timeout=DEFAULT_TIMEOUT):
+    """Wait until the detectors wait for triggers and their files are open."""
+    yield from wait_for_signal_values(
+        *itertools.chain.from_iterable(
+            (det.driver.acquire, True, det.fileio.capture, True) for det in detectors
+        ),
+        timeout=timeout,
+    )
+
+
+def wait_for_position(motor, position, direction=1, timeout=None):
+    """
+    Wait until the readback of `motor` reaches `position`, moving in `direction`.
+
+    The plan continues from the readback monitor as soon as the position is
+    reached (or already passed), without polling. Works with ophyd and
+    ophyd-async motors and signals. Raises a TimeoutError after `timeout`
+    seconds. Returns the readback value.
+    """
+    readback = getattr(motor, "user_readback", motor)
+
+    async def position_reached():
+        loop = asyncio.get_running_loop()
+        reached = loop.create_future()
+
+        def set_reached(value):
+            if not reached.done():
+                reached.set_result(value)
+
+        def check(value, **kwargs):
+            if (value - position) * direction >= 0:
+                # ophyd callbacks run in the CA threads.
+                loop.call_soon_threadsafe(set_reached, value)
+
+        if hasattr(readback, "subscribe_value"):
+            readback.subscribe_value(check)
+        else:
+            readback.subscribe(check, run=True)
+        try:
+            return await asyncio.wait_for(reached, timeout)
+        finally:
+            readback.clear_sub(check)
+
+    (future,) = yield from bps.wait_for([position_reached])
+    return future.result()
+
+
+def frames_captured_signal(detector):
+    """Signal counting the frames (or PandA samples) written by `detector`."""
+    if hasattr(detector, "data"):
+        return detector.data.num_captured
+    return detector.fileio.num_captured
+
+
+def wait_for_frames_captured(detectors, num_frames, timeout=DEFAULT_TIMEOUT):
+    """
+    Wait until all the detectors have written at least `num_frames` frames.
+
+    `num_frames` is a number for all the detectors, or a dict by detector name.
+    """
+    if not isinstance(num_frames, dict):
+        num_frames = {det.name: num_frames for det in detectors}
+    futures = yield from bps.wait_for(
+        [
+            functools.partial(
+                wait_for_value,
+                frames_captured_signal(det),
+                lambda value, target=num_frames[det.name]: value >= target,
+                timeout=timeout,
+            )
+            for det in detectors
+        ]
+    )
+    for future in futures:
+        future.result()
+
+
+def tomo_streams(panda, detectors, frame_dividers):
+    """
+    Group the devices of a fly scan by stream name.
+
+    The PandA and the detectors taking every trigger go to the "tomo" stream.
+    A detector taking every n-th trigger (see `TomoTrajectory.frame_dividers`)
+    has fewer frames and goes to its own "tomo_<name>" stream; its frame k was
+    triggered together with frame k * n of the "tomo" stream (per tomogram).
+    """
+    streams = {"tomo": [panda]}
+    for det in detectors:
+        if frame_dividers.get(det.name, 1) == 1:
+            streams["tomo"].append(det)
+        else:
+            streams[f"tomo_{det.name}"] = [det]
+    return streams
+
+
+class FrameLagError(RuntimeError):
+    """A detector fell too far behind the PandA triggers in a fly scan."""
+
+
+class FrameCountMonitor:
+    """
+    Follow the frame counters of the devices of a fly scan while it runs.
+
+    Subscribed to the capture counter of the PandA and of every detector (see
+    `frames_captured_signal`), it tracks their frame rates and the lag of
+    every detector: the frames the PandA captured a trigger for that the
+    detector has not written yet. A detector taking every n-th trigger (see
+    `TomoTrajectory.frame_dividers`) expects `TomoTrajectory.detector_images`
+    frames per tomogram of the `trajectory`, its pulse block restarts with
+    every tomogram. The PandA writes its own samples in batches, so the lag
+    is a lower bound.
+
+    When the lag of a detector reaches `FRAME_MONITOR_WARN_FRACTION` of its
+    HDF5 plugin queue (`fileio.queue_size`), a warning is printed. At
+    `FRAME_MONITOR_ACTION_FRACTION`, `check` takes the `action`: "warn",
+    "pause" (a deferred pause, the RunEngine pauses at the next checkpoint,
+    e.g. before the next scan of `tomo_loop`) or "abort" (raises
+    `FrameLagError`). `summary` is recorded as `frame_monitor` in the stop
+    document of the run.
+    """
+
+    def __init__(self, panda, detectors, trajectory=None, action=None):
+        self.panda = panda
+        self.detectors = detectors
+        self.trajectory = trajectory
+        self.action = action or FRAME_MONITOR_ACTION
+        self.queue_sizes = {}
+        # Device name: (time, count) of the first and of the last update.
+        self.first = {}
+        self.last = {}
+        self.max_lag = {}
+        self.warned = set()
+        self.overflow = None
+        self._acted = False
+        self._callbacks = {}
+
+    # The monitor of the running scan, finished by `post_tomo_fly_cleanup` if the
+    # scan fails.
+    active = None
+
+    def start(self):
+        """Plan reading the queue sizes and subscribing to the capture counters."""
+        if FrameCountMonitor.active is not None:
+            FrameCountMonitor.active.stop()
+        FrameCountMonitor.active = self
+        for det in self.detectors:
+            if hasattr(det.fileio, "queue_size"):
+                self.queue_sizes[det.name] = yield from bps.rd(det.fileio.queue_size)
+        for device in [self.panda] + self.detectors:
+            callback = functools.partial(self._update, device.name)
+            frames_captured_signal(device).subscribe_value(callback)
+            self._callbacks[device] = callback
+
+    def stop(self):
+        for device, callback in self._callbacks.items():
+            frames_captured_signal(device).clear_sub(callback)
+        self._callbacks.clear()
+        if FrameCountMonitor.active is self:
+            FrameCountMonitor.active = None
+
+    def finish(self):
+        """Record the summary in the stop document and unsubscribe, before close_run."""
+        self.record()
+        self.stop()
+
+    def expected_frames(self, name, triggers):
+        """Frames of detector `name` exposed by the first `triggers` PandA triggers."""
+        if self.trajectory is None or self.trajectory.frame_dividers.get(name, 1) == 1:
+            return triggers
+        tomograms, triggers = divmod(triggers, self.trajectory.num_images)
+        expected = tomograms * self.trajectory.detector_images(name)
+        if triggers:
+            expected += tomo_frame_count(triggers, self.trajectory.frame_dividers[name])
+        return expected
+
+    def lag(self, name):
+        """Frames of `name` the PandA captured a trigger for, not written yet."""
+        triggers = self.last.get(self.panda.name, (0, 0))[1]
+        return self.expected_frames(name, triggers) - self.last.get(name, (0, 0))[1]
+
+    def _update(self, name, value):
+        now = ttime.monotonic()
+        self.first.setdefault(name, (now, value))
+        self.last[name] = (now, value)
+        for det in self.detectors:
+            lag = self.lag(det.name)
+            self.max_lag[det.name] = max(self.max_lag.get(det.name, 0), lag)
+            queue_size = self.queue_sizes.get(det.name)
+            if not queue_size:
+                continue
+            if (
+                lag >= FRAME_MONITOR_WARN_FRACTION * queue_size
+                and det.name not in self.warned
+            ):
+                self.warned.add(det.name)
+                print(
+                    f"WARNING: {det.name} is {lag} frames behind the PandA triggers, "
+                    f"its HDF5 queue holds {queue_size}."
+                )
+            if (
+                lag >= FRAME_MONITOR_ACTION_FRACTION * queue_size
+                and self.overflow is None
+            ):
+                self.overflow = (det.name, lag, queue_size)
+
+    def rate(self, name):
+        """Average frame rate of device `name` since the monitor started, in Hz."""
+        (t0, n0), (t1, n1) = self.first.get(name, (0, 0)), self.last.get(name, (0, 0))
+        return (n1 - n0) / (t1 - t0) if t1 > t0 else 0.0
+
+    def summary(self):
+        return {
+            name: {
+                "frames": self.last.get(name, (0, 0))[1],
+                "rate": self.rate(name),
+                "max_lag": self.max_lag.get(name, 0),
+                "queue_size": self.queue_sizes.get(name),
+            }
+            for name in [self.panda.name] + [det.name for det in self.detectors]
+        }
+
+    def record(self):
+        """Add the summary to the stop document of the current run."""
+        stop_document_extras.update(frame_monitor=self.summary())
+
+    def check(self):
+        """Plan taking the action once a detector lag reaches the action fraction."""
+        if self.overflow is None or self._acted:
+            return
+        self._acted = True
+        name, lag, queue_size = self.overflow
+        message = (
+            f"{name} fell {lag} frames behind the PandA triggers, "
+            f"its HDF5 queue holds {queue_size}."
+        )
+        if self.action == "abort":
+            self.record()
+            raise FrameLagError(message)
+        if self.action == "pause":
+            print(f"{message} Pausing after this scan...")
+            yield Msg("pause", None, defer=True)
+        else:
+            print(f"WARNING: {message}")
+
+
+def collect_tomo_streams(streams, complete=False, flush_period=1, monitor=None):
+    """
+    Collect the frames written so far into their streams.
+
+    With `complete`, keep collecting every `flush_period` seconds until all the
+    devices are complete, as `bps.collect_while_completing` does for one stream.
+    A `FrameCountMonitor` is checked after every collection.
+    """
+    if not complete:
+        for stream_name, devices in streams.items():
+            yield from bps.collect(*devices, name=stream_name)
+        if monitor is not None:
+            yield from monitor.check()
+        return
+
+    group = short_uid("complete")
+    yield from bps.complete_all(
+        *itertools.chain.from_iterable(streams.values()), group=group, wait=False
+    )
+    done = False
+    while not done:
+        done = yield from bps.wait(
+            group=group, timeout=flush_period, error_on_timeout=False
+        )
+        for stream_name, devices in streams.items():
+            yield from bps.collect(*devices, name=stream_name)
+        if monitor is not None:
+            yield from monitor.check()
+
+
+def setup_tomo_writers(detectors, queue_sizes):
+    """
+    Prepare the file writers of the detectors for the projections of a fly scan.
+
+    The files are named as projections and written with the `tomo_flyscan`
+    layout, and the HDF5 plugin queues are resized to `queue_sizes` (by
+    detector name, see `TomoTrajectory.queue_sizes`).
+    """
+    for det in detectors:
+        det._writer._path_provider._filename_provider.set_frame_type(TomoFrameType.proj)
+        if hasattr(det._writer, "set_scan_type"):
+            det._writer.set_scan_type(ScanType.tomo_flyscan)
+        if hasattr(det.fileio, "queue_size"):
+            yield from bps.mv(det.fileio.queue_size, queue_sizes[det.name])
+
+
+def print_tomo_scan_completed(*messages):
+    """Print the banner at the end of a fly scan, with the `messages` inside."""
+    print("====================================================")
+    print("====================================================\n\n")
+    for message in messages:
+        print(f"{message}\n")
+    print("====================================================")
+    print("====================================================\n\n")
 
-    yield from bps.stage_all(*detectors)
 
+def print_frames_captured(devices):
+    """Print the number of frames (or PandA samples) written by every device."""
+    captured = {}
+    for device in devices:
+        captured[device.name] = yield from bps.rd(frames_captured_signal(device))
+
+    print("Number frames captured:\n")
+    for cap in captured.keys():
+        print(f"    {cap:15}: {captured[cap]}")
+
+
+def rearm_tomo_pcomp(panda):
+    """
+    Re-arm the position compare block after it sent its pulses.
+
+    The enable input of PCOMP1 is wired to PCAP.ACTIVE (see the PandA layout in
+    the README), so it is only armed once per capture. Toggling the input
+    re-arms it without stopping the capture.
+    """
+    panda_pcomp = panda.pcomp[1]
+    yield from bps.mv(panda_pcomp.enable, "ZERO")
+    yield from bps.mv(panda_pcomp.enable, "PCAP.ACTIVE")
+
+
+def start_software_flyscan(detectors, num_images, exposure_time, stream_name):
+    """
+    Prepare the (staged) detectors and start the PandA pulse train triggering them.
+
+    Returns the duration of the pulse train in seconds.
+    """
     trigger_info = TriggerInfo(
         number_of_triggers=num_images,
         trigger=DetectorTrigger.EDGE_TRIGGER,
@@ -49,7 +449,7 @@ def software_flyscan(detectors: list[StandardDetector], num_images: int, exposur
 
     yield from bps.declare_stream(*detectors, name=stream_name)
 
-    yield from bps.sleep(1.0)
+    yield from wait_for_detectors_armed(detectors)
 
     yield from bps.mv(
         panda1.bits.a, 0,
@@ -57,28 +457,204 @@ def software_flyscan(detectors: list[StandardDetector], num_images: int, exposur
     )
 
     yield from bps.kickoff_all(*detectors, wait=True)
+    step = exposure_time + SOFTWARE_FLYSCAN_PULSE_OVERHEAD
+    yield from configure_panda(
+        {
+            panda1.pulse[2].pulses: num_images,
+            panda1.pulse[2].step: step,
+            panda1.pulse[2].width: exposure_time / 2,
+        }
+    )
+
+    # The puts above complete once the PandA applied them, the pulse train can start.
     yield from bps.mv(
-        panda1.pulse[2].pulses, num_images,
-        panda1.pulse[2].step, exposure_time + 0.1,
-        panda1.pulse[2].width, exposure_time / 2,
+        panda1.bits.a,
+        1,
         wait=True,
     )
+    return num_images * step
 
-    yield from bps.sleep(1.0)
 
-    yield from bps.mv(
-        panda1.bits.a, 1,
-        wait=True,
+def software_flyscan(
+    detectors: list[StandardDetector],
+    num_images: int,
+    exposure_time: float,
+    stream_name: str,
+    stage: bool = True,
+):
+
+    if stage:
+        yield from bps.stage_all(*detectors)
+
+    acquisition_time = yield from start_software_flyscan(
+        detectors, num_images, exposure_time, stream_name
     )
-    
+
     # yield from bps.complete_all(*detectors, wait=True)
     # for det in detectors:
     #     yield from bps.collect(det, name=stream_name)
 
     yield from bps.collect_while_completing(detectors, detectors, flush_period=1, stream_name=stream_name)
 
+    if stage:
+        yield from bps.unstage_all(*detectors)
+
+    return acquisition_time
+
+
+def pipelined_dark_flat(
+    detectors, exposure_time, offset, dark_images, flat_images, use_shutter
+):
+    """
+    Collect the dark and flat streams with the detectors staged once.
+
+    The sample move and the shutter opening start as soon as the last dark frame
+    is exposed and run while the dark frames are still being written. Closing
+    the shutter overlaps with staging the detectors. Returns the time spent
+    acquiring frames in seconds.
+    """
+    setup_group = short_uid("dark_flat_setup")
+
+    if use_shutter:
+        yield from bps.abs_set(ph_shutter, ph_shutter.close_str, group=setup_group)
+
+    for detector in detectors:
+        detector._writer._path_provider._filename_provider.set_frame_type(
+            TomoFrameType.dark
+        )
+    yield from bps.stage_all(*detectors)
+
+    yield from bps.wait(group=setup_group)
+
+    dark_time = yield from start_software_flyscan(
+        detectors, dark_images, exposure_time, "dark"
+    )
+
+    # Acquire goes back to False once the last dark frame is exposed.
+    yield from wait_for_signal_values(
+        *itertools.chain.from_iterable(
+            (det.driver.acquire, False) for det in detectors
+        ),
+        timeout=dark_time + DEFAULT_TIMEOUT,
+    )
+    yield from bps.rel_set(sample_tower.axis_x1, offset, group=setup_group)
+    if use_shutter:
+        yield from bps.abs_set(ph_shutter, ph_shutter.open_str, group=setup_group)
+
+    yield from bps.collect_while_completing(
+        detectors, detectors, flush_period=1, stream_name="dark"
+    )
+
+    # Close the dark files, the flats are written to new ones.
+    futures = yield from bps.wait_for([det.close_files for det in detectors])
+    for future in futures:
+        future.result()
+    for detector in detectors:
+        detector._writer._path_provider._filename_provider.set_frame_type(
+            TomoFrameType.flat
+        )
+
+    yield from bps.wait(group=setup_group)
+
+    flat_time = yield from software_flyscan(
+        detectors, flat_images, exposure_time, "flat", stage=False
+    )
+
     yield from bps.unstage_all(*detectors)
 
+    return dark_time + flat_time
+
+
+def read_dark_flat_drift_signals(signals=None):
+    """Read the mean of every drift signal, by default `DARK_FLAT_DRIFT_SIGNALS`."""
+    if signals is None:
+        signals = DARK_FLAT_DRIFT_SIGNALS
+    values = {}
+    for signal in signals:
+        value = yield from bps.rd(signal)
+        values[signal.name] = float(np.mean(value))
+    return values
+
+
+def dark_flat_drift(reference_values, values):
+    """Relative change of every signal read both at the reference and now."""
+    drift = {}
+    for name, reference in reference_values.items():
+        if name not in values:
+            continue
+        if reference:
+            drift[name] = (values[name] - reference) / abs(reference)
+        else:
+            drift[name] = 0.0 if values[name] == reference else math.inf
+    return drift
+
+
+def dark_flat_decision(
+    reference,
+    values,
+    now,
+    threshold=DARK_FLAT_DRIFT_THRESHOLD,
+    max_age=DARK_FLAT_MAX_AGE,
+):
+    """
+    Decide whether the darks and flats must be retaken.
+
+    `reference` is the `RE.md['current_dark_flat_reference']` recorded by
+    `tomo_dark_flat` (time and drift signal values during the flats), `values`
+    the drift signal values measured since, `now` the current time. Darks and
+    flats are due without a reference, when the reference is older than
+    `max_age` s, when a signal changed by more than `threshold` (relative),
+    and when no signal can be compared (never skip them without a check).
+    Returns whether they are due and the reason.
+    """
+    if not reference:
+        return True, "no darks and flats recorded"
+    age = now - reference["time"]
+    if max_age is not None and age > max_age:
+        return True, f"the last darks and flats are {age / 60:.0f} min old"
+    drift = dark_flat_drift(reference["values"], values or {})
+    if not drift:
+        return True, "no drift signal to compare"
+    name, change = max(drift.items(), key=lambda item: abs(item[1]))
+    if abs(change) > threshold:
+        return True, f"{name} changed by {change:+.1%}"
+    return False, f"largest change {change:+.1%} ({name})"
+
+
+def check_adaptive_dark_flat():
+    """Raise if darks and flats cannot be skipped adaptively, without a drift signal."""
+    if not DARK_FLAT_DRIFT_SIGNALS:
+        raise ValueError(
+            "adaptive_dark_flat needs at least one signal in DARK_FLAT_DRIFT_SIGNALS "
+            "to compare the beam with the last flats."
+        )
+
+
+def adaptive_tomo_dark_flat(values, **dark_flat_kwargs):
+    """
+    Take darks and flats with `tomo_dark_flat` if `dark_flat_decision` finds them due.
+
+    `values` are the drift signal values measured after the last projections
+    (see `read_dark_flat_drift_signals`). Returns whether they were taken.
+    """
+    reference = RE.md.get("current_dark_flat_reference")
+    if reference and reference.get("uid") != RE.md.get("current_dark_flat_scan_uid"):
+        # Darks and flats taken by another plan, without the drift signals.
+        reference = None
+    due, reason = dark_flat_decision(
+        reference,
+        values,
+        ttime.time(),
+        threshold=DARK_FLAT_DRIFT_THRESHOLD,
+        max_age=DARK_FLAT_MAX_AGE,
+    )
+    if not due:
+        print(f"Skipping dark, flat: {reason}.")
+        return False
+    print(f"Taking dark, flat: {reason}...")
+    yield from tomo_dark_flat(**dark_flat_kwargs)
+    return True
+
 
 @bpp.finalize_decorator(post_tomo_fly_cleanup)
 def tomo_dark_flat(
@@ -88,8 +664,19 @@ def tomo_dark_flat(
     dark_images=50,
     flat_images=50,
     use_shutter=True,
+    pipelined=True,
     md=None,
 ):
+    """
+    Collect dark and flat images, with the sample moved by `offset` for the flats.
+
+    With `pipelined`, the detectors are staged once for both streams and the
+    sample move and shutter opening overlap with writing the darks (see
+    `pipelined_dark_flat`, the detectors need a `close_files` method like
+    HEXKinetixDetector); otherwise the steps run one after the other. The dead
+    time (total time minus the time spent acquiring frames) is printed at the
+    end and returned, in seconds.
+    """
 
     if detectors is None or detectors == ["kinetix1"]:
         detectors = [kinetix1]
@@ -101,48 +688,55 @@ def tomo_dark_flat(
     _md = md or {}
     _md.update({"tomo_scanning_mode": ScanType.tomo_dark_flat.value})
 
+    for detector in detectors:
+        if hasattr(detector._writer, "set_scan_type"):
+            detector._writer.set_scan_type(ScanType.tomo_dark_flat)
+
+    start_time = ttime.monotonic()
     dark_flat_start_uuid = yield from bps.open_run(md=_md)
 
     print(f"\n=============================\n\nCollecting dark and flat images with scan number {RE.md['scan_id']}...")
 
-    #### DARKS ####
+    if pipelined:
+        acquisition_time = yield from pipelined_dark_flat(
+            detectors, exposure_time, offset, dark_images, flat_images, use_shutter
+        )
+    else:
+        #### DARKS ####
+
+        # Collect dark frames:
+        if use_shutter:
+            yield from close_ph_shutter()
 
-    # Collect dark frames:
-    if use_shutter:
-        yield from close_ph_shutter()
+        for detector in detectors:
+            detector._writer._path_provider._filename_provider.set_frame_type(
+                TomoFrameType.dark
+            )
 
-    for detector in detectors:
-        detector._writer._path_provider._filename_provider.set_frame_type(
-            TomoFrameType.dark
+        acquisition_time = yield from software_flyscan(
+            detectors, dark_images, exposure_time, "dark"
         )
 
-    yield from software_flyscan(
-        detectors,
-        dark_images,
-        exposure_time,
-        "dark"
-    )
+        #### FLATS ####
 
-    #### FLATS ####
+        # Move sample out of the way:
+        yield from bps.movr(sample_tower.axis_x1, offset)
 
-    # Move sample out of the way:
-    yield from bps.movr(sample_tower.axis_x1, offset)
+        # Collect flat images:
+        if use_shutter:
+            yield from open_ph_shutter()
 
-    # Collect flat images:
-    if use_shutter:
-        yield from open_ph_shutter()
+        for detector in detectors:
+            detector._writer._path_provider._filename_provider.set_frame_type(
+                TomoFrameType.flat
+            )
 
-    for detector in detectors:
-        detector._writer._path_provider._filename_provider.set_frame_type(
-            TomoFrameType.flat
+        acquisition_time += yield from software_flyscan(
+            detectors, flat_images, exposure_time, "flat"
         )
 
-    yield from software_flyscan(
-        detectors,
-        flat_images,
-        exposure_time,
-        "flat"
-    )
+    # The shutter is still open, read the intensity the next scans are compared with.
+    drift_values = yield from read_dark_flat_drift_signals()
 
     yield from bps.close_run()
 
@@ -154,7 +748,6 @@ def tomo_dark_flat(
         panda1.bits.a, 0,
         wait=True
     )
-   
 
     # Move sample back:
     yield from bps.movr(sample_tower.axis_x1, -offset)
@@ -162,10 +755,22 @@ def tomo_dark_flat(
     # Keep track of current dark/flat scan id here
     RE.md['current_dark_flat_scan_num'] = RE.md['scan_id']
     RE.md['current_dark_flat_scan_uid'] = dark_flat_start_uuid
+    RE.md["current_dark_flat_reference"] = {
+        "uid": dark_flat_start_uuid,
+        "time": ttime.time(),
+        "values": drift_values,
+    }
 
+    total_time = ttime.monotonic() - start_time
     print("====================================================\n\n")
     print(f"Completed collection of dark and flat images with scan number: {RE.md['scan_id']}.")
+    dead_time = total_time - acquisition_time
+    print(
+        f"Dead time: {dead_time:.1f} s of {total_time:.1f} s "
+        f"({'pipelined' if pipelined else 'sequential'})."
+    )
     print("====================================================\n\n")
+    return dead_time
 
 
 def home_rotation_stage():
@@ -176,282 +781,1622 @@ def home_rotation_stage():
     yield from bps.mv(tomo_rot_axis, 0)
 
 
-
-@bpp.finalize_decorator(post_tomo_fly_cleanup)
-def tomo_flyscan(
-    exposure_time,
-    num_images,
-    start_deg=0,
-    stop_deg=180,
-    lead_angle=10,    
-    use_shutter=True,    
-    detectors=["kinetix1"],
-    sample_name=None,
-    acquire_period=0.0,
-    time_trigger=True,
-    reset_speed=TOMO_ROTARY_STAGE_VELO_RESET_MAX,
-):
-    """Simple hardware triggered flyscan tomography
-
-    Parameters
-    ----------
-    exposure_time : float
-        exposure time to use on the camera, in seconds
-    num_images : int
-        total number of camera images to collect during the scan
-    start_deg : float (optional)
-        starting point in degrees
-    stop_deg : float (optional)
-        stopping point in degrees
-    lead_angle : float (optional)
-        the angle in degrees to be used to move motor to -lead_angle before 'start_deg' and +lead_angle after 'stop_deg'
-    reset_speed : float
-        speed of the rotary motor during reset movements, in deg/s
-    use_shutter : bool
-        whether to use/check the shutter during the scan
+def tomo_scan_endpoints(start_deg, stop_deg, lead_angle, reverse=False):
     """
+    Return the rotation direction (1 or -1), the angle where the triggers start,
+    and the angles where the rotation starts and ends.
 
+    A forward scan triggers from `start_deg` to `stop_deg`, a reverse scan from
+    `stop_deg` to `start_deg`; the rotation starts and ends `lead_angle` outside
+    of that range. A scan ends where the scan in the other direction starts.
+    """
+    first_deg, last_deg = (stop_deg, start_deg) if reverse else (start_deg, stop_deg)
+    direction = 1 if last_deg >= first_deg else -1
+    return (
+        direction,
+        first_deg,
+        first_deg - direction * lead_angle,
+        last_deg + direction * lead_angle,
+    )
 
-    overhead = 0.005
-    
-    panda = panda1
-
-    if detectors is None or detectors == ["kinetix1"]:
-        detectors = [kinetix1]
-
-    if use_shutter:
-        if (yield from bps.rd(fe_shutter_status)) != 1:
-            raise RuntimeError(f"\n    Front-end shutter is closed. Reopen it!\n")
-
-        yield from open_ph_shutter()
 
-    all_detectors = [panda] + detectors
+@dataclasses.dataclass(frozen=True)
+class TomoDetectorSpec:
+    """What limits the frame rate and data rate of a detector in a fly scan."""
 
-    panda_pcomp = panda.pcomp[1]
-    panda_pulser = panda.pulse[1]
+    name: str
+    readout_mode: str
+    max_framerate: float
+    frame_shape: tuple
+    dtype: str = "uint16"
 
-    mtr_reset_vel = reset_speed
-    if mtr_reset_vel > TOMO_ROTARY_STAGE_VELO_RESET_MAX:
-        mtr_reset_vel = TOMO_ROTARY_STAGE_VELO_RESET_MAX
+    @property
+    def frame_bytes(self):
+        return math.prod(self.frame_shape) * np.dtype(self.dtype).itemsize
 
-    if (acquire_period  + overhead) < exposure_time or acquire_period == 0.0:
-        acquire_period = exposure_time + overhead
 
-    scan_time = (num_images - 1) * acquire_period
-    rot_motor_vel = (stop_deg - start_deg) / scan_time
-    if rot_motor_vel > TOMO_ROTARY_STAGE_VELO_SCAN_MAX:
-        rot_motor_vel = TOMO_ROTARY_STAGE_VELO_SCAN_MAX
-        scan_time = abs(stop_deg - start_deg) / rot_motor_vel
+def tomo_frame_count(num_images, divider=1):
+    """Frames of a detector triggered on every `divider`-th of `num_images` triggers."""
+    return (num_images - 1) // divider + 1
 
-    step_time = acquire_period
 
-    framerate = 1 / step_time
+@dataclasses.dataclass
+class TomoTrajectory:
+    """
+    Timing of a tomography fly scan, as computed by `plan_tomo_trajectory`.
+
+    `step_limits` maps every constraint on the time between two triggers to the
+    minimum step time it imposes; `limiting_factor` is the largest of them.
+    `problems` lists the reasons the scan cannot run as requested, `warnings`
+    what may degrade the data. `frame_dividers` maps every detector to the
+    fraction of the triggers it takes (1 for all of them, 3 for every third
+    one) and `pulse_blocks` to the PandA pulse block triggering it.
+    `return_time` is the part of `duration` spent moving to the start.
+    `queue_sizes` is the HDF5 plugin queue of every detector, in frames, see
+    `tomo_writer_queue_sizes`.
+    """
 
-    for kinetix_det in detectors:
-        det_readout_mode = yield from bps.rd(kinetix_det.driver.readout_port_idx)
-        if framerate > DETECTOR_MAX_FRAMERATES[det_readout_mode]:
-            step_time = 1 / DETECTOR_MAX_FRAMERATES[det_readout_mode]
+    exposure_time: float
+    num_images: int
+    start_deg: float
+    stop_deg: float
+    lead_angle: float
+    number_of_tomograms: int
+    step_time: float
+    rot_motor_vel: float
+    limiting_factor: str
+    step_limits: dict
+    acquisition_time: float
+    duration: float
+    data_volume: int
+    data_rate: float
+    problems: list
+    warnings: list
+    frame_dividers: dict = dataclasses.field(default_factory=dict)
+    pulse_blocks: dict = dataclasses.field(default_factory=dict)
+    return_time: float = 0.0
+    queue_sizes: dict = dataclasses.field(default_factory=dict)
+
+    @property
+    def valid(self):
+        return not self.problems
+
+    @property
+    def framerate(self):
+        return 1 / self.step_time
+
+    @property
+    def scan_time(self):
+        """Time from the start of the rotation to the end of the deceleration."""
+        return self.duration - self.return_time
+
+    def detector_images(self, name):
+        """Number of frames of detector `name` per tomogram."""
+        return tomo_frame_count(self.num_images, self.frame_dividers.get(name, 1))
+
+    def check(self):
+        """Raise a ValueError listing the problems of an invalid trajectory."""
+        if self.problems:
+            raise ValueError(
+                "Invalid fly scan parameters:\n"
+                + "\n".join(f"  - {p}" for p in self.problems)
+            )
 
-    if exposure_time is not None:
-        if exposure_time > step_time:
-            raise RuntimeError(
-                f"Your configured exposure time is longer than the time per step {step_time} seconds!"
+    def report(self):
+        print(
+            f"Fly scan of {self.num_images} images "
+            f"x {self.number_of_tomograms} tomogram(s) "
+            f"from {self.start_deg} to {self.stop_deg} deg, "
+            f"{self.exposure_time} s exposure:"
+        )
+        print(
+            f"    Frame rate      : {self.framerate:.2f} Hz "
+            f"(step {self.step_time * 1e3:.3f} ms)"
+        )
+        print(f"    Rotation        : {self.rot_motor_vel:.3f} deg/s")
+        print(f"    Limited by      : {self.limiting_factor}")
+        for factor, step in sorted(self.step_limits.items(), key=lambda item: -item[1]):
+            print(f"        {factor:40}: {1 / step:10.2f} Hz max")
+        for name, divider in self.frame_dividers.items():
+            if divider > 1:
+                print(
+                    f"    {name:16}: every {divider} triggers "
+                    f"on PULSE{self.pulse_blocks[name]} "
+                    f"({self.framerate / divider:.2f} Hz, "
+                    f"{self.detector_images(name)} images)"
+                )
+        for name, queue_size in self.queue_sizes.items():
+            queue_time = queue_size * self.step_time * self.frame_dividers.get(name, 1)
+            print(
+                f"    {name:16}: HDF5 queue of {queue_size} frames ({queue_time:.1f} s)"
             )
+        print(f"    Acquisition     : {self.acquisition_time:.1f} s")
+        print(
+            f"    Estimated total : {self.duration:.1f} s "
+            "(with run-up and return moves)"
+        )
+        print(
+            f"    Data            : {self.data_volume / 1e9:.2f} GB "
+            f"at {self.data_rate / 1e6:.0f} MB/s"
+        )
+        for warning in self.warnings:
+            print(f"    WARNING         : {warning}")
+        for problem in self.problems:
+            print(f"    INVALID         : {problem}")
 
-    # step_width_counts = COUNTS_PER_REVOLUTION / (
-    #    (DEG_PER_REVOLUTION / (stop_deg - start_deg)) * (num_images - 1)
-    # )
-    # if int(step_width_counts) != round(step_width_counts, 5):
-    #    raise ValueError(
-    #        "The number of encoder counts per pulse is not an integer value!"
-    #    )
 
-    det_trigger_info = TriggerInfo(
-        number_of_triggers=num_images,
-        trigger=DetectorTrigger.EDGE_TRIGGER,
-        livetime=exposure_time,
-        deadtime=0.001,
+def tomo_writer_queue_sizes(
+    detector_specs,
+    frame_dividers,
+    step_time,
+    num_images,
+    write_bandwidth=None,
+    stall_time=TOMO_WRITE_STALL_TIME,
+    max_bytes=TOMO_WRITE_QUEUE_MAX_BYTES,
+):
+    """
+    The smallest HDF5 plugin queue of every detector, in frames, that drops no frames.
+
+    A queue holds the frames of `stall_time` s, and, when the detectors
+    together write faster than `write_bandwidth` (bytes/s), the backlog
+    growing over the `num_images` triggers (sharing the bandwidth in
+    proportion to the data rates). It never needs more than all the frames
+    of the scan, and holds at most `max_bytes` (None for no limit).
+    Returns {name: frames}.
+    """
+    frame_rates = {
+        spec.name: 1 / (step_time * frame_dividers.get(spec.name, 1))
+        for spec in detector_specs
+    }
+    data_rate = sum(
+        frame_rates[spec.name] * spec.frame_bytes for spec in detector_specs
     )
-
-    panda_trigger_info = TriggerInfo(
-        number_of_triggers=num_images,
-        trigger=DetectorTrigger.CONSTANT_GATE,
-        livetime=acquire_period,
-        deadtime=0.0001,
+    # Fraction of the incoming frames the storage cannot keep up with.
+    backlog_fraction = (
+        max(1 - write_bandwidth / data_rate, 0) if write_bandwidth and data_rate else 0
     )
+    queue_sizes = {}
+    for spec in detector_specs:
+        num_frames = tomo_frame_count(num_images, frame_dividers.get(spec.name, 1))
+        queue_size = math.ceil(
+            num_frames * backlog_fraction + frame_rates[spec.name] * stall_time
+        )
+        if max_bytes is not None:
+            queue_size = min(queue_size, max_bytes // spec.frame_bytes)
+        queue_sizes[spec.name] = max(min(queue_size, num_frames), 1)
+    return queue_sizes
 
-    # Make it fast to move to the start position:
-    yield from bps.mv(tomo_rot_axis.velocity, reset_speed)
 
-    # Move to start position to read encoder value    
-    yield from bps.mv(tomo_rot_axis, start_deg)
-    start_encoder = yield from bps.rd(panda.calc[2].out)
-    # Move to lead angle    
-    yield from bps.mv(tomo_rot_axis, start_deg - lead_angle)
-    # Set the velocity for the scan:
-    yield from bps.mv(tomo_rot_axis.velocity, rot_motor_vel)
-    # Set up the pcomp block
-    yield from bps.mv(panda_pcomp.start, int(start_encoder))
+def plan_tomo_trajectory(
+    exposure_time,
+    num_images,
+    detector_specs,
+    start_deg=0,
+    stop_deg=180,
+    lead_angle=10,
+    acquire_period=0.0,
+    number_of_tomograms=1,
+    reset_speed=TOMO_ROTARY_STAGE_VELO_RESET_MAX,
+    acceleration_time=None,
+    write_bandwidth=None,
+    detector_pulse_blocks=None,
+):
+    """
+    Compute the fastest valid trajectory of a tomography fly scan, without moving.
+
+    The time between two triggers is the largest of the minimum step times
+    imposed by the exposure (plus `TOMO_FLYSCAN_EXPOSURE_OVERHEAD`), the
+    requested `acquire_period`, the frame rate of every detector in its
+    readout mode, the maximum scan velocity of the rotary stage and the
+    sustained `write_bandwidth` of the detector files in bytes/s (if known),
+    rounded up to whole PandA clock ticks. The rotation velocity follows from
+    it. The disk bandwidth only limits the step time if the HDF5 plugin queues
+    cannot hold the backlog in `TOMO_WRITE_QUEUE_MAX_BYTES` each; the queue
+    sizes are in `queue_sizes` (see `tomo_writer_queue_sizes`).
+
+    `detector_specs` is a list of `TomoDetectorSpec` (see
+    `read_tomo_detector_specs`). `number_of_tomograms` > 1 plans consecutive
+    ranges of a continuously rotating scan. With `acceleration_time` (the ACCL
+    of the rotation axis, in s), a lead angle too short to reach the scan
+    velocity is reported as a warning. Returns a `TomoTrajectory`.
+
+    `detector_pulse_blocks` maps detector names to the PandA pulse block
+    triggering them (see `TOMO_DETECTOR_PULSE_BLOCKS`). Only the frame rate of
+    the detectors on PULSE1 limits the step time; a detector on another block
+    takes every n-th trigger, the smallest n its frame rate allows.
+    """
+    problems = []
+    warnings = []
+    if exposure_time is None or exposure_time <= 0:
+        problems.append(f"The exposure time must be positive, not {exposure_time}.")
+        exposure_time = 0
+    if num_images < 2:
+        problems.append(f"At least 2 images are needed, not {num_images}.")
+    scan_range = abs(stop_deg - start_deg)
+    if scan_range == 0:
+        problems.append("The start and stop angles are the same.")
+    # Consecutive ranges of a multi-turn scan need an extra step between the trains.
+    intervals = max(num_images if number_of_tomograms > 1 else num_images - 1, 1)
+
+    pulse_blocks = {
+        spec.name: (detector_pulse_blocks or {}).get(spec.name, 1)
+        for spec in detector_specs
+    }
+    for name, block in pulse_blocks.items():
+        if block == 2:
+            problems.append(
+                f"{name} cannot be triggered by PULSE2, "
+                "it runs the dark/flat pulse trains."
+            )
+    # The detectors on PULSE1 set the base rate, or the fastest ones if none is.
+    base_block = min(
+        set(pulse_blocks.values()),
+        key=lambda block: (
+            block != 1,
+            max(
+                1 / spec.max_framerate
+                for spec in detector_specs
+                if pulse_blocks[spec.name] == block
+            ),
+        ),
+        default=1,
+    )
 
-    # Uncomment if using gate trigger mode on camera
-    yield from bps.mv(
-        panda_pcomp.width, 3  # step_width_counts - 1
-    )  # Width in encoder counts that the pulse will be high
-    # yield from bps.mv(panda1_pcomp_1.step, step_width_counts)
-    if time_trigger:
-        yield from bps.mv(
-            panda_pcomp.pulses, 1,
-            panda_pulser.pulses, num_images,
-            panda_pulser.step, step_time,
-            panda_pulser.width, exposure_time / 5,
+    step_limits = {"exposure": exposure_time + TOMO_FLYSCAN_EXPOSURE_OVERHEAD}
+    if acquire_period:
+        step_limits["requested acquire period"] = acquire_period
+    for spec in detector_specs:
+        if pulse_blocks[spec.name] == base_block:
+            step_limits[f"{spec.name} frame rate ({spec.readout_mode})"] = (
+                1 / spec.max_framerate
+            )
+    if scan_range:
+        step_limits["rotary stage velocity"] = scan_range / (
+            intervals * TOMO_ROTARY_STAGE_VELO_SCAN_MAX
         )
-    else:
-        yield from bps.mv(panda_pcomp.pulses, num_images)
+
+    def step_and_dividers():
+        limiting_factor, step_time = max(step_limits.items(), key=lambda item: item[1])
+        # PULSE.STEP is a whole number of PandA clock ticks.
+        step_time = (
+            math.ceil(step_time / PANDA_CLOCK_PERIOD - 1e-6) * PANDA_CLOCK_PERIOD
+        )
+        # All the detectors on one pulse block take the same triggers.
+        block_steps = {}
+        for spec in detector_specs:
+            block = pulse_blocks[spec.name]
+            block_steps[block] = max(block_steps.get(block, 0), 1 / spec.max_framerate)
+        frame_dividers = {
+            spec.name: (
+                1
+                if pulse_blocks[spec.name] == base_block
+                else max(
+                    math.ceil(block_steps[pulse_blocks[spec.name]] / step_time - 1e-6),
+                    1,
+                )
+            )
+            for spec in detector_specs
+        }
+        return limiting_factor, step_time, frame_dividers
+
+    limiting_factor, step_time, frame_dividers = step_and_dividers()
+    total_images = num_images * number_of_tomograms
+
+    def backlog_fits():
+        backlog = tomo_writer_queue_sizes(
+            detector_specs,
+            frame_dividers,
+            step_time,
+            total_images,
+            write_bandwidth,
+            stall_time=0,
+            max_bytes=None,
+        )
+        return all(
+            backlog[spec.name] * spec.frame_bytes <= TOMO_WRITE_QUEUE_MAX_BYTES
+            for spec in detector_specs
+        )
+
+    if write_bandwidth and not backlog_fits():
+        # The backlog does not fit in the queues, slow down to the disk bandwidth.
+        # Bytes written per trigger, the divided detectors only write on some of them.
+        trigger_bytes = sum(
+            spec.frame_bytes / frame_dividers[spec.name] for spec in detector_specs
+        )
+        step_limits["disk bandwidth"] = trigger_bytes / write_bandwidth
+        limiting_factor, step_time, frame_dividers = step_and_dividers()
+    trigger_bytes = sum(
+        spec.frame_bytes / frame_dividers[spec.name] for spec in detector_specs
+    )
+    if write_bandwidth and trigger_bytes / step_time > write_bandwidth * (1 + 1e-6):
+        warnings.append(
+            f"The detectors write {trigger_bytes / step_time / 1e6:.0f} MB/s, "
+            f"more than the {write_bandwidth / 1e6:.0f} MB/s disk bandwidth; "
+            "the HDF5 queues hold the backlog."
+        )
+    queue_sizes = tomo_writer_queue_sizes(
+        detector_specs, frame_dividers, step_time, total_images, write_bandwidth
+    )
+
+    rot_motor_vel = scan_range / (intervals * step_time)
+    if acceleration_time and rot_motor_vel * acceleration_time / 2 > lead_angle:
+        warnings.append(
+            f"The lead angle {lead_angle} deg is too short "
+            f"to reach {rot_motor_vel:.2f} deg/s "
+            f"within the {acceleration_time} s acceleration, the first projections are "
+            "taken while accelerating "
+            f"(use at least {rot_motor_vel * acceleration_time / 2:.2f} deg)."
+        )
+
+    acquisition_time = total_images * step_time
+    motion_time = (2 * lead_angle / rot_motor_vel if rot_motor_vel else 0) + (
+        acceleration_time or 0
+    )
+    return_time = 0.0
+    if number_of_tomograms == 1:
+        # Run-up move to the start and back, at the reset speed.
+        return_time = (scan_range + 2 * lead_angle) / min(
+            reset_speed, TOMO_ROTARY_STAGE_VELO_RESET_MAX
+        )
+    data_volume = number_of_tomograms * sum(
+        tomo_frame_count(num_images, frame_dividers[spec.name]) * spec.frame_bytes
+        for spec in detector_specs
+    )
+
+    return TomoTrajectory(
+        exposure_time=exposure_time,
+        num_images=num_images,
+        start_deg=start_deg,
+        stop_deg=stop_deg,
+        lead_angle=lead_angle,
+        number_of_tomograms=number_of_tomograms,
+        step_time=step_time,
+        rot_motor_vel=rot_motor_vel,
+        limiting_factor=limiting_factor,
+        step_limits=step_limits,
+        acquisition_time=acquisition_time,
+        duration=acquisition_time + motion_time + return_time,
+        data_volume=data_volume,
+        data_rate=trigger_bytes / step_time,
+        problems=problems,
+        warnings=warnings,
+        frame_dividers=frame_dividers,
+        pulse_blocks=pulse_blocks,
+        return_time=return_time,
+        queue_sizes=queue_sizes,
+    )
+
+
+def read_tomo_detector_specs(detectors):
+    """Read the readout mode, frame shape and data type of the detectors."""
+    specs = []
+    for det in detectors:
+        readout_mode = yield from bps.rd(det.driver.readout_port_idx)
+        size_x = yield from bps.rd(det.driver.array_size_x)
+        size_y = yield from bps.rd(det.driver.array_size_y)
+        data_type = yield from bps.rd(det.driver.data_type)
+        specs.append(
+            TomoDetectorSpec(
+                name=det.name,
+                readout_mode=readout_mode.name,
+                max_framerate=DETECTOR_MAX_FRAMERATES[readout_mode],
+                frame_shape=(size_y, size_x),
+                dtype=data_type.value.lower(),
+            )
+        )
+    return specs
+
+
+def tomo_scan_planner(
+    exposure_time,
+    num_images,
+    start_deg=0,
+    stop_deg=180,
+    lead_angle=10,
+    detectors=["kinetix1"],
+    acquire_period=0.0,
+    number_of_tomograms=1,
+    reset_speed=TOMO_ROTARY_STAGE_VELO_RESET_MAX,
+    write_bandwidth=None,
+    detector_pulse_blocks=None,
+    verbose=True,
+):
+    """
+    Plan a tomography fly scan with the current detector settings, without moving.
+
+    Prints the frame rate, the factor limiting it, the estimated duration and
+    the data volume, and returns the `TomoTrajectory`. Use it to tune the scan
+    parameters before the beam time is spent, e.g.
+    `RE(tomo_scan_planner(0.002, 1800, detectors=[kinetix1, kinetix3]))`.
+    The detectors are triggered by the pulse blocks in `detector_pulse_blocks`
+    (`TOMO_DETECTOR_PULSE_BLOCKS` by default).
+    """
+    if detector_pulse_blocks is None:
+        detector_pulse_blocks = TOMO_DETECTOR_PULSE_BLOCKS
+    if detectors is None or detectors == ["kinetix1"]:
+        detectors = [kinetix1]
+
+    specs = yield from read_tomo_detector_specs(detectors)
+    acceleration_time = yield from bps.rd(tomo_rot_axis.acceleration)
+    trajectory = plan_tomo_trajectory(
+        exposure_time,
+        num_images,
+        specs,
+        start_deg=start_deg,
+        stop_deg=stop_deg,
+        lead_angle=lead_angle,
+        acquire_period=acquire_period,
+        number_of_tomograms=number_of_tomograms,
+        reset_speed=reset_speed,
+        acceleration_time=acceleration_time,
+        write_bandwidth=write_bandwidth or TOMO_WRITE_BANDWIDTH,
+        detector_pulse_blocks=detector_pulse_blocks,
+    )
+    if verbose:
+        trajectory.report()
+    return trajectory
+
+
+GOLDEN_RATIO = (1 + math.sqrt(5)) / 2
+
+
+def golden_angle_list(num_images, images_per_turn, start_deg=0, range_deg=180):
+    """
+    Golden-angle projection angles, in acquisition order for a continuous rotation.
+
+    Projection k is at `start_deg + (k * range_deg / GOLDEN_RATIO) % range_deg`,
+    so any number of consecutive projections covers the range almost evenly.
+    The angles are sorted in chunks of `images_per_turn`, which the stage
+    collects in one pass through the range each (see `unwrap_tomo_angles`).
+    """
+    angles = start_deg + (np.arange(num_images) * range_deg / GOLDEN_RATIO) % range_deg
+    for first in range(0, num_images, images_per_turn):
+        angles[first : first + images_per_turn].sort()
+    return angles
+
+
+def interlaced_angle_list(num_images, num_subsets, start_deg=0, range_deg=180):
+    """
+    Interlaced projection angles: `num_subsets` offset, equally spaced subsets.
+
+    Every subset holds `num_images / num_subsets` angles spaced by
+    `range_deg * num_subsets / num_images` and is collected in one pass
+    through the range. Subset j is offset by a fraction of that spacing in
+    bit-reversed order (0, 1/2, 1/4, 3/4, ... for 4 subsets), so the first
+    2, 4, ... subsets already interlace evenly.
+    """
+    if num_images % num_subsets:
+        raise ValueError(
+            f"{num_images} images cannot be split "
+            f"into {num_subsets} subsets of the same size."
+        )
+    images_per_subset = num_images // num_subsets
+    spacing = range_deg / images_per_subset
+
+    def bit_reversed(n):
+        fraction, weight = 0.0, 0.5
+        while n:
+            fraction += weight * (n & 1)
+            n >>= 1
+            weight /= 2
+        return fraction
+
+    offsets = np.array(sorted(range(num_subsets), key=bit_reversed)) / num_subsets
+    return (
+        start_deg
+        + (
+            (np.arange(images_per_subset)[np.newaxis, :] + offsets[:, np.newaxis])
+            * spacing
+        ).ravel()
+    )
+
+
+def unwrap_tomo_angles(angles, period=180, min_spacing=0.0):
+    """
+    Rotation angles at which a continuously rotating stage collects `angles`, in order.
+
+    Every angle is moved by whole `period`s (180 deg for parallel beam
+    tomography) to the first rotation angle at least `min_spacing` after
+    the previous one, so the stage never turns back.
+    """
+    angles = np.asarray(angles, dtype=float)
+    steps = np.diff(angles)
+    turns = np.maximum(np.ceil((min_spacing - steps) / period), 0)
+    return angles + period * np.concatenate([[0], np.cumsum(turns)])
+
+
+def plan_tomo_angle_list(
+    exposure_time,
+    angles,
+    detector_specs,
+    period=180,
+    lead_angle=10,
+    acquire_period=0.0,
+    acceleration_time=None,
+    write_bandwidth=None,
+):
+    """
+    Compute the trajectory of a fly scan through a list of angles, without moving.
+
+    The angles are unwrapped onto a continuous rotation (see
+    `unwrap_tomo_angles`), and the rotation velocity is the fastest at
+    which the two closest rotation angles are still one trigger apart. The
+    time between two triggers is limited as in `plan_tomo_trajectory`,
+    except that the detectors all take every trigger. Returns the rotation
+    angles and the `TomoTrajectory`; its `start_deg` and `stop_deg` are the
+    first and last rotation angles, and the axis does not return at the end.
+    """
+    # Two triggers must be at least one encoder count apart.
+    rotation_angles = unwrap_tomo_angles(angles, period, min_spacing=1 / COUNTS_PER_DEG)
+    num_images = len(rotation_angles)
+    trajectory = plan_tomo_trajectory(
+        exposure_time,
+        num_images,
+        detector_specs,
+        start_deg=rotation_angles[0] if num_images else 0,
+        stop_deg=rotation_angles[-1] if num_images else 0,
+        lead_angle=lead_angle,
+        acquire_period=acquire_period,
+        reset_speed=TOMO_ROTARY_STAGE_VELO_RESET_MAX,
+        write_bandwidth=write_bandwidth,
+        detector_pulse_blocks={},
+    )
+    problems = list(trajectory.problems)
+    warnings = list(trajectory.warnings)
+    if num_images > PANDA_SEQ_TABLE_MAX_ROWS:
+        problems.append(
+            f"{num_images} angles do not fit in the PandA sequencer table "
+            f"({PANDA_SEQ_TABLE_MAX_ROWS} at most)."
+        )
+
+    # The rotary stage velocity follows from the closest angles, not the average
+    # spacing.
+    step_limits = {
+        factor: step
+        for factor, step in trajectory.step_limits.items()
+        if factor != "rotary stage velocity"
+    }
+    limiting_factor, step_time = max(step_limits.items(), key=lambda item: item[1])
+    step_time = math.ceil(step_time / PANDA_CLOCK_PERIOD - 1e-6) * PANDA_CLOCK_PERIOD
+    min_spacing = np.diff(rotation_angles).min() if num_images > 1 else 0
+    rot_motor_vel = min_spacing / step_time if step_time else 0
+    if rot_motor_vel > TOMO_ROTARY_STAGE_VELO_SCAN_MAX:
+        rot_motor_vel = TOMO_ROTARY_STAGE_VELO_SCAN_MAX
+        step_limits["rotary stage velocity"] = (
+            min_spacing / TOMO_ROTARY_STAGE_VELO_SCAN_MAX
+        )
+        limiting_factor = "rotary stage velocity"
+    if acceleration_time and rot_motor_vel * acceleration_time / 2 > lead_angle:
+        warnings.append(
+            f"The lead angle {lead_angle} deg is too short "
+            f"to reach {rot_motor_vel:.2f} deg/s "
+            f"within the {acceleration_time} s acceleration, the first projections are "
+            "taken while accelerating "
+            f"(use at least {rot_motor_vel * acceleration_time / 2:.2f} deg)."
+        )
+
+    rotation_range = rotation_angles[-1] - rotation_angles[0] if num_images else 0
+    acquisition_time = rotation_range / rot_motor_vel if rot_motor_vel else 0
+    motion_time = (2 * lead_angle / rot_motor_vel if rot_motor_vel else 0) + (
+        acceleration_time or 0
+    )
+    min_step_time = min_spacing / rot_motor_vel if rot_motor_vel else step_time
+    # Size the queues for the closest angles, the frames never come in faster.
+    queue_sizes = tomo_writer_queue_sizes(
+        detector_specs, {}, min_step_time, num_images, write_bandwidth
+    )
+    trajectory = dataclasses.replace(
+        trajectory,
+        step_time=min_step_time,
+        rot_motor_vel=rot_motor_vel,
+        limiting_factor=limiting_factor,
+        step_limits=step_limits,
+        acquisition_time=acquisition_time,
+        duration=acquisition_time + motion_time,
+        data_rate=trajectory.data_rate * trajectory.step_time / step_time,
+        problems=problems,
+        warnings=warnings,
+        return_time=0.0,
+        queue_sizes=queue_sizes,
+    )
+    return rotation_angles, trajectory
+
+
+def tomo_angle_list_planner(
+    exposure_time,
+    angles,
+    period=180,
+    lead_angle=10,
+    detectors=["kinetix1"],
+    acquire_period=0.0,
+    write_bandwidth=None,
+    verbose=True,
+):
+    """
+    Plan a fly scan through a list of angles with the current detector settings.
+
+    Nothing moves. Prints the rotation velocity, the factor limiting it, the
+    number of turns and the estimated duration, and returns the rotation angles
+    and the `TomoTrajectory`, see `plan_tomo_angle_list`.
+    """
+    if detectors is None or detectors == ["kinetix1"]:
+        detectors = [kinetix1]
+
+    specs = yield from read_tomo_detector_specs(detectors)
+    acceleration_time = yield from bps.rd(tomo_rot_axis.acceleration)
+    rotation_angles, trajectory = plan_tomo_angle_list(
+        exposure_time,
+        angles,
+        specs,
+        period=period,
+        lead_angle=lead_angle,
+        acquire_period=acquire_period,
+        acceleration_time=acceleration_time,
+        write_bandwidth=write_bandwidth or TOMO_WRITE_BANDWIDTH,
+    )
+    if verbose:
+        trajectory.report()
+        if len(rotation_angles):
+            turns = (rotation_angles[-1] - rotation_angles[0]) / DEG_PER_REVOLUTION
+            print(
+                f"    Rotation range  : {turns:.2f} turns "
+                f"for {len(rotation_angles)} angles"
+            )
+    return rotation_angles, trajectory
+
+
+def tomo_panda_config(panda, trajectory, time_trigger=True):
+    """
+    PandA trigger configuration of a fly scan, {signal: value}.
+
+    The position compare start is set separately. PCOMP1 sends one gate per
+    tomogram (time triggers) or one pulse per projection (position triggers);
+    PULSE1, and the pulse blocks of the detectors taking every n-th trigger,
+    turn each gate into a pulse train. Written with `configure_panda`, which
+    skips the values already set.
+    """
+    panda_pcomp = panda.pcomp[1]
+    panda_pulser = panda.pulse[1]
+    num_images = trajectory.num_images
+    number_of_tomograms = trajectory.number_of_tomograms
+    range_counts = int(
+        round(abs(trajectory.stop_deg - trajectory.start_deg) * COUNTS_PER_DEG)
+    )
+
+    # Width in encoder counts that the pulse will be high
+    config = {panda_pcomp.width: 3}
+    if time_trigger:
+        config.update(
+            {
+                panda_pcomp.pulses: number_of_tomograms,
+                panda_pulser.pulses: num_images,
+                panda_pulser.step: trajectory.step_time,
+                panda_pulser.width: trajectory.exposure_time / 5,
+            }
+        )
+        for name, block in trajectory.pulse_blocks.items():
+            if block != 1:
+                config.update(
+                    {
+                        panda.pulse[block].pulses: trajectory.detector_images(name),
+                        panda.pulse[block].step: trajectory.frame_dividers[name]
+                        * trajectory.step_time,
+                        panda.pulse[block].width: trajectory.exposure_time / 5,
+                    }
+                )
+        if number_of_tomograms > 1:
+            # One gate per range, each starting a pulse train.
+            config[panda_pcomp.step] = range_counts
+    else:
+        config[panda_pcomp.pulses] = number_of_tomograms * num_images
+        if number_of_tomograms > 1:
+            config[panda_pcomp.step] = range_counts // num_images
 
     # Set dataset name of calc 2 to "Angle"
-    yield from bps.mv(panda.calc[2].out_dataset, "Angle")
+    config[panda.calc[2].out_dataset] = "Angle"
+    return config
+
+
+def setup_tomo_flyscan(
+    panda,
+    detectors,
+    exposure_time,
+    num_images,
+    start_deg,
+    stop_deg,
+    lead_angle,
+    acquire_period,
+    time_trigger,
+    reset_speed,
+    number_of_tomograms=1,
+    reverse=False,
+):
+    """
+    Compute the rotation velocity and trigger timing and configure the PandA.
+
+    The timing comes from `plan_tomo_trajectory`, which refuses invalid
+    parameters before anything moves. The rotation axis is left `lead_angle`
+    before `start_deg` with the scan velocity set, and the PandA position
+    compare block starts the triggers when the encoder crosses `start_deg`.
+    Returns the time between two triggers, the rotation velocity in deg/s and
+    the `TomoTrajectory`.
+
+    With time triggers, every pulse block in `TOMO_DETECTOR_PULSE_BLOCKS`
+    starts a train on the same position compare gate as PULSE1, with its step
+    a multiple of the PULSE1 step (see `TomoTrajectory.frame_dividers`), so
+    its frames coincide with every n-th PULSE1 trigger.
+
+    With `number_of_tomograms` > 1, the stage rotates through that many ranges
+    of `stop_deg - start_deg` one after the other. The position compare block
+    starts a train of `num_images` triggers at the beginning of every range and
+    the velocity is chosen so that each range holds exactly one train.
+
+    With `reverse`, the scan runs from `stop_deg` to `start_deg`: the axis is
+    left `lead_angle` before `stop_deg` and the position compare block
+    triggers in the other direction.
+    """
+
+    panda_pcomp = panda.pcomp[1]
+
+    # Validate the parameters before anything moves.
+    trajectory = yield from tomo_scan_planner(
+        exposure_time,
+        num_images,
+        start_deg=start_deg,
+        stop_deg=stop_deg,
+        lead_angle=lead_angle,
+        detectors=detectors,
+        acquire_period=acquire_period,
+        number_of_tomograms=number_of_tomograms,
+        reset_speed=reset_speed,
+        # Position triggers go to all the detectors, at one rate.
+        detector_pulse_blocks=None if time_trigger else {},
+        verbose=False,
+    )
+    trajectory.check()
+    for warning in trajectory.warnings:
+        print(f"WARNING: {warning}")
+    print(
+        f"Frame rate {trajectory.framerate:.2f} Hz, "
+        f"limited by the {trajectory.limiting_factor}; "
+        f"estimated duration {trajectory.duration:.1f} s, "
+        f"{trajectory.data_volume / 1e9:.2f} GB."
+    )
+    step_time = trajectory.step_time
+    rot_motor_vel = trajectory.rot_motor_vel
+    reset_speed = min(reset_speed, TOMO_ROTARY_STAGE_VELO_RESET_MAX)
+
+    range_counts = int(round(abs(stop_deg - start_deg) * COUNTS_PER_DEG))
+    if number_of_tomograms > 1 and not time_trigger and range_counts % num_images:
+        raise ValueError(
+            "The number of encoder counts per pulse "
+            f"({range_counts / num_images}) is not an integer value!"
+        )
+
+    # step_width_counts = COUNTS_PER_REVOLUTION / (
+    #    (DEG_PER_REVOLUTION / (stop_deg - start_deg)) * (num_images - 1)
+    # )
+    # if int(step_width_counts) != round(step_width_counts, 5):
+    #    raise ValueError(
+    #        "The number of encoder counts per pulse is not an integer value!"
+    #    )
+
+    # Make it fast to move to the start position:
+    yield from bps.mv(tomo_rot_axis.velocity, reset_speed)
+
+    direction, first_deg, run_up_deg, _ = tomo_scan_endpoints(
+        start_deg, stop_deg, lead_angle, reverse
+    )
+
+    # Move to start position to read encoder value, configure the PandA meanwhile
+    move_group = short_uid("tomo_setup_move")
+    yield from bps.abs_set(tomo_rot_axis, first_deg, group=move_group)
+    yield from configure_panda(tomo_panda_config(panda, trajectory, time_trigger))
+    yield from bps.wait(group=move_group)
+    start_encoder = yield from bps.rd(panda.calc[2].out)
+    # Move to lead angle, set up the pcomp block meanwhile
+    yield from bps.abs_set(tomo_rot_axis, run_up_deg, group=move_group)
+    yield from configure_panda(
+        {
+            panda_pcomp.start: int(start_encoder),
+            panda_pcomp.dir: "Positive" if direction > 0 else "Negative",
+        }
+    )
+    yield from bps.wait(group=move_group)
+    # Set the velocity for the scan:
+    yield from bps.mv(tomo_rot_axis.velocity, rot_motor_vel)
+
+    return step_time, rot_motor_vel, trajectory
+
+
+@bpp.finalize_decorator(post_tomo_fly_cleanup)
+def tomo_flyscan(
+    exposure_time,
+    num_images,
+    start_deg=0,
+    stop_deg=180,
+    lead_angle=10,
+    use_shutter=True,
+    detectors=["kinetix1"],
+    sample_name=None,
+    acquire_period=0.0,
+    time_trigger=True,
+    reset_speed=TOMO_ROTARY_STAGE_VELO_RESET_MAX,
+    reverse=False,
+    after_projections=None,
+    on_frame_lag=None,
+):
+    """Simple hardware triggered flyscan tomography
+
+    Parameters
+    ----------
+    exposure_time : float
+        exposure time to use on the camera, in seconds
+    num_images : int
+        total number of camera images to collect during the scan
+    start_deg : float (optional)
+        starting point in degrees
+    stop_deg : float (optional)
+        stopping point in degrees
+    lead_angle : float (optional)
+        the angle in degrees to be used to move motor to -lead_angle before 'start_deg' and +lead_angle after 'stop_deg'
+    reset_speed : float
+        speed of the rotary motor during reset movements, in deg/s
+    use_shutter : bool
+        whether to use/check the shutter during the scan
+    reverse : bool (optional)
+        whether to scan from 'stop_deg' to 'start_deg'; the "Angle" dataset then
+        decreases
+    after_projections : callable (optional)
+        plan started once the last projection is collected, while the files are
+        closed and the rotation slows down, e.g. to move to the next sample position
+    on_frame_lag : str (optional)
+        "warn", "pause" or "abort" when a detector falls behind its HDF5 queue,
+        `FRAME_MONITOR_ACTION` by default, see `FrameCountMonitor`
+
+    Detectors triggered by their own PandA pulse block (`TOMO_DETECTOR_PULSE_BLOCKS`)
+    take every n-th trigger and are collected into a "tomo_<name>" stream, see
+    `tomo_streams`.
+    """
+
+    panda = panda1
+
+    if detectors is None or detectors == ["kinetix1"]:
+        detectors = [kinetix1]
+
+    if use_shutter:
+        if (yield from bps.rd(fe_shutter_status)) != 1:
+            raise RuntimeError(f"\n    Front-end shutter is closed. Reopen it!\n")
+
+        yield from open_ph_shutter()
+
+    all_detectors = [panda] + detectors
+
+    acquire_period, rot_motor_vel, trajectory = yield from setup_tomo_flyscan(
+        panda,
+        detectors,
+        exposure_time,
+        num_images,
+        start_deg,
+        stop_deg,
+        lead_angle,
+        acquire_period,
+        time_trigger,
+        reset_speed,
+        reverse=reverse,
+    )
+    direction, first_deg, _, end_deg = tomo_scan_endpoints(
+        start_deg, stop_deg, lead_angle, reverse
+    )
+    streams = tomo_streams(panda, detectors, trajectory.frame_dividers)
+
+    panda_trigger_info = TriggerInfo(
+        number_of_triggers=num_images,
+        trigger=DetectorTrigger.CONSTANT_GATE,
+        livetime=acquire_period,
+        deadtime=0.0001,
+    )
+
+    _md = {
+        "detectors": [det.name for det in detectors],
+        "num_points": num_images,
+        "plan_name": "tomo_flyscan",
+        "scan_direction": "reverse" if reverse else "forward",
+        "frame_dividers": trajectory.frame_dividers,
+        "hints": {},
+    }
+    _md.update({"tomo_scanning_mode": ScanType.tomo_flyscan.value})
+    yield from bps.open_run(md=_md)
+
+    print(f"\n\nExecuting tomography scan with number number: {RE.md['scan_id']}...\n")
+
+    yield from setup_tomo_writers(detectors, trajectory.queue_sizes)
+
+    # Stage All!
+    yield from bps.stage_all(*all_detectors)
+
+    for det in detectors:
+        det_trigger_info = TriggerInfo(
+            number_of_triggers=trajectory.detector_images(det.name),
+            trigger=DetectorTrigger.EDGE_TRIGGER,
+            livetime=exposure_time,
+            deadtime=0.001,
+        )
+        yield from bps.prepare(det, det_trigger_info, wait=True)
+
+    yield from bps.prepare(panda, panda_trigger_info, wait=True)
+
+    for stream_name, devices in streams.items():
+        yield from bps.declare_stream(*devices, name=stream_name)
+
+    yield from bps.kickoff_all(*all_detectors, wait=True)
+
+    monitor = FrameCountMonitor(panda, detectors, trajectory, on_frame_lag)
+    yield from monitor.start()
+
+    # Move rotation axis past the end of the scan by the lead angle:
+    movement_status = tomo_rot_axis.set(end_deg, wait=False)
+
+    # Wait until the axis enters the scan range:
+    yield from wait_for_position(
+        tomo_rot_axis,
+        first_deg,
+        direction,
+        timeout=2 * lead_angle / rot_motor_vel + DEFAULT_TIMEOUT,
+    )
+
+    print("Completing...")
+    yield from collect_tomo_streams(streams, complete=True, monitor=monitor)
+    if after_projections is not None:
+        yield from after_projections()
+    yield from bps.unstage_all(*all_detectors)
+
+    # Make sure rotation movement is done
+    movement_status.wait()
+
+    monitor.finish()
+    yield from bps.close_run()
+
+    print_tomo_scan_completed(
+        f"Completed tomography scan with scan number: {RE.md['scan_id']}."
+    )
+    yield from print_frames_captured(all_detectors)
+
+
+@bpp.finalize_decorator(post_tomo_fly_cleanup)
+def continuous_tomo_flyscan(
+    number_of_tomograms,
+    exposure_time,
+    num_images,
+    start_deg=0,
+    stop_deg=180,
+    lead_angle=10,
+    use_shutter=True,
+    detectors=["kinetix1"],
+    acquire_period=0.0,
+    time_trigger=True,
+    reset_speed=TOMO_ROTARY_STAGE_VELO_RESET_MAX,
+    pause_time=0,
+    rotate_continuously=False,
+    bidirectional=False,
+    after_projections=None,
+    on_frame_lag=None,
+):
+    """Several tomograms in one run, with the shutter open and the detectors staged
+
+    The trajectory and the PandA are configured and the detectors are prepared
+    once, for all the frames. Between two tomograms the rotation axis only
+    returns to `lead_angle` before `start_deg` and the position compare block is
+    re-armed. All projections go to the "tomo" stream, `num_images` per
+    tomogram in order; the stream is collected at the end of every tomogram.
+    Detectors on their own pulse block go to "tomo_<name>" streams instead
+    (see `tomo_streams`).
+    The gap between the last frame of a tomogram and the first frame of the
+    next one is printed at the end and returned.
+
+    With `rotate_continuously`, the rotation axis does not return: it turns in
+    one move through `number_of_tomograms` consecutive ranges of
+    `stop_deg - start_deg` (180 for half turns, 360 for full turns), and the
+    position compare block starts the triggers of a tomogram at the beginning
+    of every range. The scan starts from the turn closest to the current
+    position, so consecutive scans do not unwind the previous turns.
+
+    With `bidirectional`, every second tomogram is collected from `stop_deg`
+    to `start_deg`, starting where the previous one ended, so the axis never
+    returns. The position compare block is switched to the other end and
+    direction in between; the "Angle" dataset decreases in these tomograms.
+
+    Parameters
+    ----------
+    number_of_tomograms : int
+        number of tomograms to collect
+    pause_time : float (optional)
+        time in seconds to wait before starting the next tomogram, ignored with
+        `rotate_continuously`
+    rotate_continuously : bool (optional)
+        whether to collect consecutive tomograms while the stage keeps turning
+    bidirectional : bool (optional)
+        whether to collect every second tomogram backwards instead of returning
+    after_projections : callable (optional)
+        plan started once the last projection of the last tomogram is collected
+    on_frame_lag : str (optional)
+        action when a detector falls behind, see `FrameCountMonitor`
+
+    See `tomo_flyscan` for the other parameters.
+    """
+
+    if rotate_continuously and bidirectional:
+        raise ValueError("A scan cannot both rotate continuously and be bidirectional.")
+
+    panda = panda1
+    panda_pcomp = panda.pcomp[1]
+
+    if detectors is None or detectors == ["kinetix1"]:
+        detectors = [kinetix1]
+
+    if use_shutter:
+        if (yield from bps.rd(fe_shutter_status)) != 1:
+            raise RuntimeError(f"\n    Front-end shutter is closed. Reopen it!\n")
+
+        yield from open_ph_shutter()
+
+    all_detectors = [panda] + detectors
+
+    if rotate_continuously:
+        current_deg = yield from bps.rd(tomo_rot_axis)
+        turns = round((current_deg - start_deg) / DEG_PER_REVOLUTION)
+        start_deg += turns * DEG_PER_REVOLUTION
+        stop_deg += turns * DEG_PER_REVOLUTION
+
+    acquire_period, rot_motor_vel, trajectory = yield from setup_tomo_flyscan(
+        panda,
+        detectors,
+        exposure_time,
+        num_images,
+        start_deg,
+        stop_deg,
+        lead_angle,
+        acquire_period,
+        time_trigger,
+        reset_speed,
+        number_of_tomograms=number_of_tomograms if rotate_continuously else 1,
+    )
+    streams = tomo_streams(panda, detectors, trajectory.frame_dividers)
+    # Frames per tomogram of every device, the PandA captures every trigger.
+    images_per_tomogram = {
+        det.name: trajectory.detector_images(det.name) for det in all_detectors
+    }
+    # Position compare start for both directions, from the encoder read at start_deg.
+    forward_encoder = yield from bps.rd(panda_pcomp.start)
+    pcomp_start = {
+        False: forward_encoder,
+        True: forward_encoder + int(round((stop_deg - start_deg) * COUNTS_PER_DEG)),
+    }
+    # Time to rotate through the scan window, with margin for the acceleration.
+    rotation_timeout = (abs(stop_deg - start_deg) + 2 * lead_angle) / abs(
+        rot_motor_vel
+    ) + DEFAULT_TIMEOUT
+
+    total_images = number_of_tomograms * num_images
+
+    panda_trigger_info = TriggerInfo(
+        number_of_triggers=total_images,
+        trigger=DetectorTrigger.CONSTANT_GATE,
+        livetime=acquire_period,
+        deadtime=0.0001,
+    )
+
+    _md = {
+        "detectors": [det.name for det in detectors],
+        "num_points": total_images,
+        "num_tomograms": number_of_tomograms,
+        "num_projections": num_images,
+        "rotate_continuously": rotate_continuously,
+        "bidirectional": bidirectional,
+        "frame_dividers": trajectory.frame_dividers,
+        "plan_name": "continuous_tomo_flyscan",
+        "hints": {},
+    }
+    _md.update({"tomo_scanning_mode": ScanType.tomo_flyscan.value})
+    yield from bps.open_run(md=_md)
+
+    print(
+        f"\n\nExecuting {number_of_tomograms} tomography scans "
+        f"with scan number: {RE.md['scan_id']}...\n"
+    )
+
+    yield from setup_tomo_writers(detectors, trajectory.queue_sizes)
+
+    yield from bps.stage_all(*all_detectors)
+
+    for det in detectors:
+        det_trigger_info = TriggerInfo(
+            number_of_triggers=number_of_tomograms * images_per_tomogram[det.name],
+            trigger=DetectorTrigger.EDGE_TRIGGER,
+            livetime=exposure_time,
+            deadtime=0.001,
+        )
+        yield from bps.prepare(det, det_trigger_info, wait=True)
+
+    yield from bps.prepare(panda, panda_trigger_info, wait=True)
+
+    for stream_name, devices in streams.items():
+        yield from bps.declare_stream(*devices, name=stream_name)
+
+    yield from bps.kickoff_all(*all_detectors, wait=True)
+
+    monitor = FrameCountMonitor(panda, detectors, trajectory, on_frame_lag)
+    yield from monitor.start()
+
+    rotation_group = short_uid("rotation")
+    if rotate_continuously:
+        # Turn through the ranges of all the tomograms + the lead angle:
+        _, _, _, end_deg = tomo_scan_endpoints(
+            start_deg,
+            stop_deg + (number_of_tomograms - 1) * (stop_deg - start_deg),
+            lead_angle,
+        )
+        yield from bps.abs_set(tomo_rot_axis, end_deg, group=rotation_group)
+
+    gaps = []
+    last_frame_time = None
+    for i in range(number_of_tomograms):
+        if not rotate_continuously:
+            reverse = bidirectional and i % 2 == 1
+            direction, _, run_up_deg, end_deg = tomo_scan_endpoints(
+                start_deg, stop_deg, lead_angle, reverse
+            )
+            if i > 0:
+                yield from bps.wait(group=rotation_group)
+                if bidirectional:
+                    # The axis stopped where the scan in the other direction starts.
+                    yield from configure_panda(
+                        {
+                            panda_pcomp.start: pcomp_start[reverse],
+                            panda_pcomp.dir: (
+                                "Positive" if direction > 0 else "Negative"
+                            ),
+                        }
+                    )
+                else:
+                    # Return to the lead angle quickly, then re-arm the triggers.
+                    yield from bps.mv(
+                        tomo_rot_axis.velocity,
+                        min(reset_speed, TOMO_ROTARY_STAGE_VELO_RESET_MAX),
+                    )
+                    yield from bps.mv(tomo_rot_axis, run_up_deg)
+                    yield from bps.mv(tomo_rot_axis.velocity, rot_motor_vel)
+                yield from rearm_tomo_pcomp(panda)
+                if pause_time:
+                    yield from bps.sleep(pause_time)
+
+            # Move rotation axis past the end of the scan by the lead angle:
+            yield from bps.abs_set(tomo_rot_axis, end_deg, group=rotation_group)
+
+        print(f"Executing tomogram #{i+1} of {number_of_tomograms}...")
+
+        yield from wait_for_frames_captured(
+            all_detectors,
+            {name: i * images + 1 for name, images in images_per_tomogram.items()},
+            timeout=rotation_timeout,
+        )
+        if last_frame_time is not None:
+            gaps.append(ttime.monotonic() - last_frame_time)
+
+        if i < number_of_tomograms - 1:
+            yield from wait_for_frames_captured(
+                all_detectors,
+                {
+                    name: (i + 1) * images
+                    for name, images in images_per_tomogram.items()
+                },
+                timeout=rotation_timeout,
+            )
+            last_frame_time = ttime.monotonic()
+            yield from collect_tomo_streams(streams, monitor=monitor)
+        else:
+            print("Completing...")
+            yield from collect_tomo_streams(streams, complete=True, monitor=monitor)
+            if after_projections is not None:
+                yield from after_projections()
+
+    yield from bps.wait(group=rotation_group)
+
+    yield from bps.unstage_all(*all_detectors)
+
+    monitor.finish()
+    yield from bps.close_run()
+
+    messages = [
+        f"Completed {number_of_tomograms} tomography scans "
+        f"with scan number: {RE.md['scan_id']}."
+    ]
+    if gaps:
+        messages.append(
+            f"Gap between tomograms: {sum(gaps) / len(gaps):.2f} s on average "
+            f"(min {min(gaps):.2f} s, max {max(gaps):.2f} s)."
+        )
+    print_tomo_scan_completed(*messages)
+    yield from print_frames_captured(all_detectors)
+
+    return gaps
+
+
+def tomo_angle_list_triggers(panda, enable=True):
+    """
+    Trigger from the sequencer table instead of the position compare block, or back.
+
+    SEQ1 and PCOMP1 are both armed by PCAP.ACTIVE; only one of them may be,
+    or the detectors would get the triggers of both.
+    """
+    yield from bps.mv(
+        panda.pcomp[1].enable,
+        "ZERO" if enable else "PCAP.ACTIVE",
+        panda.seq[1].enable,
+        "PCAP.ACTIVE" if enable else "ZERO",
+    )
+
+
+@bpp.finalize_decorator(post_tomo_fly_cleanup)
+def tomo_angle_list_flyscan(
+    exposure_time,
+    angles,
+    period=180,
+    lead_angle=10,
+    use_shutter=True,
+    detectors=["kinetix1"],
+    acquire_period=0.0,
+    reset_speed=TOMO_ROTARY_STAGE_VELO_RESET_MAX,
+    after_projections=None,
+    on_frame_lag=None,
+    md=None,
+):
+    """Fly scan triggering at a list of angles while the stage rotates continuously
+
+    The angles (in acquisition order, e.g. from `golden_angle_list` or
+    `interlaced_angle_list`) are unwrapped onto a continuous forward
+    rotation (see `unwrap_tomo_angles`), converted to encoder positions
+    relative to the encoder value read at the first angle, and loaded into
+    the PandA sequencer table (see `panda_seq_table`). SEQ1 then sends one
+    trigger as the encoder passes each position, instead of PCOMP1. The
+    rotation velocity is the fastest that keeps the closest angles one frame
+    apart, see `tomo_angle_list_planner`. The scan starts from the turn
+    closest to the current position and the axis does not return.
+
+    All projections go to the "tomo" stream in acquisition order; the angles
+    and the period are recorded as `projection_angles` and `angle_period` in
+    the start document.
+
+    Parameters
+    ----------
+    angles : list of float
+        projection angles in degrees, in acquisition order, at most
+        `PANDA_SEQ_TABLE_MAX_ROWS`
+    period : float (optional)
+        the angles are equivalent modulo `period` degrees, 180 for parallel beam
+        tomography
+    on_frame_lag : str (optional)
+        action when a detector falls behind, see `FrameCountMonitor`
+    md : dict (optional)
+        extra metadata for the start document, e.g. the number of interlaced subsets
+
+    See `tomo_flyscan` for the other parameters.
+    """
+
+    panda = panda1
+    panda_seq = panda.seq[1]
+
+    if detectors is None or detectors == ["kinetix1"]:
+        detectors = [kinetix1]
+
+    # Validate the parameters before anything moves.
+    rotation_angles, trajectory = yield from tomo_angle_list_planner(
+        exposure_time,
+        angles,
+        period=period,
+        lead_angle=lead_angle,
+        detectors=detectors,
+        acquire_period=acquire_period,
+        verbose=False,
+    )
+    trajectory.check()
+    for warning in trajectory.warnings:
+        print(f"WARNING: {warning}")
+    num_images = len(rotation_angles)
+    rot_motor_vel = trajectory.rot_motor_vel
+    turns = (rotation_angles[-1] - rotation_angles[0]) / DEG_PER_REVOLUTION
+    print(
+        f"{num_images} angles over {turns:.2f} turns "
+        f"at {rot_motor_vel:.2f} deg/s, limited by the {trajectory.limiting_factor}; "
+        f"estimated duration {trajectory.duration:.1f} s, "
+        f"{trajectory.data_volume / 1e9:.2f} GB."
+    )
+
+    if use_shutter:
+        if (yield from bps.rd(fe_shutter_status)) != 1:
+            raise RuntimeError(f"\n    Front-end shutter is closed. Reopen it!\n")
+
+        yield from open_ph_shutter()
+
+    all_detectors = [panda] + detectors
+
+    # Start from the turn closest to the current position.
+    current_deg = yield from bps.rd(tomo_rot_axis)
+    rotation_angles = rotation_angles + DEG_PER_REVOLUTION * round(
+        (current_deg - rotation_angles[0]) / DEG_PER_REVOLUTION
+    )
+    _, first_deg, run_up_deg, end_deg = tomo_scan_endpoints(
+        rotation_angles[0], rotation_angles[-1], lead_angle
+    )
+
+    yield from bps.mv(
+        tomo_rot_axis.velocity, min(reset_speed, TOMO_ROTARY_STAGE_VELO_RESET_MAX)
+    )
+
+    # Move to the first angle to read the encoder, configure the PandA meanwhile
+    move_group = short_uid("tomo_setup_move")
+    yield from bps.abs_set(tomo_rot_axis, first_deg, group=move_group)
+    yield from configure_panda(
+        {
+            # One pulse on PULSE1 per sequencer trigger.
+            panda.pulse[1].pulses: 1,
+            panda.pulse[1].step: trajectory.step_time,
+            panda.pulse[1].width: exposure_time / 5,
+            panda.calc[2].out_dataset: "Angle",
+        }
+    )
+    yield from bps.wait(group=move_group)
+    start_encoder = yield from bps.rd(panda.calc[2].out)
+    encoder_positions = int(start_encoder) + np.round(
+        (rotation_angles - first_deg) * COUNTS_PER_DEG
+    ).astype(np.int64)
+    # Move to the lead angle, upload the table meanwhile
+    yield from bps.abs_set(tomo_rot_axis, run_up_deg, group=move_group)
+    yield from configure_panda(
+        panda_seq_config(panda_seq, encoder_positions, exposure_time / 5 * 1e6)
+    )
+    yield from bps.wait(group=move_group)
+    yield from bps.mv(tomo_rot_axis.velocity, rot_motor_vel)
+
+    panda_trigger_info = TriggerInfo(
+        number_of_triggers=num_images,
+        trigger=DetectorTrigger.CONSTANT_GATE,
+        livetime=trajectory.step_time,
+        deadtime=0.0001,
+    )
 
-    _md = {    
+    _md = {
         "detectors": [det.name for det in detectors],
         "num_points": num_images,
-        "plan_name": "tomo_flyscan",
+        "plan_name": "tomo_angle_list_flyscan",
+        "projection_angles": [float(angle) for angle in angles],
+        "angle_period": period,
         "hints": {},
     }
     _md.update({"tomo_scanning_mode": ScanType.tomo_flyscan.value})
-    yield from bps.open_run(md=_md)
+    _md.update(md or {})
 
-    print(f"\n\nExecuting tomography scan with number number: {RE.md['scan_id']}...\n")
+    def angle_list_scan():
+        yield from bps.open_run(md=_md)
 
-    for det in detectors:
-        det._writer._path_provider._filename_provider.set_frame_type(
-            TomoFrameType.proj
+        print(
+            f"\n\nExecuting tomography scan with scan number: {RE.md['scan_id']}...\n"
         )
-        if hasattr(det.fileio, "queue_size"):
-            yield from bps.mv(det.fileio.queue_size, num_images * 2)
 
-    # Stage All!
-    yield from bps.stage_all(*all_detectors)
+        yield from setup_tomo_writers(detectors, trajectory.queue_sizes)
 
-    for det in detectors:
-        yield from bps.prepare(
-            det, det_trigger_info, wait=True
+        yield from bps.stage_all(*all_detectors)
+
+        det_trigger_info = TriggerInfo(
+            number_of_triggers=num_images,
+            trigger=DetectorTrigger.EDGE_TRIGGER,
+            livetime=exposure_time,
+            deadtime=0.001,
         )
+        for det in detectors:
+            yield from bps.prepare(det, det_trigger_info, wait=True)
 
-    yield from bps.prepare(
-        panda, panda_trigger_info, wait=True
-    )
+        yield from bps.prepare(panda, panda_trigger_info, wait=True)
 
-    yield from bps.declare_stream(*all_detectors, name="tomo")
+        yield from bps.declare_stream(*all_detectors, name="tomo")
 
-    yield from bps.kickoff_all(*all_detectors, wait=True)
+        yield from bps.kickoff_all(*all_detectors, wait=True)
 
-    # Move rotation axis to the stop position + the lead angle:
-    movement_status = tomo_rot_axis.set(stop_deg + lead_angle, wait=False)
+        monitor = FrameCountMonitor(panda, detectors, action=on_frame_lag)
+        yield from monitor.start()
 
-    current_pos = yield from bps.rd(tomo_rot_axis)
-    while(current_pos < start_deg):
-        yield from bps.sleep(0.1)
-        current_pos = yield from bps.rd(tomo_rot_axis)
+        # Rotate past the last angle by the lead angle:
+        rotation_group = short_uid("rotation")
+        yield from bps.abs_set(tomo_rot_axis, end_deg, group=rotation_group)
 
-    print("Completing...")
-    yield from bps.collect_while_completing(all_detectors, all_detectors, flush_period=1, stream_name="tomo")
-    yield from bps.unstage_all(*all_detectors)
+        yield from wait_for_position(
+            tomo_rot_axis,
+            first_deg,
+            timeout=2 * lead_angle / rot_motor_vel + DEFAULT_TIMEOUT,
+        )
 
-    # Make sure rotation movement is done
-    movement_status.wait()
+        print("Completing...")
+        yield from collect_tomo_streams(
+            {"tomo": all_detectors}, complete=True, monitor=monitor
+        )
+        if after_projections is not None:
+            yield from after_projections()
+        yield from bps.unstage_all(*all_detectors)
 
-    yield from bps.close_run()
-    
-    print("====================================================")
-    print("====================================================\n\n")
-    print(f"Completed tomography scan with scan number: {RE.md['scan_id']}.\n")
-    print("====================================================")
-    print("====================================================\n\n")
+        yield from bps.wait(group=rotation_group)
 
+        monitor.finish()
+        yield from bps.close_run()
 
-    # Print out number of points captured by each detector
-    captured = {}
-    captured[panda.name] = yield from bps.rd(panda.data.num_captured)
-    for det in detectors:
-        captured[det.name] = yield from bps.rd(det.fileio.num_captured)
-    
-    print("Number frames captured:\n")
-    for cap in captured.keys():
-        print(f"    {cap:15}: {captured[cap]}")
+    yield from tomo_angle_list_triggers(panda)
+    yield from bpp.finalize_wrapper(
+        angle_list_scan(), tomo_angle_list_triggers(panda, enable=False)
+    )
 
+    print_tomo_scan_completed(
+        f"Completed tomography scan with scan number: {RE.md['scan_id']}."
+    )
+    yield from print_frames_captured(all_detectors)
 
 
 def tomo_loop(
-        number_of_repetitions,
-        exposure_time,
-        dark_flat_offset,
-        num_projections,
-        pause_time,
-        start_deg=0,
-        stop_deg=180,
-        lead_angle=10,
-        num_flat_images = 50,
-        num_dark_images = 20,
-        skip_tomo_num=-1,
-        time_trigger=True,
-        use_shutter=True,
-        detectors=["kinetix1"],
-        acquire_period=0.0,
-        reset_speed=TOMO_ROTARY_STAGE_VELO_RESET_MAX,
-    ):
+    number_of_repetitions,
+    exposure_time,
+    dark_flat_offset,
+    num_projections,
+    pause_time,
+    start_deg=0,
+    stop_deg=180,
+    lead_angle=10,
+    num_flat_images=50,
+    num_dark_images=20,
+    skip_tomo_num=-1,
+    time_trigger=True,
+    use_shutter=True,
+    detectors=["kinetix1"],
+    acquire_period=0.0,
+    reset_speed=TOMO_ROTARY_STAGE_VELO_RESET_MAX,
+    continuous=False,
+    rotate_continuously=False,
+    bidirectional=False,
+    adaptive_dark_flat=False,
+):
+    """
+    Repeated tomography scans, with darks and flats at the start, at the end and
+    every `skip_tomo_num` scans.
+
+    With `continuous`, the scans between two dark/flat sets are collected in a
+    single run by `continuous_tomo_flyscan`, keeping the shutter open and the
+    detectors staged from one tomogram to the next. `rotate_continuously`
+    additionally keeps the stage turning instead of returning between them.
+    With `bidirectional`, every second scan runs from `stop_deg` back to
+    `start_deg` instead of returning to the start first.
+
+    With `adaptive_dark_flat`, the darks and flats between the scans are only
+    taken when the `DARK_FLAT_DRIFT_SIGNALS` measured after the projections
+    drifted from their values during the last flats, or when these are too old
+    (see `dark_flat_decision`). They are checked every `skip_tomo_num` scans,
+    or after every scan without `skip_tomo_num` (unless `continuous`).
+    """
+
+    if adaptive_dark_flat:
+        check_adaptive_dark_flat()
+
+    dark_flat_kwargs = dict(
+        exposure_time=exposure_time,
+        offset=dark_flat_offset,
+        detectors=detectors,
+        use_shutter=use_shutter,
+        dark_images=num_dark_images,
+        flat_images=num_flat_images,
+    )
+    drift_values = {}
+    num_skipped = 0
+
+    def measure_drift():
+        values = yield from read_dark_flat_drift_signals()
+        drift_values.update(values)
+
+    def between_scans_dark_flat():
+        nonlocal num_skipped
+        if not adaptive_dark_flat:
+            print("Taking dark, flat...")
+            yield from tomo_dark_flat(**dark_flat_kwargs)
+        elif not (yield from adaptive_tomo_dark_flat(drift_values, **dark_flat_kwargs)):
+            num_skipped += 1
 
     scan_countdown = skip_tomo_num
-    
-    yield from tomo_dark_flat(exposure_time, dark_flat_offset, detectors=detectors, use_shutter=use_shutter, dark_images=num_dark_images, flat_images=num_flat_images)
 
-    for i in range(number_of_repetitions):
+    yield from tomo_dark_flat(**dark_flat_kwargs)
 
-        print(f"Executing tomo flyscan iteration #{i+1}...")
-        
-        yield from tomo_flyscan(
-            exposure_time,
-            num_projections,            
-            start_deg=start_deg,
-            stop_deg=stop_deg,
-            use_shutter=use_shutter,
-            detectors=detectors,
-            time_trigger=time_trigger,
-            lead_angle=lead_angle,
-            reset_speed=reset_speed,
-            acquire_period=acquire_period
+    if continuous:
+        tomograms_per_run = (
+            skip_tomo_num if skip_tomo_num > 0 else number_of_repetitions
         )
+        num_done = 0
+        while num_done < number_of_repetitions:
+            num_tomograms = min(tomograms_per_run, number_of_repetitions - num_done)
+            # A pause requested during the previous scan takes effect here.
+            yield from bps.checkpoint()
+            yield from continuous_tomo_flyscan(
+                num_tomograms,
+                exposure_time,
+                num_projections,
+                start_deg=start_deg,
+                stop_deg=stop_deg,
+                use_shutter=use_shutter,
+                detectors=detectors,
+                time_trigger=time_trigger,
+                lead_angle=lead_angle,
+                reset_speed=reset_speed,
+                acquire_period=acquire_period,
+                pause_time=pause_time,
+                rotate_continuously=rotate_continuously,
+                bidirectional=bidirectional,
+                after_projections=measure_drift if adaptive_dark_flat else None,
+            )
+            num_done += num_tomograms
 
-        # Sleep to wait for file saving to complete
-        yield from bps.sleep(pause_time)
+            if num_done < number_of_repetitions:
+                yield from between_scans_dark_flat()
+
+    else:
+        for i in range(number_of_repetitions):
+
+            # A pause requested during the previous scan takes effect here.
+            yield from bps.checkpoint()
+
+            print(f"Executing tomo flyscan iteration #{i+1}...")
 
-        if skip_tomo_num > 0:
-            scan_countdown -= 1
+            yield from tomo_flyscan(
+                exposure_time,
+                num_projections,
+                start_deg=start_deg,
+                stop_deg=stop_deg,
+                use_shutter=use_shutter,
+                detectors=detectors,
+                time_trigger=time_trigger,
+                lead_angle=lead_angle,
+                reset_speed=reset_speed,
+                acquire_period=acquire_period,
+                reverse=bidirectional and i % 2 == 1,
+                after_projections=measure_drift if adaptive_dark_flat else None,
+            )
+
+            # Sleep to wait for file saving to complete
+            yield from bps.sleep(pause_time)
 
-            if scan_countdown == 0:
-                print("Taking dark, flat...")
-                yield from tomo_dark_flat(exposure_time, dark_flat_offset, detectors=detectors, use_shutter=use_shutter, dark_images=num_dark_images, flat_images=num_flat_images)
-                scan_countdown = skip_tomo_num        
+            if skip_tomo_num > 0:
+                scan_countdown -= 1
 
+                if scan_countdown == 0:
+                    yield from between_scans_dark_flat()
+                    scan_countdown = skip_tomo_num
+            elif adaptive_dark_flat and i < number_of_repetitions - 1:
+                yield from between_scans_dark_flat()
 
-    yield from tomo_dark_flat(exposure_time, dark_flat_offset, detectors=detectors, use_shutter=use_shutter, dark_images=num_dark_images, flat_images=num_flat_images)
+    yield from tomo_dark_flat(**dark_flat_kwargs)
 
+    if adaptive_dark_flat:
+        print(f"Skipped {num_skipped} dark/flat sets without drift.")
 
 
 def tomo_y_scan_loop(
-        exposure_time,
-        num_projections,
-        y_motion_start,
-        y_motion_stop,
-        y_motion_step,
-        detectors=["kinetix1"],
-        start_deg=0,
-        stop_deg=180,
-        lead_angle=10,
-        acquire_period=0.0,
-        reset_speed=TOMO_ROTARY_STAGE_VELO_RESET_MAX,
-        use_shutter=True,
-        time_trigger=True,
-    ):
+    exposure_time,
+    num_projections,
+    y_motion_start,
+    y_motion_stop,
+    y_motion_step,
+    detectors=["kinetix1"],
+    start_deg=0,
+    stop_deg=180,
+    lead_angle=10,
+    acquire_period=0.0,
+    reset_speed=TOMO_ROTARY_STAGE_VELO_RESET_MAX,
+    use_shutter=True,
+    time_trigger=True,
+    bidirectional=False,
+):
 
     pre_scan_position = sample_tower.vertical_y.user_readback.get()
 
@@ -471,11 +2416,11 @@ def tomo_y_scan_loop(
     for i in range(num_steps):
 
         print(f"Executing tomo flyscan iteration #{i+1}...")
-        
+
         yield from tomo_flyscan(
             exposure_time,
             num_projections,
-            acquire_period=acquire_period,            
+            acquire_period=acquire_period,
             detectors=detectors,
             time_trigger=time_trigger,
             start_deg=start_deg,
@@ -483,6 +2428,7 @@ def tomo_y_scan_loop(
             lead_angle=lead_angle,
             reset_speed=reset_speed,
             use_shutter=use_shutter,
+            reverse=bidirectional and i % 2 == 1,
         )
 
         # Sleep to wait for file saving to complete
@@ -492,20 +2438,92 @@ def tomo_y_scan_loop(
         # if skip_tomo_num > 0:
         #     scan_countdown -= 1
 
-            #if scan_countdown == 0:
-            #    print("Taking dark, flat...")
-            #    yield from tomo_dark_flat(exposure_time, dark_flat_offset, detectors=detectors, use_shutter=use_shutter, dark_images=num_dark_images, flat_images=num_flat_images)
-            #    scan_countdown = skip_tomo_num        
-
+        # if scan_countdown == 0:
+        #    print("Taking dark, flat...")
+        #    yield from tomo_dark_flat(exposure_time, dark_flat_offset, detectors=detectors, use_shutter=use_shutter, dark_images=num_dark_images, flat_images=num_flat_images)
+        #    scan_countdown = skip_tomo_num
 
     # yield from tomo_dark_flat(exposure_time, dark_flat_offset, detectors=detectors, use_shutter=use_shutter, dark_images=num_dark_images, flat_images=num_flat_images)
 
     yield from bps.mv(sample_tower.vertical_y, pre_scan_position)
 
 
-def tomo_grid_scan(
+def tomo_grid_positions(
+    x_motion_start,
+    x_motion_stop,
+    x_motion_step,
+    y_motion_start,
+    y_motion_stop,
+    y_motion_step,
+    serpentine=False,
+):
+    """
+    Rows of (x, y) sample positions of a grid scan, in the order they are scanned.
+
+    Every row is scanned from `x_motion_start` towards `x_motion_stop` (raster
+    order), or, with `serpentine`, every second row in the other direction so
+    the sample does not return to `x_motion_start` between rows. The last
+    position of a row or column may fall short of the stop position when the
+    step does not divide the range evenly.
+    """
+    num_y_steps = int(abs(y_motion_start - y_motion_stop) / abs(y_motion_step)) + 1
+    num_x_steps = int(abs(x_motion_start - x_motion_stop) / abs(x_motion_step)) + 1
+    y_direction = -1 if y_motion_start > y_motion_stop else 1
+    x_direction = -1 if x_motion_start > x_motion_stop else 1
+
+    rows = []
+    for i in range(num_y_steps):
+        y = y_motion_start + i * abs(y_motion_step) * y_direction
+        xs = [
+            x_motion_start + j * abs(x_motion_step) * x_direction
+            for j in range(num_x_steps)
+        ]
+        if serpentine and i % 2 == 1:
+            xs.reverse()
+        rows.append([(x, y) for x in xs])
+    return rows
+
+
+def estimate_tomo_grid_time(
+    rows,
+    trajectory,
+    x_velocity,
+    y_velocity,
+    dark_flat_time=0,
+    overlap_moves=False,
+    bidirectional=False,
+    reset_speed=TOMO_ROTARY_STAGE_VELO_RESET_MAX,
+):
+    """
+    Estimate the duration of a grid scan in s, without moving anything.
+
+    `rows` are the sample positions (see `tomo_grid_positions`), `trajectory`
+    the `TomoTrajectory` of one tile and `dark_flat_time` the time to take the
+    darks and flats at the start of every row. Between two tiles, the rotation
+    axis returns to the start of the next tile and the sample moves to it, one
+    after the other or, with `overlap_moves`, at the same time.
+    """
+    reset_speed = min(reset_speed, TOMO_ROTARY_STAGE_VELO_RESET_MAX)
+    scan_range = abs(trajectory.stop_deg - trajectory.start_deg)
+    # A bidirectional scan starts where the previous one ended, only the run-up is left.
+    return_deg = 2 * trajectory.lead_angle + (0 if bidirectional else scan_range)
+    return_time = return_deg / reset_speed
+
+    tiles = [position for row in rows for position in row]
+    total = len(rows) * dark_flat_time + trajectory.return_time
+    total += len(tiles) * (trajectory.scan_time + TOMO_FLYSCAN_RUN_OVERHEAD)
+    for (x, y), (next_x, next_y) in zip(tiles, tiles[1:]):
+        x_time = abs(next_x - x) / x_velocity
+        y_time = abs(next_y - y) / y_velocity
+        if overlap_moves:
+            total += max(return_time, x_time, y_time)
+        else:
+            total += return_time + x_time + y_time
+    return total
+
+
+def tomo_grid_scan_estimate(
     exposure_time,
-    dark_flat_offset,
     num_projections,
     x_motion_start,
     x_motion_stop,
@@ -513,73 +2531,306 @@ def tomo_grid_scan(
     y_motion_start,
     y_motion_stop,
     y_motion_step,
-    acquire_period=0.0,    
+    dark_flat_offset=None,
+    num_flat_images=50,
+    num_dark_images=20,
+    acquire_period=0.0,
     detectors=None,
-    time_trigger=True,
     start_deg=0,
     stop_deg=180,
     lead_angle=10,
     reset_speed=TOMO_ROTARY_STAGE_VELO_RESET_MAX,
-    use_shutter=True,
-    num_flat_images = 50,
-    num_dark_images = 20,     
+    bidirectional=False,
+    verbose=True,
 ):
+    """
+    Estimate the duration of a grid scan in raster and serpentine order.
 
-    pre_scan_position_x = sample_tower.axis_x1.user_readback.get()
-    pre_scan_position_y = sample_tower.vertical_y.user_readback.get()
+    Both orders are estimated with and without overlapped moves.
 
-    yield from bps.mv(
-        sample_tower.vertical_y, y_motion_start,
+    Nothing moves: the tile timing comes from `tomo_scan_planner`, the sample
+    moves from the velocities of the sample tower axes. Without
+    `dark_flat_offset`, no darks and flats are taken (as in
+    `tomo_grid_scan_no_dark_flat`). Returns a dict of the estimates in s, by
+    (serpentine, overlap_moves).
+    """
+    trajectory = yield from tomo_scan_planner(
+        exposure_time,
+        num_projections,
+        start_deg=start_deg,
+        stop_deg=stop_deg,
+        lead_angle=lead_angle,
+        detectors=detectors,
+        acquire_period=acquire_period,
+        reset_speed=reset_speed,
+        verbose=False,
     )
+    x_velocity = yield from bps.rd(sample_tower.axis_x1.velocity)
+    y_velocity = yield from bps.rd(sample_tower.vertical_y.velocity)
+
+    dark_flat_time = 0
+    if dark_flat_offset is not None:
+        dark_flat_time = (
+            (num_dark_images + num_flat_images)
+            * (exposure_time + SOFTWARE_FLYSCAN_PULSE_OVERHEAD)
+            + 2 * abs(dark_flat_offset) / x_velocity
+            + TOMO_FLYSCAN_RUN_OVERHEAD
+        )
 
-    num_y_steps = int(abs(y_motion_start - y_motion_stop) / abs(y_motion_step)) + 1    
-    num_x_steps = int(abs(x_motion_start - x_motion_stop) / abs(x_motion_step)) + 1
+    estimates = {}
+    for serpentine in (False, True):
+        rows = tomo_grid_positions(
+            x_motion_start,
+            x_motion_stop,
+            x_motion_step,
+            y_motion_start,
+            y_motion_stop,
+            y_motion_step,
+            serpentine=serpentine,
+        )
+        for overlap_moves in (False, True):
+            estimates[(serpentine, overlap_moves)] = estimate_tomo_grid_time(
+                rows,
+                trajectory,
+                x_velocity,
+                y_velocity,
+                dark_flat_time=dark_flat_time,
+                overlap_moves=overlap_moves,
+                bidirectional=bidirectional,
+                reset_speed=reset_speed,
+            )
 
-    if y_motion_start > y_motion_stop:
-        y_direction = -1
-    else:
-        y_direction = 1
+    if verbose:
+        num_tiles = sum(len(row) for row in rows)
+        print(
+            f"Grid of {num_tiles} tiles ({len(rows)} rows), "
+            f"{trajectory.scan_time:.1f} s of rotation per tile:"
+        )
+        for (serpentine, overlap_moves), total in estimates.items():
+            strategy = (
+                f"{'serpentine' if serpentine else 'raster'}, "
+                f"{'overlapped' if overlap_moves else 'sequential'} moves"
+            )
+            print(f"    {strategy:35}: {total / 60:8.1f} min")
+    return estimates
 
-    if x_motion_start > x_motion_stop:
-        x_direction = -1
-    else:
-        x_direction = 1
 
-    last_y_step = y_motion_start + y_direction * abs(num_y_steps * y_motion_step)
-    last_x_step = x_motion_start + x_direction * abs(num_x_steps * x_motion_step)
-    print(f"Your last y step will be {last_y_step}, since the y_step did not divide evenly.")
-    print(f"Your last x step will be {last_x_step}, since the x_step did not divide evenly.")
+def run_tomo_grid(
+    rows,
+    flyscan_kwargs,
+    dark_flat_kwargs=None,
+    overlap_moves=False,
+    bidirectional=False,
+    adaptive_dark_flat=False,
+):
+    """
+    Fly scan every tile of a grid, with darks and flats at the start of every row.
+
+    `rows` are the sample positions (see `tomo_grid_positions`),
+    `flyscan_kwargs` the arguments of `tomo_flyscan` and `dark_flat_kwargs`
+    the ones of `tomo_dark_flat` (no darks and flats if None). With
+    `overlap_moves`, the sample starts moving to the next tile as soon as the
+    last projection is collected, and the rotation axis returns to the start
+    of the next tile at the same time, while the files of the previous tile are
+    closed. With `adaptive_dark_flat`, the darks and flats of a row after the
+    first one are only taken when the drift signals measured after the last
+    tile require it (see `adaptive_tomo_dark_flat`).
+    """
+    if adaptive_dark_flat and dark_flat_kwargs is not None:
+        check_adaptive_dark_flat()
 
+    tiles = [(i, j, x, y) for i, row in enumerate(rows) for j, (x, y) in enumerate(row)]
+    drift_values = {}
+    num_skipped = 0
 
-    for i in range(num_y_steps):
+    yield from bps.mv(
+        sample_tower.vertical_y,
+        tiles[0][3],
+        sample_tower.axis_x1,
+        tiles[0][2],
+    )
 
-        yield from bps.mv(sample_tower.axis_x1, x_motion_start)
+    for k, (i, j, x, y) in enumerate(tiles):
+        # A pause requested during the previous scan takes effect here.
+        yield from bps.checkpoint()
+        if j == 0 and dark_flat_kwargs is not None:
+            if adaptive_dark_flat and i > 0:
+                print(f"Checking the drift for row w/ y position {y}")
+                if not (
+                    yield from adaptive_tomo_dark_flat(drift_values, **dark_flat_kwargs)
+                ):
+                    num_skipped += 1
+            else:
+                print(f"Taking dark, flat for row w/ y position {y}")
+                yield from tomo_dark_flat(**dark_flat_kwargs)
+
+        print(f"Executing tomo flyscan iteration y step: {i+1}, x step {j+1}...")
+
+        next_tile = tiles[k + 1] if k + 1 < len(tiles) else None
+        move_group = short_uid("grid_move")
+
+        def after_projections():
+            if adaptive_dark_flat:
+                values = yield from read_dark_flat_drift_signals()
+                drift_values.update(values)
+            if overlap_moves and next_tile is not None:
+                _, _, next_x, next_y = next_tile
+                yield from bps.abs_set(sample_tower.axis_x1, next_x, group=move_group)
+                yield from bps.abs_set(
+                    sample_tower.vertical_y, next_y, group=move_group
+                )
 
-        print(f"Taking dark, flat for row w/ y position {sample_tower.vertical_y.user_readback.get()}")
-        yield from tomo_dark_flat(exposure_time, dark_flat_offset, detectors=detectors, use_shutter=use_shutter, dark_images=num_dark_images, flat_images=num_flat_images)
+        yield from tomo_flyscan(
+            **flyscan_kwargs,
+            reverse=bidirectional and k % 2 == 1,
+            after_projections=after_projections,
+        )
+
+        if next_tile is None:
+            break
+        _, _, next_x, next_y = next_tile
+        if overlap_moves:
+            # Return the rotation axis to the start of the next tile while the sample
+            # moves.
+            _, next_first_deg, _, _ = tomo_scan_endpoints(
+                flyscan_kwargs["start_deg"],
+                flyscan_kwargs["stop_deg"],
+                flyscan_kwargs["lead_angle"],
+                reverse=bidirectional and (k + 1) % 2 == 1,
+            )
+            yield from bps.mv(
+                tomo_rot_axis.velocity,
+                min(flyscan_kwargs["reset_speed"], TOMO_ROTARY_STAGE_VELO_RESET_MAX),
+            )
+            yield from bps.abs_set(tomo_rot_axis, next_first_deg, group=move_group)
+            yield from bps.wait(group=move_group)
+        else:
+            if next_y != y:
+                yield from bps.mv(sample_tower.vertical_y, next_y)
+            if next_x != x:
+                yield from bps.mv(sample_tower.axis_x1, next_x)
 
-        for j in range(num_x_steps):
+    if adaptive_dark_flat:
+        print(f"Skipped {num_skipped} dark/flat sets without drift.")
 
-            print(f"Executing tomo flyscan iteration y step: {i+1}, x step {j+1}...")
-        
-            yield from tomo_flyscan(
+
+def tomo_grid_scan(
+    exposure_time,
+    dark_flat_offset,
+    num_projections,
+    x_motion_start,
+    x_motion_stop,
+    x_motion_step,
+    y_motion_start,
+    y_motion_stop,
+    y_motion_step,
+    acquire_period=0.0,
+    detectors=None,
+    time_trigger=True,
+    start_deg=0,
+    stop_deg=180,
+    lead_angle=10,
+    reset_speed=TOMO_ROTARY_STAGE_VELO_RESET_MAX,
+    use_shutter=True,
+    num_flat_images=50,
+    num_dark_images=20,
+    bidirectional=False,
+    serpentine=False,
+    overlap_moves=False,
+    adaptive_dark_flat=False,
+    dry_run=False,
+):
+    """
+    Tomography fly scans on a grid of sample positions.
+
+    Darks and flats are taken at the start of every row.
+
+    With `serpentine`, every second row is scanned from `x_motion_stop` back
+    to `x_motion_start` instead of returning to the start of the row. With
+    `overlap_moves`, the move to the next tile and the return of the rotation
+    axis run at the same time, while the files of the previous tile are
+    closed (see `run_tomo_grid`). With `adaptive_dark_flat`, the darks and
+    flats of the next rows are only taken when the beam drifted (see
+    `adaptive_tomo_dark_flat`). With `dry_run`, nothing moves: the duration
+    of the grid is estimated for every strategy (see `tomo_grid_scan_estimate`).
+    """
+
+    if dry_run:
+        return (
+            yield from tomo_grid_scan_estimate(
                 exposure_time,
                 num_projections,
-                acquire_period=acquire_period,                
+                x_motion_start,
+                x_motion_stop,
+                x_motion_step,
+                y_motion_start,
+                y_motion_stop,
+                y_motion_step,
+                dark_flat_offset=dark_flat_offset,
+                num_flat_images=num_flat_images,
+                num_dark_images=num_dark_images,
+                acquire_period=acquire_period,
                 detectors=detectors,
-                time_trigger=time_trigger,
                 start_deg=start_deg,
                 stop_deg=stop_deg,
                 lead_angle=lead_angle,
                 reset_speed=reset_speed,
-                use_shutter=use_shutter,
+                bidirectional=bidirectional,
             )
-            if j < num_x_steps -1:
-                yield from bps.movr(sample_tower.axis_x1, abs(x_motion_step) * x_direction)
+        )
 
-        if i < num_y_steps -1: 
-            yield from bps.movr(sample_tower.vertical_y, abs(y_motion_step) * y_direction)
+    pre_scan_position_x = sample_tower.axis_x1.user_readback.get()
+    pre_scan_position_y = sample_tower.vertical_y.user_readback.get()
+
+    rows = tomo_grid_positions(
+        x_motion_start,
+        x_motion_stop,
+        x_motion_step,
+        y_motion_start,
+        y_motion_stop,
+        y_motion_step,
+        serpentine=serpentine,
+    )
+
+    print(
+        f"Your last y step will be {rows[-1][0][1]}, "
+        "since the y_step did not divide evenly."
+    )
+    print(
+        f"Your last x step will be {rows[0][-1][0]}, "
+        "since the x_step did not divide evenly."
+    )
 
+    start_time = ttime.monotonic()
+    yield from run_tomo_grid(
+        rows,
+        dict(
+            exposure_time=exposure_time,
+            num_images=num_projections,
+            acquire_period=acquire_period,
+            detectors=detectors,
+            time_trigger=time_trigger,
+            start_deg=start_deg,
+            stop_deg=stop_deg,
+            lead_angle=lead_angle,
+            reset_speed=reset_speed,
+            use_shutter=use_shutter,
+        ),
+        dark_flat_kwargs=dict(
+            exposure_time=exposure_time,
+            offset=dark_flat_offset,
+            detectors=detectors,
+            use_shutter=use_shutter,
+            dark_images=num_dark_images,
+            flat_images=num_flat_images,
+        ),
+        overlap_moves=overlap_moves,
+        bidirectional=bidirectional,
+        adaptive_dark_flat=adaptive_dark_flat,
+    )
+    print(
+        f"Completed the grid scan in {(ttime.monotonic() - start_time) / 60:.1f} min."
+    )
 
     yield from bps.mv(
         sample_tower.vertical_y, pre_scan_position_y,
@@ -587,7 +2838,6 @@ def tomo_grid_scan(
     )
 
 
-
 def tomo_grid_scan_no_dark_flat(
     exposure_time,
     num_projections,
@@ -597,7 +2847,7 @@ def tomo_grid_scan_no_dark_flat(
     y_motion_start,
     y_motion_stop,
     y_motion_step,
-    acquire_period=0.0,    
+    acquire_period=0.0,
     detectors=None,
     time_trigger=True,
     start_deg=0,
@@ -605,58 +2855,81 @@ def tomo_grid_scan_no_dark_flat(
     lead_angle=10,
     reset_speed=TOMO_ROTARY_STAGE_VELO_RESET_MAX,
     use_shutter=True,
+    bidirectional=False,
+    serpentine=False,
+    overlap_moves=False,
+    dry_run=False,
 ):
+    """
+    Tomography fly scans on a grid of sample positions, without darks and flats.
 
-    pre_scan_position_x = sample_tower.axis_x1.user_readback.get()
-    pre_scan_position_y = sample_tower.vertical_y.user_readback.get()
-
-    yield from bps.mv(
-        sample_tower.vertical_y, y_motion_start,
-    )
-
-    num_y_steps = int(abs(y_motion_start - y_motion_stop) / abs(y_motion_step)) + 1    
-    num_x_steps = int(abs(x_motion_start - x_motion_stop) / abs(x_motion_step)) + 1
-
-    if y_motion_start > y_motion_stop:
-        y_direction = -1
-    else:
-        y_direction = 1
-
-    if x_motion_start > x_motion_stop:
-        x_direction = -1
-    else:
-        x_direction = 1
-
-    last_y_step = y_motion_start + y_direction * abs(num_y_steps * y_motion_step)
-    last_x_step = x_motion_start + x_direction * abs(num_x_steps * x_motion_step)
-    print(f"Your last y step will be {last_y_step}, since the y_step did not divide evenly.")
-    print(f"Your last x step will be {last_x_step}, since the x_step did not divide evenly.")
-
-
-    for i in range(num_y_steps):
-        yield from bps.mv(sample_tower.axis_x1, x_motion_start)
-        for j in range(num_x_steps):
+    See `tomo_grid_scan` for `serpentine`, `overlap_moves` and `dry_run`.
+    """
 
-            print(f"Executing tomo flyscan iteration y step: {i+1}, x step {j+1}...")
-        
-            yield from tomo_flyscan(
+    if dry_run:
+        return (
+            yield from tomo_grid_scan_estimate(
                 exposure_time,
                 num_projections,
-                acquire_period=acquire_period,                
+                x_motion_start,
+                x_motion_stop,
+                x_motion_step,
+                y_motion_start,
+                y_motion_stop,
+                y_motion_step,
+                acquire_period=acquire_period,
                 detectors=detectors,
-                time_trigger=time_trigger,
                 start_deg=start_deg,
                 stop_deg=stop_deg,
                 lead_angle=lead_angle,
                 reset_speed=reset_speed,
-                use_shutter=use_shutter,
+                bidirectional=bidirectional,
             )
-            if j < num_x_steps -1:
-                yield from bps.movr(sample_tower.axis_x1, abs(x_motion_step) * x_direction)
+        )
+
+    pre_scan_position_x = sample_tower.axis_x1.user_readback.get()
+    pre_scan_position_y = sample_tower.vertical_y.user_readback.get()
 
-        if i < num_y_steps -1: 
-            yield from bps.movr(sample_tower.vertical_y, abs(y_motion_step) * y_direction)
+    rows = tomo_grid_positions(
+        x_motion_start,
+        x_motion_stop,
+        x_motion_step,
+        y_motion_start,
+        y_motion_stop,
+        y_motion_step,
+        serpentine=serpentine,
+    )
 
+    print(
+        f"Your last y step will be {rows[-1][0][1]}, "
+        "since the y_step did not divide evenly."
+    )
+    print(
+        f"Your last x step will be {rows[0][-1][0]}, "
+        "since the x_step did not divide evenly."
+    )
+
+    start_time = ttime.monotonic()
+    yield from run_tomo_grid(
+        rows,
+        dict(
+            exposure_time=exposure_time,
+            num_images=num_projections,
+            acquire_period=acquire_period,
+            detectors=detectors,
+            time_trigger=time_trigger,
+            start_deg=start_deg,
+            stop_deg=stop_deg,
+            lead_angle=lead_angle,
+            reset_speed=reset_speed,
+            use_shutter=use_shutter,
+        ),
+        overlap_moves=overlap_moves,
+        bidirectional=bidirectional,
+    )
+    print(
+        f"Completed the grid scan in {(ttime.monotonic() - start_time) / 60:.1f} min."
+    )
 
     yield from bps.mv(
         sample_tower.vertical_y, pre_scan_position_y,
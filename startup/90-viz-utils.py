@@ -1,4 +1,297 @@
+import time as ttime
+import urllib.parse
+
+import numpy as np
+
+# Only needed to read the capture files.
+h5py = lazy_import("h5py")
+
+# Rows read at once from chunked or compressed HDF5 datasets.
+HDF5_READ_ROWS = 1_000_000
+# PandA dataset of the trigger timestamps (PCAP.TS_TRIG, if captured), in s.
+PANDA_TIME_DATASET = "PCAP.TS_TRIG.Value"
+# Per-frame timestamps written by the areaDetector HDF5 plugin, in s.
+DETECTOR_TIME_DATASET = "/entry/instrument/NDAttributes/NDArrayTimeStamp"
+DETECTOR_DATA_DATASET = "/entry/data/data"
+
+
 def display_run_angles(scan_num = -1):
     angles = c.values()[-1]['panda1_stream']['external']['Angle'].read()
     print(f"{angles = }")
-    
\ No newline at end of file
+
+
+def read_hdf5_dataset(dataset):
+    """
+    Read a 1D HDF5 dataset without copying it through h5py where possible.
+
+    A contiguous, uncompressed dataset is memory-mapped; a chunked one is read
+    `HDF5_READ_ROWS` rows at a time into one array. A contiguous dataset
+    without storage yet (nothing written) is read whole, as its fill value.
+    """
+    if dataset.chunks is None:
+        offset = dataset.id.get_offset()
+        if dataset.compression is not None or offset is None:
+            return dataset[()]
+        return np.memmap(
+            dataset.file.filename,
+            dtype=dataset.dtype,
+            mode="r",
+            offset=offset,
+            shape=dataset.shape,
+        )
+    data = np.empty(dataset.shape, dtype=dataset.dtype)
+    rows = max(HDF5_READ_ROWS // dataset.chunks[0], 1) * dataset.chunks[0]
+    for start in range(0, dataset.shape[0], rows):
+        selection = np.s_[start : start + rows]
+        dataset.read_direct(data, selection, selection)
+    return data
+
+
+def encoder_counts_to_degrees(
+    counts, zero_offset=ZERO_OFFSET, counts_per_deg=COUNTS_PER_DEG
+):
+    """Convert rotation encoder counts, as captured by the PandA, to degrees."""
+    return (np.asarray(counts, dtype=np.float64) - zero_offset) / counts_per_deg
+
+
+def tomo_angle_report(
+    angles,
+    num_images=None,
+    expected_step=None,
+    panda_times=None,
+    detector_times=None,
+    frame_divider=1,
+):
+    """
+    Check the projection angles of a fly scan and the timing of the detector frames.
+
+    `angles` are in degrees, in capture order. The steps between them are
+    compared with `expected_step` (the median step by default): a step of n
+    times the expected one means n - 1 missed triggers, a step shorter than
+    half of it an extra trigger. A single step against the direction of its
+    neighbours (the return between two tomograms) separates two segments and
+    is not counted, and so does a reversal (bidirectional scans).
+
+    With `detector_times`, the time between two frames is compared with the
+    time between the corresponding PandA triggers (`panda_times`, every
+    `frame_divider`-th), or with its median; the standard deviation and the
+    largest difference are the jitter. Returns a dict.
+    """
+    angles = np.asarray(angles, dtype=np.float64)
+    steps = np.diff(angles)
+    signs = np.sign(steps)
+    previous_signs = np.concatenate([signs[:1], signs[:-1]])
+    next_signs = np.concatenate([signs[1:], signs[-1:]])
+    returns = (signs != previous_signs) & (signs != next_signs)
+    scan_signs = signs[~returns]
+    scan_steps = np.abs(steps[~returns])
+    if expected_step is None:
+        expected_step = float(np.median(scan_steps)) if len(scan_steps) else 0.0
+    expected_step = abs(expected_step)
+
+    report = {
+        "num_angles": len(angles),
+        "num_images": num_images,
+        "expected_step": expected_step,
+        "segments": int(
+            np.count_nonzero(returns) + np.count_nonzero(np.diff(scan_signs))
+        )
+        + 1,
+    }
+    if expected_step and len(scan_steps):
+        multiples = np.rint(scan_steps / expected_step)
+        single = scan_steps[multiples == 1]
+        report.update(
+            missed_triggers=int(np.sum(multiples[multiples > 1] - 1)),
+            extra_triggers=int(np.count_nonzero(scan_steps < expected_step / 2)),
+            step_mean=float(single.mean()) if len(single) else float("nan"),
+            step_std=float(single.std()) if len(single) else float("nan"),
+            step_max_deviation=(
+                float(np.abs(single - expected_step).max())
+                if len(single)
+                else float("nan")
+            ),
+        )
+        # Indices of the angles after which triggers are missing.
+        report["missed_after"] = np.flatnonzero(
+            ~returns & (np.abs(steps) > 1.5 * expected_step)
+        ).tolist()[:20]
+
+    if detector_times is not None:
+        detector_times = np.asarray(detector_times, dtype=np.float64)
+        report["num_frames"] = len(detector_times)
+        frame_intervals = np.diff(detector_times)
+        if panda_times is not None:
+            panda_times = np.asarray(panda_times, dtype=np.float64)[::frame_divider]
+            num = min(len(panda_times), len(detector_times))
+            deviations = frame_intervals[: num - 1] - np.diff(panda_times[:num])
+        else:
+            deviations = (
+                frame_intervals - np.median(frame_intervals)
+                if len(frame_intervals)
+                else frame_intervals
+            )
+        if len(deviations):
+            report.update(
+                jitter_std=float(deviations.std()),
+                jitter_max=float(np.abs(deviations).max()),
+                jitter_reference=(
+                    "PandA triggers" if panda_times is not None else "median interval"
+                ),
+            )
+    return report
+
+
+def print_tomo_angle_report(report):
+    print(
+        f"    Angles          : {report['num_angles']} "
+        f"(expected {report['num_images']})"
+    )
+    if "missed_triggers" in report:
+        print(
+            f"    Step            : {report['step_mean']:.5f} "
+            f"+/- {report['step_std']:.5f} deg "
+            f"(expected {report['expected_step']:.5f}, "
+            f"max deviation {report['step_max_deviation']:.5f})"
+        )
+        print(f"    Missed triggers : {report['missed_triggers']}")
+        print(f"    Extra triggers  : {report['extra_triggers']}")
+        if report["missed_after"]:
+            print(f"    Missing after   : {report['missed_after']}")
+    if report["segments"] > 1:
+        print(
+            f"    Segments        : {report['segments']} "
+            "(returns or reversals in between)"
+        )
+
+
+def divided_trigger_indices(num_triggers, divider=1, num_tomograms=1):
+    """
+    Indices of the triggers that expose a detector taking every `divider`-th one.
+
+    The pulse block of the detector restarts with every tomogram, the
+    `num_triggers` triggers are split evenly between `num_tomograms`.
+    """
+    return np.concatenate(
+        [
+            triggers[::divider]
+            for triggers in np.array_split(np.arange(num_triggers), num_tomograms)
+        ]
+    )
+
+
+def validate_panda_capture(
+    panda_file,
+    detector_files=None,
+    num_images=None,
+    expected_step=None,
+    angle_dataset="Angle",
+    frame_dividers=None,
+    num_tomograms=1,
+    verbose=True,
+):
+    """
+    Validate the "Angle" capture of a fly scan from the PandA HDF5 file.
+
+    The encoder counts are converted to degrees with `COUNTS_PER_DEG` and
+    `ZERO_OFFSET` and checked with `tomo_angle_report`. `detector_files` maps
+    detector names to their HDF5 files; their frame counts and frame
+    timestamps are compared with the PandA triggers (`PANDA_TIME_DATASET`,
+    if captured). `frame_dividers` maps detector names to the fraction of
+    the triggers they take (see `TomoTrajectory.frame_dividers`), counted
+    from the first trigger of each of the `num_tomograms` tomograms.
+    Returns a dict of reports by device name.
+    """
+    frame_dividers = frame_dividers or {}
+    t0 = ttime.monotonic()
+    with h5py.File(panda_file, "r", swmr=True) as f:
+        angles = encoder_counts_to_degrees(read_hdf5_dataset(f[angle_dataset]))
+        panda_times = (
+            read_hdf5_dataset(f[PANDA_TIME_DATASET])
+            if PANDA_TIME_DATASET in f
+            else None
+        )
+
+    reports = {"panda1": tomo_angle_report(angles, num_images, expected_step)}
+    for name, path in (detector_files or {}).items():
+        with h5py.File(path, "r", swmr=True) as f:
+            detector_times = (
+                read_hdf5_dataset(f[DETECTOR_TIME_DATASET])
+                if DETECTOR_TIME_DATASET in f
+                else np.full(f[DETECTOR_DATA_DATASET].shape[0], np.nan)
+            )
+        triggers = divided_trigger_indices(
+            len(angles), frame_dividers.get(name, 1), num_tomograms
+        )
+        report = tomo_angle_report(
+            angles,
+            num_images,
+            expected_step,
+            panda_times=panda_times[triggers] if panda_times is not None else None,
+            detector_times=detector_times,
+        )
+        report["expected_frames"] = len(triggers)
+        reports[name] = report
+
+    if verbose:
+        print(
+            f"Validated {len(angles)} angles "
+            f"in {ttime.monotonic() - t0:.2f} s ({panda_file}):"
+        )
+        print_tomo_angle_report(reports["panda1"])
+        for name, report in reports.items():
+            if name == "panda1":
+                continue
+            print(
+                f"    {name:16}: {report['num_frames']} frames "
+                f"(expected {report['expected_frames']})"
+            )
+            if "jitter_std" in report:
+                print(
+                    f"    {'':16}  jitter {report['jitter_std'] * 1e6:.1f} us rms, "
+                    f"{report['jitter_max'] * 1e6:.1f} us max "
+                    f"(against the {report['jitter_reference']})"
+                )
+    return reports
+
+
+def run_hdf5_file(node):
+    """Path of the HDF5 file behind an external array of a Tiled run."""
+    uri = node.data_sources()[0].assets[0].data_uri
+    return urllib.parse.urlparse(uri).path
+
+
+def run_stream_data(run, stream):
+    """The data of a stream of a Tiled run, with its external arrays."""
+    return run[stream]["external"] if "external" in run[stream] else run[stream]
+
+
+def validate_run_angles(scan_num=-1, stream="tomo", run=None):
+    """
+    Validate the angles and frame timing of a fly scan from its files.
+
+    The files are found from the Tiled data sources of the run (`run`, or
+    else `scan_num` in the catalog) and checked with `validate_panda_capture`;
+    call it with the file paths if they are not available. A detector taking
+    every n-th trigger is read from its own "<stream>_<name>" stream, see
+    `tomo_streams`.
+    """
+    if run is None:
+        run = c.values()[-1] if scan_num == -1 else c[scan_num]
+    start = run.metadata["start"]
+    data = run_stream_data(run, stream)
+    panda_file = run_hdf5_file(data["Angle"])
+    detector_files = {}
+    for name in start.get("detectors", []):
+        if name in data:
+            detector_files[name] = run_hdf5_file(data[name])
+        elif f"{stream}_{name}" in run:
+            detector_data = run_stream_data(run, f"{stream}_{name}")
+            detector_files[name] = run_hdf5_file(detector_data[name])
+    return validate_panda_capture(
+        panda_file,
+        detector_files,
+        num_images=start.get("num_points"),
+        frame_dividers=start.get("frame_dividers"),
+        num_tomograms=start.get("num_tomograms", 1),
+    )
@@ -1,8 +1,11 @@
-from tiled.queries import Key
 import os
 
+# Only needed to search the catalog.
+tiled_queries = lazy_import("tiled.queries")
+
 def find_bsrun_for_file(fpath: str):
     # ts = datetime(2025, 7, 31, 16, 20, 59).timestamp()   # File creation timestamp
     ts = os.path.getmtime(fpath)  # File creation timestamp
-    run = tiled_reading_client.search(Key('start.time') < ts).values().last()
+    query = tiled_queries.Key('start.time') < ts
+    run = tiled_reading_client.search(query).values().last()
     return run
\ No newline at end of file
@@ -4,7 +4,9 @@ import glob
 import os
 
 import numpy as np
-from PIL import Image
+
+# Only needed when saving images.
+Image = lazy_import("PIL.Image")
 
 
 def make_folder(file_path):
@@ -67,3 +69,6 @@ def save_image(file_path, mat, overwrite=True):
     return file_path
 
 file_loading_timer.stop_timer(__file__)
+
+# Last timed startup file: write the startup report once the devices are connected.
+file_loading_timer.finish(device_registry)
@@ -0,0 +1,420 @@
+import asyncio
+import contextlib
+import os
+import sys
+import threading
+import time as ttime
+from pathlib import Path
+
+import bluesky.plan_stubs as bps
+import bluesky.preprocessors as bpp
+import numpy as np
+import pytest
+from bluesky import RunEngine
+from bluesky.run_engine import get_bluesky_event_loop
+from ophyd import Component as Cpt
+from ophyd import Device, EpicsMotor
+from ophyd.sim import Signal, make_fake_device
+from ophyd.utils.epics_pvs import AlarmSeverity
+from ophyd_async.core import Device as AsyncDevice
+from ophyd_async.core import DeviceVector, SignalR, SignalRW, init_devices
+from ophyd_async.epics.adcore import ADBaseDataType
+from ophyd_async.epics.adkinetix import KinetixReadoutMode
+from ophyd_async.fastcs.panda import (
+    DatasetTable,
+    HDFPanda,
+    PandaHdf5DatasetType,
+    PulseBlock,
+    SeqTrigger,
+)
+from ophyd_async.testing import callback_on_mock_put, set_mock_value
+
+# The profile directory holds the importable `hex_profile` package.
+PROFILE_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(PROFILE_DIR))
+STARTUP_DIR = PROFILE_DIR / "startup"
+
+# Time the simulated shutter takes to move, in s.
+SHUTTER_MOVE_TIME = 0.2
+# Interval of the position updates of the simulated motors, in s.
+MOTOR_UPDATE_PERIOD = 0.01
+
+# RE.md of a session with a proposal, as the path providers expect it.
+SESSION_MD = {
+    "scan_id": 1,
+    "cycle": "2024-3",
+    "data_session": "pass-000000",
+    "proposal": {"type": "General User"},
+}
+
+
+class StartupTimer:
+    """Stand-in for the `file_loading_timer` of 00-startup.py."""
+
+    current_file = None
+
+    def start_timer(self, filename):
+        self.current_file = filename
+
+    def stop_timer(self, filename):
+        self.current_file = None
+
+    def timed(self, category):
+        return contextlib.nullcontext()
+
+
+def exec_startup_files(namespace, *names):
+    """Execute startup files into `namespace`, as IPython does at startup."""
+    for name in names:
+        path = STARTUP_DIR / name
+        namespace["__file__"] = str(path)
+        exec(compile(path.read_text(), str(path), "exec"), namespace)
+    return namespace
+
+
+@pytest.fixture
+def RE():
+    RE = RunEngine({}, call_returns_result=True)
+    RE.md.update(SESSION_MD)
+    return RE
+
+
+@pytest.fixture
+def session(RE):
+    """
+    Namespace of a profile session in CI mode, with 01-globals.py,
+    02-device-registry.py and 05-providers.py loaded: the startup files
+    executed into it create their ophyd-async devices in mock mode.
+    """
+    namespace = {
+        "RE": RE,
+        "file_loading_timer": StartupTimer(),
+        "RUNNING_IN_NSLS2_CI": True,
+        "bps": bps,
+        "bpp": bpp,
+        "np": np,
+        "os": os,
+        "ttime": ttime,
+        # Stand-in for the StopDocumentExtras of 00-startup.py, keeps the extras.
+        "stop_document_extras": {},
+    }
+    return exec_startup_files(
+        namespace, "01-globals.py", "02-device-registry.py", "05-providers.py"
+    )
+
+
+def simulated_motor(motor, velocity=10.0):
+    """
+    Move a fake EpicsMotor at its `velocity` when its setpoint is written.
+
+    The readback follows the setpoint in steps of `MOTOR_UPDATE_PERIOD` s, with
+    `motor_done_move` cleared during the move, as the motor record does.
+    """
+    motor.user_setpoint.sim_set_limits((-1e6, 1e6))
+    motor.user_readback.alarm_severity = AlarmSeverity.NO_ALARM
+    motor.velocity.sim_put(velocity)
+    motor.acceleration.sim_put(0.1)
+    motor.motor_done_move.sim_put(1)
+    motor.user_readback.sim_put(0.0)
+    motor.user_setpoint.sim_put(0.0)
+    lock = threading.Lock()
+
+    def move(target):
+        with lock:
+            motor.motor_done_move.sim_put(0)
+            position = motor.user_readback.get()
+            while position != target:
+                step = max(motor.velocity.get(), 1e-3) * MOTOR_UPDATE_PERIOD
+                if target > position:
+                    position = min(position + step, target)
+                else:
+                    position = max(position - step, target)
+                ttime.sleep(MOTOR_UPDATE_PERIOD)
+                motor.user_readback.sim_put(position)
+            motor.motor_done_move.sim_put(1)
+
+    def on_setpoint(value, **kwargs):
+        threading.Thread(target=move, args=(value,), daemon=True).start()
+
+    motor.user_setpoint.subscribe(on_setpoint, run=False)
+    return motor
+
+
+def simulated_shutter(ignored_commands=0, **kwargs):
+    """
+    A HEXPhotonShutter on fake signals, moving `SHUTTER_MOVE_TIME` s after a command.
+
+    The first `ignored_commands` commands are lost. Returns the shutter and the
+    list of the commands it received.
+    """
+    from hex_profile.shutters import HEXPhotonShutter
+
+    shutter = make_fake_device(HEXPhotonShutter)("PH:", name="ph_shutter", **kwargs)
+    shutter.status.sim_set_enum_strs(["Open", "Not Open"])
+    shutter.status.sim_put(1)
+    commands = []
+
+    def on_command(target):
+        def callback(value, **kwargs):
+            commands.append(target)
+            if len(commands) > ignored_commands:
+                threading.Timer(
+                    SHUTTER_MOVE_TIME, shutter.status.sim_put, [target]
+                ).start()
+
+        return callback
+
+    shutter.open_cmd.subscribe(on_command(0), run=False)
+    shutter.close_cmd.subscribe(on_command(1), run=False)
+    return shutter, commands
+
+
+class SampleTower(Device):
+    """The sample tower axes of 03-motors.py moved by the plans."""
+
+    axis_x1 = Cpt(EpicsMotor, "X1}Mtr")
+    vertical_y = Cpt(EpicsMotor, "Y}Mtr")
+
+
+class CalcBlock(AsyncDevice):
+    out: SignalR[int]
+    out_dataset: SignalRW[str]
+
+
+class BitsBlock(AsyncDevice):
+    a: SignalRW[int]
+    b: SignalRW[int]
+
+
+class HEXPulseBlock(PulseBlock):
+    pulses: SignalRW[int]
+    step: SignalRW[float]
+
+
+class MockPanda(HDFPanda):
+    """HDFPanda with the blocks of the HEX PandA layout that the plans use."""
+
+    calc: DeviceVector[CalcBlock]
+    bits: BitsBlock
+    pulse: DeviceVector[HEXPulseBlock]
+
+
+class PandaSimulation:
+    """
+    Expose frames of the mock detectors on the pulses of the mock PandA.
+
+    Setting BITS.A starts the pulse train of PULSE2: every pulse exposes a frame
+    on the detectors writing a file, counted by their HDF5 plugin `write_time`
+    s later, and the acquisition of the detectors stops after the last pulse.
+
+    With `follow`, the encoder (CALC2.OUT) follows a motor and, while PCAP is
+    active and PCOMP1 enabled, PCOMP1 sends a gate each time the encoder passes
+    START + n * STEP in DIR, up to PULSES gates after PCAP is armed or PCOMP1
+    re-enabled. Every gate starts the train of PULSE1, captured by the PandA
+    and exposing the detectors, and the trains of the pulse blocks of the
+    detectors in `pulse_blocks` {detector name: block}. While SEQ1 is enabled,
+    it likewise sends a gate when the encoder passes the position of the next
+    row of its table. The encoder positions of the gates are kept in
+    `gate_positions`.
+    """
+
+    def __init__(self, panda, detectors, write_time=0.0, pulse_blocks=None):
+        self.panda = panda
+        self.detectors = detectors
+        self.write_time = write_time
+        self.pulse_blocks = {} if pulse_blocks is None else pulse_blocks
+        self.capturing = set()
+        self.encoder = 0
+        self.gates = 0
+        self.seq_row = 0
+        self.gate_positions = []
+        self.lock = asyncio.Lock()
+        callback_on_mock_put(panda.bits.a, self.on_bits_a)
+        callback_on_mock_put(panda.pcap.arm, self.on_arm)
+        callback_on_mock_put(panda.pcomp[1].enable, self.on_pcomp_enable)
+        callback_on_mock_put(panda.seq[1].enable, self.on_seq_enable)
+        callback_on_mock_put(panda.data.capture, self.on_panda_capture)
+        set_mock_value(panda.pcomp[1].enable, "PCAP.ACTIVE")
+        set_mock_value(panda.seq[1].enable, "ZERO")
+        set_mock_value(panda.data.directory_exists, True)
+        set_mock_value(
+            panda.data.datasets,
+            DatasetTable(name=["Angle"], dtype=[PandaHdf5DatasetType.FLOAT_64]),
+        )
+        for detector in detectors:
+            callback_on_mock_put(detector.fileio.capture, self.on_capture(detector))
+            set_mock_value(detector.fileio.file_path_exists, True)
+
+    def follow(self, motor, counts_per_deg):
+        """Move the encoder with the readback of the ophyd `motor`."""
+        loop = get_bluesky_event_loop()
+
+        def on_readback(value, **kwargs):
+            encoder = int(round(value * counts_per_deg))
+            # The motion of the simulated motors runs in threads.
+            asyncio.run_coroutine_threadsafe(self.move_encoder(encoder), loop)
+
+        motor.user_readback.subscribe(on_readback)
+
+    def on_capture(self, detector):
+        def callback(value, wait):
+            if value:
+                self.capturing.add(detector)
+                set_mock_value(detector.fileio.num_captured, 0)
+            else:
+                self.capturing.discard(detector)
+
+        return callback
+
+    def on_panda_capture(self, value, wait):
+        if value:
+            set_mock_value(self.panda.data.num_captured, 0)
+
+    def on_arm(self, value, wait):
+        set_mock_value(self.panda.pcap.active, bool(value))
+        if value:
+            self.gates = 0
+            self.seq_row = 0
+
+    def on_pcomp_enable(self, value, wait):
+        if value != "ZERO":
+            self.gates = 0
+
+    def on_seq_enable(self, value, wait):
+        if value != "ZERO":
+            self.seq_row = 0
+
+    def on_bits_a(self, value, wait):
+        if value == 1:
+            asyncio.ensure_future(
+                self.pulse_train(self.panda.pulse[2], list(self.capturing))
+            )
+
+    async def move_encoder(self, encoder):
+        async with self.lock:
+            last, self.encoder = self.encoder, encoder
+            set_mock_value(self.panda.calc[2].out, encoder)
+            if not await self.panda.pcap.active.get_value():
+                return
+            if await self.panda.pcomp[1].enable.get_value() != "ZERO":
+                await self.compare_position(last, encoder)
+            if await self.panda.seq[1].enable.get_value() != "ZERO":
+                await self.sequence(encoder)
+
+    async def compare_position(self, last, encoder):
+        pcomp = self.panda.pcomp[1]
+        start = await pcomp.start.get_value()
+        step = await pcomp.step.get_value()
+        pulses = await pcomp.pulses.get_value()
+        sign = -1 if await pcomp.dir.get_value() == "Negative" else 1
+        while self.gates < pulses:
+            threshold = sign * start + self.gates * step
+            if not sign * last < threshold <= sign * encoder:
+                break
+            self.gates += 1
+            self.gate_positions.append(sign * threshold)
+            self.gate()
+
+    async def sequence(self, encoder):
+        table = await self.panda.seq[1].table.get_value()
+        while self.seq_row < len(table.position):
+            position = int(table.position[self.seq_row])
+            if table.trigger[self.seq_row] == SeqTrigger.POSA_GT:
+                passed = encoder >= position
+            else:
+                passed = encoder <= position
+            if not passed:
+                break
+            self.seq_row += 1
+            self.gate_positions.append(position)
+            self.gate()
+
+    def gate(self):
+        blocks = {1: [self.panda]}
+        for detector in self.capturing:
+            block = self.pulse_blocks.get(detector.name, 1)
+            blocks.setdefault(block, []).append(detector)
+        for block, devices in blocks.items():
+            asyncio.ensure_future(
+                self.pulse_train(self.panda.pulse[block], devices, stop=False)
+            )
+
+    async def count_frame(self, device):
+        if device is self.panda:
+            frames = await device.data.num_captured.get_value()
+            set_mock_value(device.data.num_captured, frames + 1)
+            return
+        await asyncio.sleep(self.write_time)
+        frames = await device.fileio.num_captured.get_value()
+        set_mock_value(device.fileio.num_captured, frames + 1)
+
+    async def pulse_train(self, pulse_block, devices, stop=True):
+        pulses = await pulse_block.pulses.get_value()
+        step = await pulse_block.step.get_value()
+        for _ in range(pulses):
+            await asyncio.sleep(step)
+            for device in devices:
+                asyncio.ensure_future(self.count_frame(device))
+        if stop:
+            for detector in devices:
+                set_mock_value(detector.driver.acquire, False)
+
+
+@pytest.fixture
+def beamline(session):
+    """
+    `session` with 09-panda.py, 10-kinetix.py and 85-fly-plans.py loaded.
+
+    The motors and shutters of 03-motors.py are fake ophyd devices simulating
+    their motion, `panda1` is a `MockPanda` and the Kinetix detectors are the
+    mock HEXKinetixDetector of 10-kinetix.py, kinetix1 in the speed and kinetix3
+    in the sensitivity readout mode, triggered by a `PandaSimulation`
+    (`session["panda_simulation"]`) whose encoder follows `tomo_rot_axis`.
+    """
+    sample_tower = make_fake_device(SampleTower)("SIM:", name="sample_tower")
+    for axis in (sample_tower.axis_x1, sample_tower.vertical_y):
+        simulated_motor(axis, velocity=2.0)
+    ph_shutter, _ = simulated_shutter()
+
+    def open_ph_shutter():
+        yield from bps.mv(ph_shutter, ph_shutter.open_str)
+
+    def close_ph_shutter():
+        yield from bps.mv(ph_shutter, ph_shutter.close_str)
+
+    session.update(
+        sample_tower=sample_tower,
+        tomo_rot_axis=simulated_motor(
+            make_fake_device(EpicsMotor)("SIM:ROT}Mtr", name="tomo_rot_axis"),
+            velocity=30.0,
+        ),
+        ph_shutter=ph_shutter,
+        fe_shutter_status=Signal(name="fe_shutter_status", value=1),
+        open_ph_shutter=open_ph_shutter,
+        close_ph_shutter=close_ph_shutter,
+    )
+    exec_startup_files(session, "09-panda.py", "10-kinetix.py")
+    with init_devices(connect=False):
+        panda1 = MockPanda(
+            "SIM:PANDA1:", session["panda1"]._writer._path_provider, name="panda1"
+        )
+    # Mock PandAs get two blocks of each kind, the detectors may use PULSE3.
+    panda1._connector.filler.fill_child_device("pulse", vector_index=3)
+    session["panda1"] = session["device_registry"].register(panda1, mock=True)
+    session["device_registry"].wait(timeout=10)
+    kinetix1, kinetix3 = session["kinetix1"], session["kinetix3"]
+    set_mock_value(kinetix1.driver.readout_port_idx, KinetixReadoutMode.SPEED)
+    set_mock_value(kinetix3.driver.readout_port_idx, KinetixReadoutMode.SENSITIVITY)
+    for kinetix in (kinetix1, kinetix3):
+        set_mock_value(kinetix.driver.array_size_x, 64)
+        set_mock_value(kinetix.driver.array_size_y, 64)
+        set_mock_value(kinetix.driver.data_type, ADBaseDataType.UINT16)
+    exec_startup_files(session, "85-fly-plans.py")
+    simulation = PandaSimulation(
+        panda1,
+        [kinetix1, kinetix3],
+        pulse_blocks=session["TOMO_DETECTOR_PULSE_BLOCKS"],
+    )
+    simulation.follow(session["tomo_rot_axis"], session["COUNTS_PER_DEG"])
+    session["panda_simulation"] = simulation
+    return session
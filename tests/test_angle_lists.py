@@ -0,0 +1,116 @@
+import bluesky.plan_stubs as bps
+import numpy as np
+import pytest
+from bluesky.run_engine import call_in_bluesky_event_loop
+
+# A short range keeps the simulated rotation short.
+RANGE_DEG = 18
+
+
+def value(signal):
+    return call_in_bluesky_event_loop(signal.get_value())
+
+
+def gaps(angles, range_deg):
+    """Gaps between the sorted angles, around the range."""
+    angles = np.sort(angles)
+    return np.diff(np.append(angles, angles[0] + range_deg))
+
+
+@pytest.mark.parametrize("num_images", [10, 55, 89])
+def test_golden_angles_cover_the_range_evenly(beamline, num_images):
+    angles = beamline["golden_angle_list"](num_images, 10, start_deg=5)
+
+    assert np.all((5 <= angles) & (angles < 185))
+    for first in range(0, num_images, 10):
+        chunk = angles[first : first + 10]
+        assert np.all(np.diff(chunk) > 0)
+    # Three gap theorem: the golden angles leave at most three gap lengths, the
+    # largest at most the square of the golden ratio times the smallest.
+    lengths = np.unique(np.round(gaps(angles, 180), 9))
+    assert len(lengths) <= 3
+    assert lengths.max() / lengths.min() < beamline["GOLDEN_RATIO"] ** 2 + 1e-9
+
+
+def test_interlaced_subsets(beamline):
+    angles = beamline["interlaced_angle_list"](32, 4, start_deg=10)
+
+    subsets = angles.reshape(4, 8)
+    for subset in subsets:
+        np.testing.assert_allclose(np.diff(subset), 180 / 8)
+    # Subset offsets 0, 1/2, 1/4 and 3/4 of the spacing: the first two subsets
+    # already interlace evenly, all four fill the range evenly.
+    np.testing.assert_allclose(subsets[:, 0] - 10, np.array([0, 2, 1, 3]) * 180 / 32)
+    np.testing.assert_allclose(gaps(subsets[:2].ravel(), 180), 180 / 16)
+    np.testing.assert_allclose(gaps(angles, 180), 180 / 32)
+
+    with pytest.raises(ValueError, match="subsets of the same size"):
+        beamline["interlaced_angle_list"](30, 4)
+
+
+def test_unwrapped_angles_rotate_forward(beamline):
+    angles = beamline["golden_angle_list"](30, 10)
+    rotation_angles = beamline["unwrap_tomo_angles"](angles, 180, min_spacing=0.5)
+
+    assert np.all(np.diff(rotation_angles) >= 0.5)
+    np.testing.assert_allclose((rotation_angles - angles) % 180, 0, atol=1e-9)
+    # One pass through the range per chunk of 10.
+    assert rotation_angles[-1] - rotation_angles[0] < 3 * 180
+
+
+def test_angle_list_flyscan_triggers_at_the_angles(beamline):
+    panda1, kinetix1 = beamline["panda1"], beamline["kinetix1"]
+    angles = beamline["golden_angle_list"](20, 10, range_deg=RANGE_DEG)
+    rotation_angles, _ = beamline["RE"](
+        beamline["tomo_angle_list_planner"](
+            0.002, angles, period=RANGE_DEG, detectors=[kinetix1], verbose=False
+        )
+    ).plan_result
+
+    beamline["RE"](
+        beamline["tomo_angle_list_flyscan"](
+            0.002, angles, period=RANGE_DEG, lead_angle=2, detectors=[kinetix1]
+        )
+    )
+
+    # SEQ1 triggered once at every angle, from the encoder read at the first.
+    counts_per_deg = beamline["COUNTS_PER_DEG"]
+    first_encoder = int(round(rotation_angles[0] * counts_per_deg))
+    expected = first_encoder + np.round(
+        (rotation_angles - rotation_angles[0]) * counts_per_deg
+    )
+    assert beamline["panda_simulation"].gate_positions == expected.tolist()
+    assert value(panda1.data.num_captured) == len(angles)
+    assert value(kinetix1.fileio.num_captured) == len(angles)
+    # The position compare block triggers the next fly scans again.
+    assert value(panda1.pcomp[1].enable) == "PCAP.ACTIVE"
+    assert value(panda1.seq[1].enable) == "ZERO"
+
+
+def test_angle_list_triggers_restored_after_failure(beamline):
+    panda1 = beamline["panda1"]
+    angles = beamline["interlaced_angle_list"](8, 2, range_deg=RANGE_DEG)
+    enables = []
+
+    def fail():
+        pcomp_enable = yield from bps.rd(panda1.pcomp[1].enable)
+        seq_enable = yield from bps.rd(panda1.seq[1].enable)
+        enables.append((pcomp_enable, seq_enable))
+        raise RuntimeError("Sample lost")
+
+    with pytest.raises(RuntimeError, match="Sample lost"):
+        beamline["RE"](
+            beamline["tomo_angle_list_flyscan"](
+                0.002,
+                angles,
+                period=RANGE_DEG,
+                lead_angle=2,
+                detectors=[beamline["kinetix1"]],
+                after_projections=fail,
+            )
+        )
+
+    # SEQ1 replaced PCOMP1 during the scan, and PCOMP1 is back.
+    assert enables == [("ZERO", "PCAP.ACTIVE")]
+    assert value(panda1.pcomp[1].enable) == "PCAP.ACTIVE"
+    assert value(panda1.seq[1].enable) == "ZERO"
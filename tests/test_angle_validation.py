@@ -0,0 +1,170 @@
+import importlib
+import types
+
+import h5py
+import numpy as np
+import pytest
+from conftest import exec_startup_files
+
+NUM_IMAGES = 180
+STEP_DEG = 1.0
+# Time between two PandA triggers, in s.
+TRIGGER_PERIOD = 1e-3
+
+
+@pytest.fixture
+def viz(beamline):
+    beamline["lazy_import"] = importlib.import_module
+    return exec_startup_files(beamline, "90-viz-utils.py")
+
+
+def write_capture(viz, directory, angles, detectors=None):
+    """
+    Write the PandA file of a fly scan through `angles` (in degrees).
+
+    `detectors` maps detector names to the indices of the triggers they took;
+    their files hold the timestamps of these triggers. Returns the file paths.
+    """
+    counts = viz["ZERO_OFFSET"] + np.asarray(angles) * viz["COUNTS_PER_DEG"]
+    trigger_times = TRIGGER_PERIOD * np.arange(len(angles))
+    panda_file = directory / "panda1.h5"
+    with h5py.File(panda_file, "w") as f:
+        f.create_dataset("Angle", data=counts, chunks=(64,))
+        f.create_dataset(viz["PANDA_TIME_DATASET"], data=trigger_times)
+    detector_files = {}
+    for name, triggers in (detectors or {}).items():
+        detector_files[name] = directory / f"{name}.h5"
+        with h5py.File(detector_files[name], "w") as f:
+            f.create_dataset(
+                viz["DETECTOR_DATA_DATASET"], shape=(len(triggers), 1, 1), dtype="u2"
+            )
+            f.create_dataset(viz["DETECTOR_TIME_DATASET"], data=trigger_times[triggers])
+    return panda_file, detector_files
+
+
+def scan_angles(reverse=False):
+    angles = STEP_DEG * np.arange(NUM_IMAGES)
+    return angles[::-1] + STEP_DEG if reverse else angles
+
+
+def test_missed_and_extra_triggers(viz, tmp_path):
+    angles = scan_angles()
+    angles = np.insert(np.delete(angles, 50), 99, angles[100] - 0.1)
+    panda_file, detector_files = write_capture(
+        viz, tmp_path, angles, {"kinetix1": np.arange(len(angles))}
+    )
+
+    reports = viz["validate_panda_capture"](
+        panda_file, detector_files, num_images=NUM_IMAGES
+    )
+
+    report = reports["panda1"]
+    assert report["num_angles"] == NUM_IMAGES
+    assert report["expected_step"] == pytest.approx(STEP_DEG)
+    assert report["missed_triggers"] == 1
+    assert report["missed_after"] == [49]
+    assert report["extra_triggers"] == 1
+    assert report["segments"] == 1
+    assert reports["kinetix1"]["num_frames"] == reports["kinetix1"]["expected_frames"]
+    assert reports["kinetix1"]["jitter_max"] == pytest.approx(0, abs=1e-12)
+
+
+@pytest.mark.parametrize("bidirectional", [False, True])
+def test_returns_and_reversals_between_tomograms(viz, tmp_path, bidirectional):
+    num_tomograms = 3
+    angles = np.concatenate(
+        [
+            scan_angles(reverse=bidirectional and i % 2 == 1)
+            for i in range(num_tomograms)
+        ]
+    )
+    # kinetix3 takes every 4th trigger, from the first one of every tomogram.
+    triggers = np.concatenate(
+        [i * NUM_IMAGES + np.arange(0, NUM_IMAGES, 4) for i in range(num_tomograms)]
+    )
+    panda_file, detector_files = write_capture(
+        viz, tmp_path, angles, {"kinetix3": triggers}
+    )
+
+    reports = viz["validate_panda_capture"](
+        panda_file,
+        detector_files,
+        num_images=num_tomograms * NUM_IMAGES,
+        frame_dividers={"kinetix3": 4},
+        num_tomograms=num_tomograms,
+    )
+
+    report = reports["panda1"]
+    assert report["segments"] == num_tomograms
+    assert report["missed_triggers"] == 0
+    assert report["extra_triggers"] == 0
+    assert report["step_max_deviation"] == pytest.approx(0, abs=1e-9)
+    kinetix3 = reports["kinetix3"]
+    assert kinetix3["num_frames"] == kinetix3["expected_frames"] == len(triggers)
+    assert kinetix3["jitter_max"] == pytest.approx(0, abs=1e-12)
+
+
+class TiledNode(dict):
+    """The parts of a Tiled run (or stream, or array) read by validate_run_angles."""
+
+    def __init__(self, children=(), metadata=None, path=None):
+        super().__init__(children)
+        self.metadata = metadata or {}
+        self.path = path
+
+    def data_sources(self):
+        asset = types.SimpleNamespace(data_uri=f"file://localhost{self.path}")
+        return [types.SimpleNamespace(assets=[asset])]
+
+
+def test_run_with_divided_detector_stream(viz, tmp_path):
+    angles = scan_angles()
+    panda_file, detector_files = write_capture(
+        viz,
+        tmp_path,
+        angles,
+        {"kinetix1": np.arange(NUM_IMAGES), "kinetix3": np.arange(0, NUM_IMAGES, 2)},
+    )
+    run = TiledNode(
+        {
+            "tomo": TiledNode(
+                {
+                    "Angle": TiledNode(path=panda_file),
+                    "kinetix1": TiledNode(path=detector_files["kinetix1"]),
+                }
+            ),
+            "tomo_kinetix3": TiledNode(
+                {"kinetix3": TiledNode(path=detector_files["kinetix3"])}
+            ),
+        },
+        metadata={
+            "start": {
+                "detectors": ["kinetix1", "kinetix3"],
+                "num_points": NUM_IMAGES,
+                "frame_dividers": {"kinetix1": 1, "kinetix3": 2},
+            }
+        },
+    )
+
+    reports = viz["validate_run_angles"](run=run)
+
+    assert reports["panda1"]["missed_triggers"] == 0
+    assert reports["kinetix1"]["num_frames"] == NUM_IMAGES
+    assert reports["kinetix3"]["num_frames"] == NUM_IMAGES // 2
+    assert reports["kinetix3"]["expected_frames"] == NUM_IMAGES // 2
+
+
+def test_read_hdf5_dataset_layouts(viz, tmp_path):
+    data = np.arange(1000, dtype=np.float64)
+    with h5py.File(tmp_path / "layouts.h5", "w") as f:
+        f.create_dataset("contiguous", data=data)
+        f.create_dataset("chunked", data=data, chunks=(64,), compression="gzip")
+        f.create_dataset("unallocated", shape=(10,), dtype=np.float64)
+        f.create_dataset("empty", shape=(0,), dtype=np.float64)
+    with h5py.File(tmp_path / "layouts.h5", "r") as f:
+        read = viz["read_hdf5_dataset"]
+        assert isinstance(read(f["contiguous"]), np.memmap)
+        np.testing.assert_array_equal(read(f["contiguous"]), data)
+        np.testing.assert_array_equal(read(f["chunked"]), data)
+        np.testing.assert_array_equal(read(f["unallocated"]), np.zeros(10))
+        assert read(f["empty"]).shape == (0,)
@@ -0,0 +1,167 @@
+import numpy as np
+import pytest
+from bluesky.run_engine import call_in_bluesky_event_loop
+from conftest import SHUTTER_MOVE_TIME
+from ophyd.sim import Signal
+
+# Time the HDF5 plugin needs to write a frame after its exposure, in s.
+WRITE_TIME = 0.5
+# Offset of the sample for the flats and time the sample tower takes to move it.
+OFFSET = 1.0
+SAMPLE_MOVE_TIME = 0.5
+# Time between two scans of the synthetic intensity traces, in s.
+SCAN_TIME = 60.0
+
+
+def intensity_trace(num_scans, decay=0.0, top_up_every=None, noise=0.0, seed=0):
+    """
+    Relative beam intensity after each of `num_scans` scans.
+
+    The intensity decays by `decay` per scan and is refilled every
+    `top_up_every` scans, with gaussian `noise`.
+    """
+    scans = np.arange(num_scans)
+    if top_up_every:
+        scans = scans % top_up_every
+    rng = np.random.default_rng(seed)
+    return (1 - decay) ** scans * (1 + noise * rng.standard_normal(num_scans))
+
+
+class IntensityMonitor(Signal):
+    """Returns the values of an intensity trace one after the other when read."""
+
+    def __init__(self, trace, **kwargs):
+        super().__init__(value=trace[0], **kwargs)
+        self.trace = iter(trace)
+
+    def read(self):
+        self.put(next(self.trace))
+        return super().read()
+
+
+@pytest.fixture
+def dark_flat(beamline):
+    beamline["panda_simulation"].write_time = WRITE_TIME
+    beamline["sample_tower"].axis_x1.velocity.sim_put(OFFSET / SAMPLE_MOVE_TIME)
+    return beamline
+
+
+def test_pipelined_dark_flat_dead_time(dark_flat):
+    RE = dark_flat["RE"]
+    kinetix1 = dark_flat["kinetix1"]
+    dead_times = {}
+    for pipelined in (False, True):
+        dead_times[pipelined] = RE(
+            dark_flat["tomo_dark_flat"](
+                0.01,
+                OFFSET,
+                detectors=[kinetix1],
+                dark_images=10,
+                flat_images=10,
+                pipelined=pipelined,
+            )
+        ).plan_result
+        # The sample is back in place, the shutter closed and the files are closed.
+        assert dark_flat["sample_tower"].axis_x1.position == 0
+        assert dark_flat["ph_shutter"].position() == "Not Open"
+        assert not call_in_bluesky_event_loop(kinetix1.fileio.capture.get_value())
+
+    # The sample move, the shutter opening and writing the darks overlap, and
+    # the detector is staged once.
+    saved = SHUTTER_MOVE_TIME + min(SAMPLE_MOVE_TIME, WRITE_TIME)
+    assert dead_times[True] < dead_times[False] - 0.5 * saved
+
+
+def test_dark_flat_never_skipped_without_drift_signal(beamline):
+    reference = {"uid": "last-flats", "time": 0.0, "values": {}}
+    due, reason = beamline["dark_flat_decision"](reference, {}, 10.0)
+    assert due, reason
+
+    assert not beamline["DARK_FLAT_DRIFT_SIGNALS"]
+    with pytest.raises(ValueError, match="DARK_FLAT_DRIFT_SIGNALS"):
+        beamline["RE"](
+            beamline["tomo_loop"](2, 0.01, 0.5, 21, 0, adaptive_dark_flat=True)
+        )
+
+
+def dark_flat_times(beamline, trace, threshold=0.02, max_age=None):
+    """Scans after which `dark_flat_decision` retakes the darks and flats."""
+    reference = None
+    retaken = []
+    for scan, intensity in enumerate(trace):
+        values = {"monitor": float(intensity)}
+        now = scan * SCAN_TIME
+        due, reason = beamline["dark_flat_decision"](
+            reference, values, now, threshold=threshold, max_age=max_age
+        )
+        if due:
+            retaken.append(scan)
+            reference = {"time": now, "values": values}
+        else:
+            assert reason.startswith("largest change")
+    return retaken
+
+
+@pytest.mark.parametrize(
+    "trace, max_age, retaken",
+    [
+        # A stable beam: only the first darks and flats, or when too old.
+        (intensity_trace(20, noise=0.002), None, [0]),
+        (intensity_trace(20, noise=0.002), 5 * SCAN_TIME, [0, 6, 12, 18]),
+        # 0.5 % decay per scan: 4 scans drift by 2 %, the 5th by more.
+        (intensity_trace(20, decay=0.005), None, [0, 5, 10, 15]),
+        # Top-ups every 4 scans, after darks and flats taken on the decayed
+        # beam (scans 2 and 6) the refill retakes them.
+        (intensity_trace(8, decay=0.015, top_up_every=4), None, [0, 2, 4, 6]),
+    ],
+)
+def test_dark_flat_decision_on_intensity_traces(beamline, trace, max_age, retaken):
+    assert dark_flat_times(beamline, trace, max_age=max_age) == retaken
+
+
+def test_adaptive_dark_flat_in_tomo_loop(beamline):
+    documents = []
+    beamline["RE"].subscribe(lambda name, doc: documents.append((name, doc)))
+    # Read during the flats and after the projections of every scan.
+    trace = [
+        1.0,  # first darks and flats
+        0.995,  # scan 1, -0.5 %: skipped
+        0.99,  # scan 2, -1 %: skipped
+        0.97,  # scan 3, -3 %: retaken
+        0.97,  # their flats
+        0.965,  # scan 4, the last one
+        0.965,  # final darks and flats
+    ]
+    monitor = IntensityMonitor(trace, name="beam_monitor")
+    beamline["DARK_FLAT_DRIFT_SIGNALS"].append(monitor)
+
+    beamline["RE"](
+        beamline["tomo_loop"](
+            4,
+            0.01,
+            0.5,
+            10,
+            0,
+            stop_deg=18,
+            lead_angle=2,
+            num_flat_images=2,
+            num_dark_images=2,
+            adaptive_dark_flat=True,
+        )
+    )
+
+    scan_modes = [
+        doc["tomo_scanning_mode"] for name, doc in documents if name == "start"
+    ]
+    dark_flat, flyscan = "tomo_dark_flat", "tomo_flyscan"
+    assert scan_modes == [
+        dark_flat,
+        flyscan,
+        flyscan,
+        flyscan,
+        dark_flat,
+        flyscan,
+        dark_flat,
+    ]
+    reference = beamline["RE"].md["current_dark_flat_reference"]
+    assert reference["values"] == {"beam_monitor": trace[-1]}
@@ -0,0 +1,84 @@
+import asyncio
+import time as ttime
+
+import bluesky.plan_stubs as bps
+import pytest
+from bluesky import RunEngine
+from ophyd_async.core import Device, soft_signal_rw
+
+from hex_profile.devices import DeviceRegistry
+
+CONNECT_DELAYS = [0.2, 0.4, 0.6, 0.8, 1.0]
+
+
+class SlowDevice(Device):
+    """Mock device taking `delay` seconds to connect, like a slow IOC."""
+
+    def __init__(self, delay, fail=False, name=""):
+        self.delay = delay
+        self.fail = fail
+        self.value = soft_signal_rw(float)
+        super().__init__(name=name)
+
+    async def connect(self, mock=False, timeout=10.0, force_reconnect=False):
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise ConnectionError(f"{self.name} did not answer")
+        await super().connect(mock=mock, timeout=timeout)
+
+
+@pytest.fixture
+def RE():
+    return RunEngine({}, call_returns_result=True)
+
+
+def test_connection_time_bounded_by_slowest_device(RE):
+    registry = DeviceRegistry(RE.loop)
+    start = ttime.monotonic()
+    devices = [
+        registry.register(SlowDevice(delay, name=f"device{i}"), mock=True)
+        for i, delay in enumerate(CONNECT_DELAYS)
+    ]
+    # Registering does not wait for any connection.
+    assert ttime.monotonic() - start < min(CONNECT_DELAYS)
+
+    registry.wait(timeout=10)
+    elapsed = ttime.monotonic() - start
+    assert registry.done
+    assert not registry.failures
+    assert max(CONNECT_DELAYS) <= elapsed < max(CONNECT_DELAYS) + 0.5
+    assert elapsed < sum(CONNECT_DELAYS)
+    assert set(registry.connect_times) == {device.name for device in devices}
+
+
+def test_plans_wait_for_pending_connections(RE):
+    registry = DeviceRegistry(RE.loop)
+    RE.preprocessors.append(registry.preprocess)
+    device = registry.register(SlowDevice(0.5, name="device"), mock=True)
+
+    RE(bps.mv(device.value, 3))
+
+    assert registry.done
+    assert RE(bps.rd(device.value)).plan_result == 3
+
+
+def test_plans_using_failed_devices_are_refused(RE):
+    registry = DeviceRegistry(RE.loop)
+    RE.preprocessors.append(registry.preprocess)
+    good = registry.register(SlowDevice(0.1, name="good"), mock=True)
+    bad = registry.register(SlowDevice(0.1, fail=True, name="bad"), mock=True)
+    registry.wait(timeout=10)
+    assert set(registry.failures) == {"bad"}
+
+    # Plans not touching the failed device still run.
+    RE(bps.mv(good.value, 1))
+
+    # A signal of the failed device is enough to refuse the plan.
+    with pytest.raises(RuntimeError, match="bad is unavailable"):
+        RE(bps.mv(bad.value, 1))
+
+    bad.fail = False
+    registry.reconnect()
+    registry.wait(timeout=10)
+    assert not registry.failures
+    RE(bps.mv(bad.value, 1))
@@ -0,0 +1,68 @@
+import gzip
+import json
+import threading
+
+import pytest
+
+from hex_profile.documents import DocumentExporter
+from hex_profile.synthetic import synthetic_flyscan_documents
+
+
+def exporter_threads():
+    return {t for t in threading.enumerate() if t.name == "document-exporter"}
+
+
+def read_documents(path):
+    opener = gzip.open if path.suffix == ".gz" else open
+    with opener(path, "rb") as file:
+        return [
+            (line["name"], line["doc"].get("uid")) for line in map(json.loads, file)
+        ]
+
+
+def runs(num_runs):
+    return [list(synthetic_flyscan_documents(20)) for _ in range(num_runs)]
+
+
+def test_nothing_started_before_the_first_document(tmp_path):
+    threads = exporter_threads()
+    exporter = DocumentExporter(tmp_path / "export")
+
+    assert exporter_threads() == threads
+    assert not (tmp_path / "export").exists()
+    assert exporter.flush(timeout=1)
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_one_file_per_run(tmp_path, compress):
+    exporter = DocumentExporter(tmp_path / "export", compress=compress)
+    documents = runs(2)
+
+    # The second run starts after the stop document of the first.
+    for name, doc in documents[0] + documents[1]:
+        exporter(name, doc)
+    assert exporter.flush(timeout=10)
+
+    suffix = ".ndjson.gz" if compress else ".ndjson"
+    for run in documents:
+        start = run[0][1]
+        path = exporter.files[start["uid"]]
+        assert path.name == f"scan_{start['scan_id']:05d}_{start['uid'][:8]}{suffix}"
+        assert read_documents(path) == [(name, doc.get("uid")) for name, doc in run]
+    assert sorted(path.name for path in (tmp_path / "export").iterdir()) == sorted(
+        path.name for path in exporter.files.values()
+    )
+
+
+def test_documents_outside_of_a_run_are_ignored(tmp_path):
+    exporter = DocumentExporter(tmp_path / "export")
+    (run,) = runs(1)
+
+    # Subscribed in the middle of a run: its file starts with the next run.
+    for name, doc in run[3:] + run:
+        exporter(name, doc)
+    assert exporter.flush(timeout=10)
+
+    assert list(exporter.files) == [run[0][1]["uid"]]
+    path = exporter.files[run[0][1]["uid"]]
+    assert read_documents(path) == [(name, doc.get("uid")) for name, doc in run]
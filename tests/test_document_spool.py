@@ -0,0 +1,159 @@
+import threading
+
+import pytest
+
+from hex_profile.documents import DocumentSpool
+from hex_profile.synthetic import synthetic_flyscan_documents
+
+
+class Conflict(Exception):
+    """What the server answers to a document it already has."""
+
+
+class FakeServer:
+    """Documents received by a document service (e.g. Tiled), per run."""
+
+    def __init__(self):
+        self.runs = {}  # run uid -> list of document names
+        self.duplicate_starts = 0
+
+
+class FakeWriter:
+    """
+    Consumer with the state handling of a TiledWriter.
+
+    Documents of a run are only accepted after its 'start' was received by the
+    same instance (KeyError otherwise), and a 'start' the server already has is
+    rejected. `block_at` freezes the delivery of the given document until
+    `release` is set and fails it, to crash a session in the middle of a run.
+    """
+
+    def __init__(self, server, block_at=None):
+        self.server = server
+        self.run = None
+        self.errors = []
+        self.received = []
+        self.block_at = block_at
+        self.blocked = threading.Event()
+        self.release = threading.Event()
+
+    def __call__(self, name, doc):
+        if len(self.received) == self.block_at:
+            self.blocked.set()
+            self.release.wait(10)
+            raise ConnectionError("the session crashed")
+        if name == "start":
+            if doc["uid"] in self.server.runs:
+                self.server.duplicate_starts += 1
+                raise Conflict(f"Key {doc['uid']} already exists")
+            self.run = doc["uid"]
+            self.server.runs[self.run] = []
+        elif self.run is None:
+            self.errors.append(name)
+            raise KeyError(name)
+        self.server.runs[self.run].append(name)
+        self.received.append(name)
+        if name == "stop":
+            self.run = None
+
+
+def run_documents(num_frames=20):
+    documents = list(synthetic_flyscan_documents(num_frames))
+    return documents[0][1]["uid"], documents
+
+
+def subscribe(spool, writer, **kwargs):
+    # Without coalescing, every spooled document reaches the consumer as is.
+    spool.subscribe(
+        writer,
+        consumer="tiled",
+        coalesce=False,
+        commit_every=5,
+        retry_delay=0.01,
+        **kwargs,
+    )
+    return spool.drainers["tiled"]
+
+
+@pytest.mark.parametrize(
+    "crash_at, replayed",
+    [
+        # Crash before the 'start' of the second run reached the server: the
+        # whole run is replayed after the restart.
+        (0, True),
+        # Crash in the middle of the second run: the server already has a part
+        # of it, the new writer cannot continue it and the rest is dropped.
+        (12, False),
+    ],
+)
+def test_resume_after_crash(tmp_path, crash_at, replayed):
+    server = FakeServer()
+    first_uid, first_run = run_documents()
+    second_uid, second_run = run_documents()
+
+    # First session: one complete run, then a crash during the second one.
+    spool = DocumentSpool(tmp_path, fsync_interval=0.01)
+    writer = FakeWriter(server, block_at=len(first_run) + crash_at)
+    subscribe(spool, writer)
+    for name, doc in first_run + second_run[: len(second_run) // 2]:
+        spool(name, doc)
+    spool.flush()
+    assert writer.blocked.wait(10)
+    threading.Timer(0.2, writer.release.set).start()
+    spool.close()
+    # A document torn by the crash at the end of the last segment.
+    with open(spool.segments()[-1][1], "ab") as file:
+        file.write(b'[999, "event", {"uid": ')
+
+    # Second session: the RunEngine went on with a new run.
+    spool = DocumentSpool(tmp_path, fsync_interval=0.01)
+    writer = FakeWriter(server)
+    drainer = subscribe(spool, writer)
+    third_uid, third_run = run_documents()
+    for name, doc in third_run:
+        spool(name, doc)
+    assert spool.wait_drained(timeout=10)
+    spool.close()
+
+    assert not writer.errors  # no document of a run without its 'start'
+    assert drainer.error is None
+    assert server.runs[first_uid] == [name for name, _ in first_run]
+    assert server.runs[third_uid] == [name for name, _ in third_run]
+    if replayed:
+        assert server.duplicate_starts == 0
+        assert writer.received[0] == "start"
+        assert server.runs[second_uid] == [
+            name for name, _ in second_run[: len(second_run) // 2]
+        ]
+    else:
+        assert server.duplicate_starts == 1
+        assert server.runs[second_uid] == [name for name, _ in second_run[:crash_at]]
+
+
+def test_errors_are_not_retried_forever(tmp_path):
+    server = FakeServer()
+    _, documents = run_documents()
+    failures = {"permanent": 0, "transient": 0}
+
+    def consumer(name, doc):
+        if name == "descriptor":
+            failures["permanent"] += 1
+            raise ValueError("rejected")
+        if name == "stop" and failures["transient"] < 3:
+            failures["transient"] += 1
+            raise ConnectionError("service unavailable")
+        writer(name, doc)
+
+    writer = FakeWriter(server)
+    spool = DocumentSpool(tmp_path, fsync_interval=0.01)
+    drainer = subscribe(spool, consumer, max_attempts=2)
+    for name, doc in documents:
+        spool(name, doc)
+    assert spool.wait_drained(timeout=10)
+    spool.close()
+
+    # The rejected document is dropped after `max_attempts`, the following ones
+    # are delivered; the unreachable service is retried until it is back.
+    assert failures == {"permanent": 2, "transient": 3}
+    assert [name for name, _, _ in drainer.dropped] == ["descriptor"]
+    assert writer.received == [name for name, _ in documents if name != "descriptor"]
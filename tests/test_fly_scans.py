@@ -0,0 +1,104 @@
+import pytest
+from bluesky.run_engine import call_in_bluesky_event_loop
+
+EXPOSURE_TIME = 0.01
+NUM_IMAGES = 10
+NUM_TOMOGRAMS = 3
+# A short range and lead angle keep the simulated rotation short.
+STOP_DEG = 18
+LEAD_ANGLE = 2
+
+
+def value(signal):
+    return call_in_bluesky_event_loop(signal.get_value())
+
+
+@pytest.fixture
+def fly_scan(beamline):
+    documents = []
+    beamline["RE"].subscribe(lambda name, doc: documents.append((name, doc)))
+    beamline["documents"] = documents
+    return beamline
+
+
+def stop_document(fly_scan):
+    return next(doc for name, doc in fly_scan["documents"] if name == "stop")
+
+
+@pytest.mark.parametrize(
+    "mode, gate_degs, end_deg",
+    [
+        # The axis returns to the lead angle before every tomogram.
+        ({}, [0, 0, 0], STOP_DEG + LEAD_ANGLE),
+        # Every second tomogram from STOP_DEG back to 0.
+        ({"bidirectional": True}, [0, STOP_DEG, 0], STOP_DEG + LEAD_ANGLE),
+        # One gate at the beginning of every range.
+        (
+            {"rotate_continuously": True},
+            [0, STOP_DEG, 2 * STOP_DEG],
+            NUM_TOMOGRAMS * STOP_DEG + LEAD_ANGLE,
+        ),
+    ],
+)
+def test_continuous_flyscan(fly_scan, mode, gate_degs, end_deg):
+    panda1, kinetix1 = fly_scan["panda1"], fly_scan["kinetix1"]
+    tomo_rot_axis = fly_scan["tomo_rot_axis"]
+
+    gaps = fly_scan["RE"](
+        fly_scan["continuous_tomo_flyscan"](
+            NUM_TOMOGRAMS,
+            EXPOSURE_TIME,
+            NUM_IMAGES,
+            stop_deg=STOP_DEG,
+            lead_angle=LEAD_ANGLE,
+            **mode,
+        )
+    ).plan_result
+
+    # One gate of PCOMP1 per tomogram, at its first angle.
+    gate_positions = fly_scan["panda_simulation"].gate_positions
+    assert gate_positions == [deg * fly_scan["COUNTS_PER_DEG"] for deg in gate_degs]
+    total_images = NUM_TOMOGRAMS * NUM_IMAGES
+    assert value(panda1.data.num_captured) == total_images
+    assert value(kinetix1.fileio.num_captured) == total_images
+    stop = stop_document(fly_scan)
+    assert stop["exit_status"] == "success"
+    assert stop["num_events"] == {"tomo": total_images}
+    frame_monitor = fly_scan["stop_document_extras"]["frame_monitor"]
+    assert frame_monitor[kinetix1.name]["frames"] == total_images
+    assert len(gaps) == NUM_TOMOGRAMS - 1
+    assert tomo_rot_axis.position == end_deg
+    # The shutter is closed and the velocity reset by the cleanup.
+    assert fly_scan["ph_shutter"].position() == "Not Open"
+    assert tomo_rot_axis.velocity.get() == fly_scan["TOMO_ROTARY_STAGE_VELO_RESET_MAX"]
+
+
+def test_continuous_flyscan_divided_detector(fly_scan):
+    kinetix1, kinetix3 = fly_scan["kinetix1"], fly_scan["kinetix3"]
+    fly_scan["TOMO_DETECTOR_PULSE_BLOCKS"][kinetix3.name] = 3
+
+    # kinetix1 is 5 times faster than kinetix3, the range is short enough for
+    # the rotary stage to reach the frame rate of kinetix1.
+    fly_scan["RE"](
+        fly_scan["continuous_tomo_flyscan"](
+            NUM_TOMOGRAMS,
+            0.002,
+            NUM_IMAGES,
+            stop_deg=1,
+            lead_angle=LEAD_ANGLE,
+            detectors=[kinetix1, kinetix3],
+        )
+    )
+
+    stop = stop_document(fly_scan)
+    dividers = next(doc for name, doc in fly_scan["documents"] if name == "start")[
+        "frame_dividers"
+    ]
+    assert dividers[kinetix3.name] > 1
+    kinetix3_images = fly_scan["tomo_frame_count"](NUM_IMAGES, dividers[kinetix3.name])
+    assert value(kinetix1.fileio.num_captured) == NUM_TOMOGRAMS * NUM_IMAGES
+    assert value(kinetix3.fileio.num_captured) == NUM_TOMOGRAMS * kinetix3_images
+    assert stop["num_events"] == {
+        "tomo": NUM_TOMOGRAMS * NUM_IMAGES,
+        f"tomo_{kinetix3.name}": NUM_TOMOGRAMS * kinetix3_images,
+    }
@@ -0,0 +1,71 @@
+import pytest
+from ophyd_async.testing import set_mock_value
+
+NUM_IMAGES = 10
+NUM_TOMOGRAMS = 3
+
+
+@pytest.fixture
+def trajectory(beamline):
+    TomoDetectorSpec = beamline["TomoDetectorSpec"]
+    kinetix1, kinetix3 = beamline["kinetix1"].name, beamline["kinetix3"].name
+    trajectory = beamline["plan_tomo_trajectory"](
+        0.002,
+        NUM_IMAGES,
+        [
+            TomoDetectorSpec(kinetix1, "SPEED", 250, (100, 100)),
+            TomoDetectorSpec(kinetix3, "SENSITIVITY", 50, (100, 100)),
+        ],
+        stop_deg=1,
+        number_of_tomograms=NUM_TOMOGRAMS,
+        detector_pulse_blocks={kinetix3: 3},
+    )
+    assert trajectory.frame_dividers[kinetix3] == 3
+    return trajectory
+
+
+@pytest.fixture
+def monitor(beamline, trajectory):
+    kinetix1, kinetix3 = beamline["kinetix1"], beamline["kinetix3"]
+    monitor = beamline["FrameCountMonitor"](
+        beamline["panda1"], [kinetix1, kinetix3], trajectory, action="warn"
+    )
+    beamline["RE"](monitor.start())
+    yield monitor
+    monitor.stop()
+
+
+def capture(beamline, panda_frames, kinetix1_frames, kinetix3_frames):
+    set_mock_value(beamline["panda1"].data.num_captured, panda_frames)
+    set_mock_value(beamline["kinetix1"].fileio.num_captured, kinetix1_frames)
+    set_mock_value(beamline["kinetix3"].fileio.num_captured, kinetix3_frames)
+
+
+def test_lag_of_divided_detector_per_tomogram(beamline, trajectory, monitor):
+    kinetix1, kinetix3 = beamline["kinetix1"].name, beamline["kinetix3"].name
+    # kinetix3 takes triggers 0, 3, 6 and 9 of every tomogram.
+    per_tomogram = trajectory.detector_images(kinetix3)
+    assert per_tomogram == 4
+    for tomogram in range(NUM_TOMOGRAMS):
+        triggers = tomogram * NUM_IMAGES
+        capture(beamline, triggers + 1, triggers + 1, tomogram * per_tomogram)
+        assert monitor.lag(kinetix1) == 0
+        assert monitor.lag(kinetix3) == 1
+
+        capture(beamline, triggers + 7, triggers + 7, tomogram * per_tomogram + 3)
+        assert monitor.lag(kinetix3) == 0
+
+        triggers += NUM_IMAGES
+        capture(beamline, triggers, triggers, (tomogram + 1) * per_tomogram)
+        assert monitor.lag(kinetix1) == 0
+        assert monitor.lag(kinetix3) == 0
+
+    summary = monitor.summary()
+    assert summary[kinetix3]["frames"] == NUM_TOMOGRAMS * per_tomogram
+
+
+def test_lag_of_detector_falling_behind(beamline, monitor):
+    kinetix1, kinetix3 = beamline["kinetix1"].name, beamline["kinetix3"].name
+    capture(beamline, 2 * NUM_IMAGES, 2 * NUM_IMAGES - 5, 6)
+    assert monitor.lag(kinetix1) == 5
+    assert monitor.lag(kinetix3) == 2
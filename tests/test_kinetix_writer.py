@@ -0,0 +1,95 @@
+import pytest
+from bluesky.run_engine import call_in_bluesky_event_loop
+from conftest import exec_startup_files
+from ophyd_async.epics.adcore import ADBaseDataType
+from ophyd_async.testing import set_mock_value
+
+FRAME_SHAPE = (200, 300)
+
+
+@pytest.fixture
+def kinetix(session):
+    exec_startup_files(session, "10-kinetix.py")
+    session["device_registry"].wait(timeout=10)
+    kinetix = session["kinetix1"]
+    set_mock_value(kinetix.driver.array_size_y, FRAME_SHAPE[0])
+    set_mock_value(kinetix.driver.array_size_x, FRAME_SHAPE[1])
+    set_mock_value(kinetix.driver.data_type, ADBaseDataType.UINT16)
+    set_mock_value(kinetix.fileio.file_path_exists, True)
+    set_mock_value(kinetix.fileio.full_file_name, "/tmp/kinetix1.h5")
+    # Automatic chunking: one whole frame per chunk.
+    set_mock_value(kinetix.fileio.num_frames_chunks, 1)
+    return kinetix
+
+
+def open_and_describe(kinetix, scan_type):
+    """Open the writer for `scan_type`, returns the descriptor and stream resource."""
+
+    async def open_writer():
+        writer = kinetix._writer
+        writer.set_scan_type(scan_type)
+        describe = await writer.open()
+        set_mock_value(kinetix.fileio.num_captured, 1)
+        docs = [doc async for doc in writer.collect_stream_docs(1)]
+        await writer.close()
+        return describe, dict(docs)["stream_resource"]
+
+    return call_in_bluesky_event_loop(open_writer())
+
+
+@pytest.mark.parametrize(
+    "config_kwargs, chunk_shape, compression",
+    [
+        ({}, (1, *FRAME_SHAPE), "None"),
+        ({"codec": "bslz4"}, (1, *FRAME_SHAPE), "BSLZ4"),
+        ({"codec": "zlib", "frames_per_chunk": 4}, (4, *FRAME_SHAPE), "zlib"),
+        (
+            {"codec": "zstd", "frames_per_chunk": 16, "rows_per_chunk": 64},
+            (16, 64, FRAME_SHAPE[1]),
+            "Blosc",
+        ),
+        (
+            {"rows_per_chunk": 1000, "cols_per_chunk": 32},
+            (1, FRAME_SHAPE[0], 32),
+            "None",
+        ),
+    ],
+)
+def test_described_chunks_match_the_config(
+    session, kinetix, config_kwargs, chunk_shape, compression
+):
+    ScanType = session["ScanType"]
+    config = session["HDF5WriterConfig"](**config_kwargs)
+    session["HDF5_WRITER_CONFIGS"][ScanType.tomo_flyscan] = config
+
+    describe, resource = open_and_describe(kinetix, ScanType.tomo_flyscan)
+
+    assert describe[kinetix.name]["shape"] == list(FRAME_SHAPE)
+    assert tuple(resource["parameters"]["chunk_shape"]) == chunk_shape
+    fileio = kinetix.fileio
+
+    def value(signal):
+        return call_in_bluesky_event_loop(signal.get_value())
+
+    assert value(fileio.compression) == compression
+    assert value(fileio.chunk_size_auto) == config.auto_chunks
+    assert value(fileio.num_extra_dims) == 0
+    assert not value(fileio.swmr_mode)
+    if not config.auto_chunks:
+        assert value(fileio.num_frames_chunks_setpoint) == chunk_shape[0]
+        assert value(fileio.num_row_chunks) == chunk_shape[1]
+        assert value(fileio.num_col_chunks) == chunk_shape[2]
+
+
+def test_scan_types_without_config_reset_the_layout(session, kinetix):
+    ScanType = session["ScanType"]
+    session["HDF5_WRITER_CONFIGS"][ScanType.tomo_flyscan] = session["HDF5WriterConfig"](
+        codec="lz4", frames_per_chunk=8
+    )
+    open_and_describe(kinetix, ScanType.tomo_flyscan)
+
+    _, resource = open_and_describe(kinetix, ScanType.tomo_dark_flat)
+
+    assert tuple(resource["parameters"]["chunk_shape"]) == (1, *FRAME_SHAPE)
+    assert call_in_bluesky_event_loop(kinetix.fileio.compression.get_value()) == "None"
+    assert call_in_bluesky_event_loop(kinetix.fileio.chunk_size_auto.get_value())
@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+from ophyd_async.testing import get_mock_put, set_mock_value
+
+
+@pytest.fixture
+def panda1(beamline):
+    return beamline["panda1"]
+
+
+def configure(beamline, config):
+    """Run `configure_panda`, returns the signals written, from their mock puts."""
+    for signal in config:
+        get_mock_put(signal).reset_mock()
+    changes = beamline["RE"](beamline["configure_panda"](config)).plan_result
+    written = {signal for signal in config if get_mock_put(signal).called}
+    assert written == {signal for signal, _ in changes}
+    return written
+
+
+def test_only_changed_values_are_written(beamline, panda1):
+    pulse = panda1.pulse[1]
+    config = {
+        pulse.pulses: 100,
+        pulse.step: 0.3,
+        pulse.width: 0.002,
+        panda1.pcomp[1].dir: "Negative",
+        panda1.calc[2].out_dataset: "Angle",
+    }
+    assert configure(beamline, config) == set(config)
+
+    assert configure(beamline, config) == set()
+    # The same step computed differently is not written again.
+    assert configure(beamline, {**config, pulse.step: 0.1 + 0.2}) == set()
+
+    # Changed from the web GUI: the values are read back every time.
+    set_mock_value(pulse.pulses, 50)
+    set_mock_value(panda1.pcomp[1].dir, "Positive")
+    assert configure(beamline, config) == {pulse.pulses, panda1.pcomp[1].dir}
+    assert configure(beamline, {**config, pulse.width: 0.001}) == {pulse.width}
+
+
+def test_sequencer_table_compared_by_column(beamline, panda1):
+    seq = panda1.seq[1]
+    positions = np.arange(0, 1000, 100)
+    config = beamline["panda_seq_config"](seq, positions, 10)
+    assert configure(beamline, config) == set(config)
+
+    same_table = beamline["panda_seq_config"](seq, positions.tolist(), 10)
+    assert configure(beamline, same_table) == set()
+
+    positions[3] += 1
+    moved = beamline["panda_seq_config"](seq, positions, 10)
+    assert configure(beamline, moved) == {seq.table}
+
+
+def test_fly_scan_configuration_written_once(beamline, panda1):
+    trajectory = beamline["plan_tomo_trajectory"](
+        0.01,
+        10,
+        beamline["RE"](
+            beamline["read_tomo_detector_specs"]([beamline["kinetix1"]])
+        ).plan_result,
+        stop_deg=18,
+        number_of_tomograms=3,
+    )
+    config = beamline["tomo_panda_config"](panda1, trajectory)
+    assert configure(beamline, config) == set(config)
+
+    assert (
+        configure(beamline, beamline["tomo_panda_config"](panda1, trajectory)) == set()
+    )
@@ -0,0 +1,45 @@
+import time as ttime
+
+import pytest
+from conftest import SHUTTER_MOVE_TIME, simulated_shutter
+from ophyd.utils.errors import StatusTimeoutError
+
+
+def test_open():
+    shutter, commands = simulated_shutter(retry_period=1.0)
+
+    start = ttime.monotonic()
+    shutter.set("Open").wait(timeout=5)
+
+    assert SHUTTER_MOVE_TIME <= ttime.monotonic() - start < 1.0
+    assert shutter.position() == "Open"
+    assert commands == [0]
+    # Already open: nothing is sent.
+    shutter.set("Open").wait(timeout=1)
+    assert commands == [0]
+
+
+def test_command_sent_again_after_missed_command():
+    shutter, commands = simulated_shutter(ignored_commands=1, retry_period=0.3)
+
+    shutter.set("Open").wait(timeout=5)
+    assert shutter.position() == "Open"
+    assert commands == [0, 0]
+
+    shutter.set("Close").wait(timeout=5)
+    assert shutter.position() == "Not Open"
+    # The shutter reacted to the close command, it was not sent again.
+    ttime.sleep(0.5)
+    assert commands == [0, 0, 1]
+
+
+def test_fails_after_max_attempts():
+    shutter, commands = simulated_shutter(
+        ignored_commands=10, retry_period=0.1, max_attempts=3, timeout=1.0
+    )
+
+    status = shutter.set("Open")
+    with pytest.raises(StatusTimeoutError):
+        status.wait(timeout=5)
+    assert commands == [0, 0, 0]
+    assert shutter.position() == "Not Open"
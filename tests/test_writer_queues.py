@@ -0,0 +1,100 @@
+import pytest
+from bluesky.run_engine import call_in_bluesky_event_loop
+
+# 1 MiB frames.
+FRAME_SHAPE = (512, 1024)
+FRAME_BYTES = 2**20
+
+
+@pytest.fixture
+def specs(beamline):
+    TomoDetectorSpec = beamline["TomoDetectorSpec"]
+    return [
+        TomoDetectorSpec("kinetix1", "SPEED", 250, FRAME_SHAPE),
+        TomoDetectorSpec("kinetix3", "SENSITIVITY", 50, FRAME_SHAPE),
+    ]
+
+
+@pytest.mark.parametrize(
+    "num_images, dividers, write_bandwidth, queue_sizes",
+    [
+        # 2 s of frames at 100 Hz.
+        (1000, {}, None, {"kinetix1": 200, "kinetix3": 200}),
+        # Never more than the frames of the scan.
+        (50, {}, None, {"kinetix1": 50, "kinetix3": 50}),
+        # The disk writes half of the 200 MiB/s: half of the frames queue up.
+        (1000, {}, 100 * FRAME_BYTES, {"kinetix1": 700, "kinetix3": 700}),
+        # kinetix3 takes every 4th trigger, 125 MiB/s together: the backlog of
+        # each detector is in proportion to its frames.
+        (
+            1000,
+            {"kinetix3": 4},
+            62.5 * FRAME_BYTES,
+            {"kinetix1": 700, "kinetix3": 175},
+        ),
+        # Faster disk than detectors: only the stalls.
+        (1000, {}, 1000 * FRAME_BYTES, {"kinetix1": 200, "kinetix3": 200}),
+    ],
+)
+def test_queue_sizes(
+    beamline, specs, num_images, dividers, write_bandwidth, queue_sizes
+):
+    assert (
+        beamline["tomo_writer_queue_sizes"](
+            specs, dividers, 0.01, num_images, write_bandwidth, stall_time=2.0
+        )
+        == queue_sizes
+    )
+
+
+def test_queue_sizes_capped_by_ioc_memory(beamline, specs):
+    queue_sizes = beamline["tomo_writer_queue_sizes"](
+        specs, {}, 0.01, 1000, 100 * FRAME_BYTES, max_bytes=300 * FRAME_BYTES
+    )
+    assert queue_sizes == {"kinetix1": 300, "kinetix3": 300}
+    # At least one frame.
+    queue_sizes = beamline["tomo_writer_queue_sizes"](
+        specs, {}, 0.01, 1000, stall_time=0, max_bytes=None
+    )
+    assert queue_sizes == {"kinetix1": 1, "kinetix3": 1}
+
+
+def test_scan_slowed_down_when_the_backlog_does_not_fit(beamline, specs):
+    # 10000 frames of 1 MiB at 250 Hz, with a 50 MiB/s disk: the backlog of
+    # 8000 frames does not fit in 4 GiB, the scan slows down to the disk.
+    trajectory = beamline["plan_tomo_trajectory"](
+        0.001,
+        10000,
+        specs[:1],
+        stop_deg=1,
+        write_bandwidth=50 * FRAME_BYTES,
+    )
+    assert trajectory.limiting_factor == "disk bandwidth"
+    assert trajectory.framerate == pytest.approx(50)
+    # Only the stalls, at the slower frame rate.
+    assert trajectory.queue_sizes == {"kinetix1": 100}
+
+
+def test_fly_scan_sizes_the_queues(beamline):
+    kinetix1 = beamline["kinetix1"]
+    trajectory = beamline["RE"](
+        beamline["tomo_scan_planner"](
+            0.01,
+            10,
+            stop_deg=18,
+            lead_angle=2,
+            detectors=[kinetix1],
+            verbose=False,
+        )
+    ).plan_result
+
+    beamline["RE"](
+        beamline["tomo_flyscan"](
+            0.01, 10, stop_deg=18, lead_angle=2, detectors=[kinetix1]
+        )
+    )
+
+    queue_size = call_in_bluesky_event_loop(kinetix1.fileio.queue_size.get_value())
+    assert queue_size == trajectory.queue_sizes[kinetix1.name]
+    frame_monitor = beamline["stop_document_extras"]["frame_monitor"]
+    assert frame_monitor[kinetix1.name]["queue_size"] == queue_size